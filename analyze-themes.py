@@ -3,119 +3,272 @@
 Analyze GitHub repos and cluster them into thematic patterns
 """
 
+import hashlib
 import json
+import random
 import re
+import time
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
 
-def extract_keywords(text):
-    """Extract meaningful keywords from text"""
-    if not text:
-        return []
-    
-    # Convert to lowercase
-    text = text.lower()
-    
-    # Common meaningful words in this corpus
-    keywords = []
-    
+from ripple_output import write_artifact, write_shards, print_artifact_report, add_output_arguments, output_options
+from ripple_metrics import metrics, add_metrics_arguments, start_instrumentation
+from ripple_layout import add_layout, add_layout_arguments
+from ripple_records import RepoRecord, records_table, records_from_table
+from ripple_store import RippleStore
+from ripple_text import is_term, normalize
+
+# Common meaningful words in this corpus
+KEYWORD_TERMS = (
     # Media theory terms
-    media_terms = ['media', 'mcluhan', 'tetrad', 'cage', 'narrative', 'cinema', 'film', 'video', 'audio', 'sound']
+    ['media', 'mcluhan', 'tetrad', 'cage', 'narrative', 'cinema', 'film', 'video', 'audio', 'sound'] +
     # AI/ML terms
-    ai_terms = ['ai', 'llm', 'gpt', 'agent', 'chatbot', 'machine learning', 'neural', 'model']
+    ['ai', 'llm', 'gpt', 'agent', 'chatbot', 'machine learning', 'neural', 'model'] +
     # Philosophy terms
-    phil_terms = ['plato', 'myth', 'ethics', 'philosophy', 'theory', 'reality', 'truth']
+    ['plato', 'myth', 'ethics', 'philosophy', 'theory', 'reality', 'truth'] +
     # Technical terms
-    tech_terms = ['three.js', '3d', 'vr', 'webgl', 'canvas', 'interactive', 'visualization']
+    ['three.js', '3d', 'vr', 'webgl', 'canvas', 'interactive', 'visualization'] +
     # Temporal terms
-    time_terms = ['time', 'temporal', 'archive', 'memory', 'history']
+    ['time', 'temporal', 'archive', 'memory', 'history'] +
     # Design terms
-    design_terms = ['interface', 'ui', 'design', 'bauhaus', 'interactive']
+    ['interface', 'ui', 'design', 'bauhaus', 'interactive']
+)
+
+THEMES = {
+    'media_theory': {
+        'name': 'Media Theory & McLuhan',
+        'keywords': ['media', 'mcluhan', 'tetrad', 'cage', 'sapir', 'myth', 'reality media']
+    },
+    'ai_systems': {
+        'name': 'AI Systems & Agents',
+        'keywords': ['ai', 'llm', 'gpt', 'agent', 'chatbot', 'neural', 'machine', 'model']
+    },
+    'platos_cave': {
+        'name': "Plato's Cave & Philosophy",
+        'keywords': ['plato', 'cave', 'reality', 'shadow', 'philosophy']
+    },
+    'narrative_tools': {
+        'name': 'Narrative & Storytelling',
+        'keywords': ['narrative', 'story', 'legos', 'myth', 'cinema', 'film']
+    },
+    'three_d_viz': {
+        'name': '3D Visualization & WebGL',
+        'keywords': ['three.js', '3d', 'webgl', 'vr', 'a-frame', 'visualization']
+    },
+    'temporal_systems': {
+        'name': 'Time & Memory',
+        'keywords': ['time', 'temporal', 'archive', 'memory', 'history', 'timeline']
+    },
+    'interactive_media': {
+        'name': 'Interactive Experiences',
+        'keywords': ['interactive', 'game', 'interface', 'ui', 'canvas']
+    },
+    'archives': {
+        'name': 'Archives & Collections',
+        'keywords': ['archive', 'collection', 'arkadu', 'xanadu', 'library', 'codex']
+    },
+    'sound_audio': {
+        'name': 'Sound & Audio',
+        'keywords': ['sound', 'audio', 'music', 'listening', 'waveform', 'tts']
+    },
+    'educational': {
+        'name': 'Educational Tools',
+        'keywords': ['teaching', 'learning', 'education', 'course', 'classroom', 'student']
+    }
+}
+
+def load_themes(path):
+    """Load a theme table ({theme_id: {name, keywords}}) from a JSON file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        themes = json.load(f)
+    for theme_id, theme in themes.items():
+        if 'name' not in theme or not isinstance(theme.get('keywords'), list):
+            raise ValueError(f"Theme '{theme_id}' needs a name and a keywords list")
+    return themes
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton that finds many keywords in one pass over a text
+    
+    find() returns the indices of the keywords present, matching substrings
+    like `keyword in text` does, or whole words only with word_boundary=True.
+    """
+    
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        goto = [{}]
+        out = [[]]
+        
+        for idx, keyword in enumerate(self.keywords):
+            if not keyword:
+                raise ValueError("Keywords must be non-empty")
+            state = 0
+            for ch in keyword:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(idx)
+        
+        # Breadth-first failure links; each state also reports the keywords
+        # that end at its longest proper suffix
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(o) for o in out]
+    
+    def find(self, text, word_boundary=False):
+        """Indices of the keywords that occur in text"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            if not word_boundary:
+                found.update(out[state])
+                continue
+            for idx in out[state]:
+                if idx not in found and self._at_word_boundary(text, pos, self.keywords[idx]):
+                    found.add(idx)
+        
+        return found
+    
+    @staticmethod
+    def _at_word_boundary(text, end, keyword):
+        start = end - len(keyword) + 1
+        if _is_word_char(keyword[0]) and start > 0 and _is_word_char(text[start - 1]):
+            return False
+        if _is_word_char(keyword[-1]) and end + 1 < len(text) and _is_word_char(text[end + 1]):
+            return False
+        return True
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+class SubstringMatcher:
+    """Same find() as KeywordAutomaton, one `keyword in text` test per keyword
+    
+    str's C substring search beats the pure-Python automaton until the
+    keyword list gets long (see AUTOMATON_MIN_KEYWORDS).
+    """
     
-    all_terms = media_terms + ai_terms + phil_terms + tech_terms + time_terms + design_terms
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        if not all(self.keywords):
+            raise ValueError("Keywords must be non-empty")
+    
+    def find(self, text, word_boundary=False):
+        """Indices of the keywords that occur in text"""
+        found = set()
+        for idx, keyword in enumerate(self.keywords):
+            if keyword not in text:
+                continue
+            if not word_boundary:
+                found.add(idx)
+                continue
+            start = text.find(keyword)
+            while start != -1:
+                if KeywordAutomaton._at_word_boundary(text, start + len(keyword) - 1, keyword):
+                    found.add(idx)
+                    break
+                start = text.find(keyword, start + 1)
+        return found
+
+# Below this many distinct keywords, substring tests are faster than the automaton
+AUTOMATON_MIN_KEYWORDS = 100
+
+def compile_keywords(keywords, matcher=None):
+    """A keyword matcher: 'substring', 'automaton', or chosen by keyword count"""
+    keywords = list(keywords)
+    if matcher is None:
+        matcher = 'automaton' if len(set(keywords)) >= AUTOMATON_MIN_KEYWORDS else 'substring'
+    if matcher == 'automaton':
+        return KeywordAutomaton(keywords)
+    if matcher == 'substring':
+        return SubstringMatcher(keywords)
+    raise ValueError(f"Unknown matcher: {matcher}")
+
+_keyword_matcher = None
+
+def extract_keywords(text, word_boundary=False):
+    """Extract meaningful keywords from text"""
+    global _keyword_matcher
+    if not text:
+        return []
     
-    for term in all_terms:
-        if term in text:
-            keywords.append(term)
+    if _keyword_matcher is None:
+        _keyword_matcher = compile_keywords(KEYWORD_TERMS)
     
-    return list(set(keywords))
+    found = _keyword_matcher.find(text.lower(), word_boundary)
+    return list(set(KEYWORD_TERMS[idx] for idx in found))
 
-def analyze_themes(repos):
-    """Cluster repos into thematic groups"""
+def compile_themes(themes, matcher=None):
+    """Build one matcher over every theme's keywords
     
+    Returns (matcher, owners) where owners[i] lists the theme positions
+    that keyword i scores for (once per listing, like the keyword loop).
+    """
+    keyword_ids = {}
+    owners = []
+    for position, theme in enumerate(themes.values()):
+        for keyword in theme['keywords']:
+            idx = keyword_ids.setdefault(keyword, len(keyword_ids))
+            if idx == len(owners):
+                owners.append([])
+            owners[idx].append(position)
+    return compile_keywords(keyword_ids, matcher), owners
+
+def analyze_themes(repos, themes=None, word_boundary=False, matcher=None):
+    """Cluster repos into thematic groups
+    
+    Every theme is scored from one matcher over all theme keywords: plain
+    substring tests for tables like the built-in one, a single automaton
+    pass per repo once the table holds AUTOMATON_MIN_KEYWORDS keywords
+    (matcher forces either). The default substring matching reproduces the
+    original classification; word_boundary=True stops short keywords like
+    'ai' matching inside words.
+    """
+    
+    theme_table = THEMES if themes is None else themes
     themes = {
-        'media_theory': {
-            'name': 'Media Theory & McLuhan',
-            'keywords': ['media', 'mcluhan', 'tetrad', 'cage', 'sapir', 'myth', 'reality media'],
-            'repos': []
-        },
-        'ai_systems': {
-            'name': 'AI Systems & Agents',
-            'keywords': ['ai', 'llm', 'gpt', 'agent', 'chatbot', 'neural', 'machine', 'model'],
-            'repos': []
-        },
-        'platos_cave': {
-            'name': "Plato's Cave & Philosophy",
-            'keywords': ['plato', 'cave', 'reality', 'shadow', 'philosophy'],
-            'repos': []
-        },
-        'narrative_tools': {
-            'name': 'Narrative & Storytelling',
-            'keywords': ['narrative', 'story', 'legos', 'myth', 'cinema', 'film'],
-            'repos': []
-        },
-        'three_d_viz': {
-            'name': '3D Visualization & WebGL',
-            'keywords': ['three.js', '3d', 'webgl', 'vr', 'a-frame', 'visualization'],
-            'repos': []
-        },
-        'temporal_systems': {
-            'name': 'Time & Memory',
-            'keywords': ['time', 'temporal', 'archive', 'memory', 'history', 'timeline'],
-            'repos': []
-        },
-        'interactive_media': {
-            'name': 'Interactive Experiences',
-            'keywords': ['interactive', 'game', 'interface', 'ui', 'canvas'],
-            'repos': []
-        },
-        'archives': {
-            'name': 'Archives & Collections',
-            'keywords': ['archive', 'collection', 'arkadu', 'xanadu', 'library', 'codex'],
-            'repos': []
-        },
-        'sound_audio': {
-            'name': 'Sound & Audio',
-            'keywords': ['sound', 'audio', 'music', 'listening', 'waveform', 'tts'],
-            'repos': []
-        },
-        'educational': {
-            'name': 'Educational Tools',
-            'keywords': ['teaching', 'learning', 'education', 'course', 'classroom', 'student'],
-            'repos': []
-        }
+        theme_id: {'name': theme['name'], 'keywords': list(theme['keywords']), 'repos': []}
+        for theme_id, theme in theme_table.items()
     }
+    theme_ids = list(themes)
+    keyword_matcher, owners = compile_themes(themes, matcher)
     
     # Classify each repo
     for repo in repos:
         text = f"{repo['name']} {repo['description'] or ''} {' '.join(repo.get('topics', []))}"
         text = text.lower()
         
-        matched_themes = []
+        scores = {}
+        for idx in keyword_matcher.find(text, word_boundary):
+            for position in owners[idx]:
+                scores[position] = scores.get(position, 0) + 1
         
-        for theme_id, theme in themes.items():
-            score = 0
-            for keyword in theme['keywords']:
-                if keyword in text:
-                    score += 1
-            
-            if score > 0:
-                matched_themes.append((theme_id, score))
-        
-        # Assign to best matching theme(s)
-        if matched_themes:
-            matched_themes.sort(key=lambda x: x[1], reverse=True)
-            primary_theme = matched_themes[0][0]
+        # Assign to best matching theme (first in table order on ties)
+        if scores:
+            best = max(scores.values())
+            primary_theme = theme_ids[min(p for p, score in scores.items() if score == best)]
             themes[primary_theme]['repos'].append(repo)
         else:
             # Uncategorized
@@ -132,22 +285,503 @@ def analyze_themes(repos):
     
     return themes
 
-def create_enhanced_index(input_file):
-    """Create enhanced thematic index"""
+def _repo_text(repo):
+    topics = ' '.join(repo.get('topics', []))
+    return f"{repo['name'].replace('-', ' ').replace('_', ' ')} {repo['description'] or ''} {topics}"
+
+def build_tfidf_matrix(repos, min_df=2, max_df=0.5):
+    """Row-normalized sparse TF-IDF matrix over name, description and topics
+    
+    Tokenizes the whole corpus in one regex pass and builds the matrix with
+    array operations. Returns (matrix, vocabulary) where vocabulary[j] is
+    the term of column j.
+    """
+    import numpy as np
+    from scipy import sparse
+    
+    # One pass over all documents, separated by NUL tokens
+    corpus = '\0'.join(_repo_text(repo).replace('\0', ' ') for repo in repos)
+    tokens = re.findall(r'[a-z0-9]+|\0', normalize(corpus))
+    
+    token_ids = {t: i for i, t in enumerate(dict.fromkeys(['\0'] + tokens))}
+    ids = np.fromiter(map(token_ids.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+    is_separator = ids == 0
+    rows = np.cumsum(is_separator)[~is_separator]
+    ids = ids[~is_separator]
+    
+    counts = sparse.csr_matrix(
+        (np.ones(len(ids)), (rows, ids)), shape=(len(repos), len(token_ids))
+    )
+    counts.sum_duplicates()
+    
+    # Document frequencies and the term filter decide which tokens become columns
+    doc_freq = np.bincount(counts.indices, minlength=len(token_ids))
+    max_count = max(1, int(max_df * len(repos)))
+    terms = list(token_ids)
+    keep = np.array([is_term(t) for t in terms]) & (doc_freq >= min_df) & (doc_freq <= max_count)
+    keep[0] = False
+    order = sorted(np.flatnonzero(keep), key=terms.__getitem__)
+    vocabulary = [terms[i] for i in order]
+    counts = counts[:, order].tocsr()
+    doc_freq = doc_freq[order]
+    
+    # Sublinear tf, smoothed idf, L2-normalized rows
+    counts.data = 1.0 + np.log(counts.data)
+    idf = np.log((1.0 + len(repos)) / (1.0 + doc_freq)) + 1.0
+    matrix = counts @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    matrix = sparse.diags(1.0 / norms) @ matrix
+    return matrix.tocsr(), vocabulary
+
+def _kmeans_plus_plus(matrix, n_clusters, rng):
+    """Spread initial centers over a sample using cosine distance"""
+    import numpy as np
+    
+    sample = matrix[rng.choice(matrix.shape[0], min(matrix.shape[0], 20 * n_clusters + 1000), replace=False)]
+    centers = [sample[rng.integers(sample.shape[0])].toarray().ravel()]
+    distances = 1.0 - sample @ centers[0]
+    for _ in range(1, n_clusters):
+        total = distances.clip(min=0).sum()
+        if total <= 0:
+            pick = rng.integers(sample.shape[0])
+        else:
+            pick = rng.choice(sample.shape[0], p=distances.clip(min=0) / total)
+        centers.append(sample[pick].toarray().ravel())
+        distances = np.minimum(distances, 1.0 - sample @ centers[-1])
+    return np.vstack(centers)
+
+def _normalize_rows(centers):
+    import numpy as np
+    norms = np.linalg.norm(centers, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return centers / norms
+
+def minibatch_kmeans(matrix, n_clusters, seed=0, batch_size=2048, max_iter=200, tol=1e-4):
+    """Spherical mini-batch k-means; returns (labels, centers)"""
+    import numpy as np
+    from scipy import sparse
+    
+    rng = np.random.default_rng(seed)
+    n_rows = matrix.shape[0]
+    n_clusters = min(n_clusters, n_rows)
+    centers = _normalize_rows(_kmeans_plus_plus(matrix, n_clusters, rng))
+    counts = np.zeros(n_clusters)
+    
+    for _ in range(max_iter):
+        batch = matrix[rng.choice(n_rows, min(batch_size, n_rows), replace=False)]
+        labels = np.asarray((batch @ centers.T).argmax(axis=1)).ravel()
+        
+        # Per-center sums of the batch rows, then a count-weighted step
+        membership = sparse.csr_matrix(
+            (np.ones(len(labels)), (labels, np.arange(len(labels)))), shape=(n_clusters, len(labels))
+        )
+        sums = np.asarray((membership @ batch).todense())
+        assigned = np.bincount(labels, minlength=n_clusters).astype(float)
+        counts += assigned
+        rate = np.divide(assigned, counts, out=np.zeros(n_clusters), where=counts > 0)[:, None]
+        means = np.divide(sums, assigned[:, None], out=np.zeros_like(sums), where=assigned[:, None] > 0)
+        updated = _normalize_rows((1.0 - rate) * centers + rate * means)
+        
+        shift = np.abs(updated - centers).max()
+        centers = updated
+        if shift < tol:
+            break
+    
+    labels = np.empty(n_rows, dtype=np.int64)
+    for start in range(0, n_rows, 65536):
+        chunk = matrix[start:start + 65536]
+        labels[start:start + chunk.shape[0]] = np.asarray((chunk @ centers.T).argmax(axis=1)).ravel()
+    return labels, centers
+
+def split_oversized(matrix, labels, centers, max_size, seed=0):
+    """Re-cluster every cluster larger than max_size until all fit
+    
+    An oversized cluster is split by k-means on its own rows; the first part
+    keeps its id and the others get new ones. A cluster whose rows all land
+    in one part cannot be split further and is left as it is. Returns the
+    new (labels, centers).
+    """
+    import numpy as np
+    
+    labels = labels.copy()
+    centers = list(centers)
+    pending = list(range(len(centers)))
+    while pending:
+        cluster = pending.pop()
+        members = np.flatnonzero(labels == cluster)
+        if len(members) <= max_size:
+            continue
+        parts = -(-len(members) // max_size)
+        sub_labels, sub_centers = minibatch_kmeans(matrix[members], parts, seed)
+        used = np.unique(sub_labels)
+        if len(used) < 2:
+            continue
+        for n, part in enumerate(used):
+            new_id = cluster if n == 0 else len(centers)
+            if n == 0:
+                centers[cluster] = sub_centers[part]
+            else:
+                centers.append(sub_centers[part])
+            labels[members[sub_labels == part]] = new_id
+            pending.append(new_id)
+    return labels, np.vstack(centers)
+
+def cluster_themes(repos, n_clusters=10, seed=0, top_terms=8, max_size=None):
+    """Cluster repos into themes from TF-IDF vectors instead of keyword lists
+    
+    Returns the same {theme_id: {name, keywords, repos}} shape as
+    analyze_themes. Clusters holding more than max_size repos (default: twice
+    an even share) are split again before naming, so one catch-all cluster
+    cannot swallow a third of the corpus. Each cluster is named after its
+    highest-weighted centroid terms; repos without any informative terms go
+    to 'other'.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError("Cluster mode needs numpy and scipy (pip install numpy scipy)")
+    
+    matrix, vocabulary = build_tfidf_matrix(repos)
+    has_terms = np.diff(matrix.indptr) > 0
+    rows = np.flatnonzero(has_terms)
+    
+    themes = {}
+    if len(rows) and vocabulary:
+        labels, centers = minibatch_kmeans(matrix[rows], n_clusters, seed)
+        if max_size is None:
+            max_size = max(2, -(-2 * len(rows) // n_clusters))
+        labels, centers = split_oversized(matrix[rows], labels, centers, max_size, seed)
+        for cluster, center in enumerate(centers):
+            terms = [vocabulary[j] for j in np.argsort(-center)[:top_terms] if center[j] > 0]
+            themes[f'cluster_{cluster}'] = {
+                'name': ' / '.join(term.title() for term in terms[:3]),
+                'keywords': terms,
+                'repos': []
+            }
+        cluster_of = dict(zip(rows.tolist(), labels.tolist()))
+    else:
+        cluster_of = {}
+    
+    for i, repo in enumerate(repos):
+        if i in cluster_of:
+            themes[f'cluster_{cluster_of[i]}']['repos'].append(repo)
+        else:
+            themes.setdefault('other', {'name': 'Other Projects', 'keywords': [], 'repos': []})['repos'].append(repo)
+    
+    return {k: v for k, v in themes.items() if v['repos']}
+
+def benchmark_matcher(n_themes, n_repos, keywords_per_theme=6, seed=0):
+    """Time the original keyword loop against both matchers on a synthetic corpus
+    
+    Every variant does the whole classification (scores, best theme and
+    assignment per repo), so the timings compare like with like. 'matcher'
+    names the one analyze_themes picks for this table, and 'speedup' is the
+    keyword loop's time over that one's.
+    """
+    rng = random.Random(seed)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz'
+    words = [''.join(rng.choice(alphabet) for _ in range(rng.randint(3, 9))) for _ in range(5000)]
+    themes = {
+        f'theme_{i}': {'name': f'Theme {i}', 'keywords': rng.sample(words, keywords_per_theme)}
+        for i in range(n_themes)
+    }
+    repos = [
+        {'name': rng.choice(words), 'description': ' '.join(rng.choices(words, k=8)), 'topics': []}
+        for _ in range(n_repos)
+    ]
+    
+    def keyword_loop():
+        # The classification analyze_themes did before the matchers
+        grouped = {theme_id: [] for theme_id in themes}
+        other = []
+        for repo in repos:
+            text = f"{repo['name']} {repo['description'] or ''} {' '.join(repo.get('topics', []))}".lower()
+            matched = []
+            for theme_id, theme in themes.items():
+                score = sum(1 for keyword in theme['keywords'] if keyword in text)
+                if score > 0:
+                    matched.append((theme_id, score))
+            if matched:
+                matched.sort(key=lambda x: x[1], reverse=True)
+                grouped[matched[0][0]].append(repo)
+            else:
+                other.append(repo)
+        return grouped, other
+    
+    timings = {}
+    for label, run in (('keyword_loop', keyword_loop),
+                       ('substring', lambda: analyze_themes(repos, themes, matcher='substring')),
+                       ('automaton', lambda: analyze_themes(repos, themes, matcher='automaton'))):
+        start = time.perf_counter()
+        run()
+        timings[label] = time.perf_counter() - start
+    timings['matcher'] = type(compile_themes(themes)[0]).__name__
+    chosen = timings['automaton'] if timings['matcher'] == 'KeywordAutomaton' else timings['substring']
+    timings['speedup'] = timings['keyword_loop'] / chosen
+    return timings
+
+def _cooccurrence_loops(keyword_sets):
+    """Pairwise keyword counts with plain dicts (used when scipy is missing)"""
+    cooccurrence = defaultdict(lambda: defaultdict(int))
+    for keywords in keyword_sets:
+        for i, k1 in enumerate(keywords):
+            for k2 in keywords[i+1:]:
+                cooccurrence[k1][k2] += 1
+                cooccurrence[k2][k1] += 1
+    return {k: dict(v) for k, v in cooccurrence.items()}
+
+def build_keyword_network(keyword_sets, weighting='count', top_k=None):
+    """Symmetric keyword co-occurrence network {k1: {k2: weight}}
+    
+    Co-occurrence is computed as one sparse product B.T @ B of the
+    repo x keyword incidence matrix. weighting is 'count' (repos sharing
+    both keywords), 'pmi' or 'jaccard'; top_k keeps each keyword's k
+    strongest edges (an edge survives if either endpoint keeps it).
+    With the defaults the result equals the original pairwise counts.
+    """
+    try:
+        import numpy as np
+        from scipy import sparse
+    except ImportError:
+        if weighting != 'count' or top_k:
+            raise RuntimeError("Network weighting and pruning need numpy and scipy (pip install numpy scipy)")
+        return _cooccurrence_loops(keyword_sets)
+    
+    terms = {}
+    rows = []
+    cols = []
+    for row, keywords in enumerate(keyword_sets):
+        for keyword in set(keywords):
+            rows.append(row)
+            cols.append(terms.setdefault(keyword, len(terms)))
+    vocabulary = list(terms)
+    
+    incidence = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=(len(keyword_sets), len(vocabulary))
+    )
+    pairs = (incidence.T @ incidence).tocoo()
+    off_diagonal = pairs.row != pairs.col
+    i, j, counts = pairs.row[off_diagonal], pairs.col[off_diagonal], pairs.data[off_diagonal]
+    
+    if weighting == 'count':
+        weights = counts
+    else:
+        doc_freq = np.asarray(incidence.sum(axis=0)).ravel()
+        if weighting == 'pmi':
+            weights = np.log(counts * len(keyword_sets) / (doc_freq[i] * doc_freq[j]))
+        elif weighting == 'jaccard':
+            weights = counts / (doc_freq[i] + doc_freq[j] - counts)
+        else:
+            raise ValueError(f"Unknown network weighting: {weighting}")
+        weights = np.round(weights, 4)
+    
+    if top_k:
+        # Rank each keyword's edges by weight and keep the best k per keyword
+        order = np.lexsort((-weights, i))
+        sorted_rows = i[order]
+        starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+        rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        kept = order[rank < top_k]
+        pair_keys = np.minimum(i, j) * len(vocabulary) + np.maximum(i, j)
+        mask = np.isin(pair_keys, pair_keys[kept])
+        i, j, weights = i[mask], j[mask], weights[mask]
+    
+    network = {}
+    for a, b, weight in zip(i.tolist(), j.tolist(), weights.tolist()):
+        network.setdefault(vocabulary[a], {})[vocabulary[b]] = weight
+    return network
+
+def repo_content_hash(repo):
+    """Hash of the fields that decide a repo's theme and keywords"""
+    payload = json.dumps([repo['name'], repo['description'], repo.get('topics', [])], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def _theme_config_hash(theme_table, word_boundary):
+    payload = json.dumps([theme_table, KEYWORD_TERMS, word_boundary], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def _add_pairs(network, keywords, delta):
+    """Add (or with delta=-1 remove) one repo's keyword pairs in a count network"""
+    for i, k1 in enumerate(keywords):
+        for k2 in keywords[i+1:]:
+            for a, b in ((k1, k2), (k2, k1)):
+                neighbours = network.setdefault(a, {})
+                count = neighbours.get(b, 0) + delta
+                if count:
+                    neighbours[b] = count
+                else:
+                    neighbours.pop(b, None)
+                    if not neighbours:
+                        del network[a]
+
+def analyze_themes_incremental(repos, state_file, themes=None, word_boundary=False):
+    """Keyword themes that only re-score new or changed repos
+    
+    The state file maps full_name -> content hash, assigned theme and
+    keyword set, plus the raw co-occurrence counts. Unchanged repos reuse
+    their stored theme, deleted repos are dropped, and the network is
+    patched with the pairs of the repos that changed. A different theme
+    table or matching mode invalidates the state.
+    
+    Returns (themes, keyword_sets, count_network) with themes in the
+    analyze_themes shape.
+    """
+    theme_table = THEMES if themes is None else themes
+    config = _theme_config_hash(theme_table, word_boundary)
+    
+    state = None
+    if Path(state_file).exists():
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    if not state or state.get('config') != config:
+        state = {'version': 1, 'config': config, 'repos': {}, 'network': {}}
+    entries = state['repos']
+    network = state['network']
+    
+    digests = {}
+    changed = []
+    for repo in repos:
+        digest = digests[repo['full_name']] = repo_content_hash(repo)
+        entry = entries.get(repo['full_name'])
+        if entry is None or entry['hash'] != digest:
+            changed.append(repo)
+    removed = [name for name in entries if name not in digests]
+    
+    for name in removed:
+        _add_pairs(network, entries.pop(name)['keywords'], -1)
+    
+    for theme_id, theme in analyze_themes(changed, theme_table, word_boundary).items():
+        for repo in theme['repos']:
+            previous = entries.get(repo['full_name'])
+            if previous:
+                _add_pairs(network, previous['keywords'], -1)
+            keywords = sorted(extract_keywords(f"{repo['name']} {repo['description'] or ''}", word_boundary))
+            _add_pairs(network, keywords, 1)
+            entries[repo['full_name']] = {
+                'hash': digests[repo['full_name']],
+                'theme': theme_id,
+                'keywords': keywords
+            }
     
-    with open(input_file, 'r') as f:
-        data = json.load(f)
+    tmp_file = Path(f'{state_file}.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    tmp_file.replace(state_file)
     
+    print(f"♻️  Incremental: {len(changed)} re-scored, {len(removed)} removed, "
+          f"{len(repos) - len(changed)} unchanged")
+    metrics.record_cache('theme_state', hits=len(repos) - len(changed), misses=len(changed))
+    
+    # Regroup in input order, exactly as a full analyze_themes run would
+    grouped = {
+        theme_id: {'name': theme['name'], 'keywords': list(theme['keywords']), 'repos': []}
+        for theme_id, theme in theme_table.items()
+    }
+    for repo in repos:
+        theme_id = entries[repo['full_name']]['theme']
+        if theme_id not in grouped:
+            grouped[theme_id] = {'name': 'Other Projects', 'keywords': [], 'repos': []}
+        grouped[theme_id]['repos'].append(repo)
+    grouped = {k: v for k, v in grouped.items() if v['repos']}
+    
+    keyword_sets = [entries[repo['full_name']]['keywords'] for repo in repos]
+    return grouped, keyword_sets, network
+
+def load_repos(data):
+    """RepoRecords from a ripple index of either schema, plus the record fields it carries
+    
+    The fields are written back out unchanged, so a schema 1 input keeps its
+    all_repos shape in the theme rings.
+    """
+    if data['meta'].get('schema_version') == 2:
+        return records_from_table(data['repos'])
     repos = data['all_repos']
-    themes = analyze_themes(repos)
+    fields = list(repos[0]) if repos else []
+    return [RepoRecord.from_dict(r) for r in repos], fields
+
+def load_index_from_store(store):
+    """A ripple index document (schema 1 shape) rebuilt from a RippleStore"""
+    saved = store.get_meta('ripple_index')
+    if saved is None:
+        raise ValueError(f"{store.path} holds no ripple index; run generate-github-index.py --store first")
+    # Only the accounts the saved index covers, merged in the order it merged them
+    accounts = saved['meta'].get('github_users') or [saved['meta']['github_user']]
+    repos = store.repos(accounts=accounts)
+    if saved['meta'].get('schema_version') != 2:
+        # Schema 1 all_repos records don't carry these
+        for repo in repos:
+            del repo['is_fork'], repo['archived']
+    meta = dict(saved['meta'])
+    meta.pop('schema_version', None)
+    return {'meta': meta, 'summary': saved['summary'], 'all_repos': repos}
+
+def create_enhanced_index(input_file, schema=1, themes=None, word_boundary=False,
+                          mode='keywords', n_clusters=10, seed=0,
+                          network_weighting='count', network_top_k=None, state_file=None, store=None):
+    """Create enhanced thematic index
+    
+    mode='keywords' assigns themes from the keyword table; mode='clusters'
+    derives them by TF-IDF clustering (needs numpy/scipy). With a
+    state_file, keyword themes are updated incrementally. With a
+    RippleStore, repos are read from it instead of input_file and the
+    theme assignments and keywords are written back.
+    
+    Schema 1 embeds full repo records in every theme ring. Schema 2 writes
+    a single columnar 'repos' table and rings list 'repo_ids' into it.
+    """
+    
+    with metrics.stage('load'):
+        if store:
+            data = load_index_from_store(store)
+        else:
+            with open(input_file, 'r') as f:
+                data = json.load(f)
+        repos, fields = load_repos(data)
+    
+    return build_thematic_index(data, repos, fields, schema, themes, word_boundary, mode, n_clusters, seed,
+                                network_weighting, network_top_k, state_file, store)
+
+def build_thematic_index(data, repos, fields, schema=1, themes=None, word_boundary=False,
+                         mode='keywords', n_clusters=10, seed=0,
+                         network_weighting='count', network_top_k=None, state_file=None, store=None):
+    """Thematic index for a ripple index already in memory
+    
+    `data` supplies meta, summary and (schema 2) the repo table; `repos`
+    are its RepoRecords and `fields` the record fields written into theme
+    rings. The pipeline runner hands over the records it just fetched.
+    """
+    keyword_sets = None
+    network = None
+    with metrics.stage('themes'):
+        if state_file:
+            if mode == 'clusters':
+                raise ValueError("Incremental analysis only supports keyword themes")
+            themes, keyword_sets, network = analyze_themes_incremental(repos, state_file, themes, word_boundary)
+        elif mode == 'clusters':
+            themes = cluster_themes(repos, n_clusters, seed)
+        else:
+            themes = analyze_themes(repos, themes, word_boundary)
+    
+    meta = dict(data['meta'])
+    meta.pop('schema_version', None)
+    if schema == 2:
+        meta['schema_version'] = 2
     
     # Create enhanced structure
     enhanced = {
-        'meta': data['meta'],
+        'meta': meta,
         'summary': data['summary'],
         'themes': {}
     }
     
+    if schema == 2:
+        if 'repos' in data:
+            enhanced['repos'] = data['repos']
+        else:
+            enhanced['repos'] = records_table(repos, fields)
+        repo_ids = {id(r): i for i, r in enumerate(repos)}
+    
     # Convert themes to ring structure
     theme_rings = []
     for idx, (theme_id, theme_data) in enumerate(sorted(themes.items(), key=lambda x: len(x[1]['repos']), reverse=True)):
@@ -162,26 +796,34 @@ def create_enhanced_index(input_file):
             'color': [
                 '#ff6b35', '#f7931e', '#fdc500', '#c1d82f', '#8ac926',
                 '#52b788', '#36a9e1', '#5390d9', '#9b59b6', '#e74c3c'
-            ][idx % 10],
-            'repos': theme_data['repos']
+            ][idx % 10]
         }
+        if schema == 2:
+            ring['repo_ids'] = [repo_ids[id(r)] for r in theme_data['repos']]
+        else:
+            ring['repos'] = [r.to_dict(fields) for r in theme_data['repos']]
         theme_rings.append(ring)
     
     enhanced['theme_rings'] = theme_rings
     
     # Add co-occurrence matrix
-    cooccurrence = defaultdict(lambda: defaultdict(int))
-    for repo in repos:
-        text = f"{repo['name']} {repo['description'] or ''}"
-        keywords = extract_keywords(text)
-        for i, k1 in enumerate(keywords):
-            for k2 in keywords[i+1:]:
-                cooccurrence[k1][k2] += 1
-                cooccurrence[k2][k1] += 1
+    with metrics.stage('network'):
+        if keyword_sets is None:
+            keyword_sets = [
+                extract_keywords(f"{repo['name']} {repo['description'] or ''}", word_boundary)
+                for repo in repos
+            ]
+        if network is None or network_weighting != 'count' or network_top_k:
+            network = build_keyword_network(keyword_sets, network_weighting, network_top_k)
+    enhanced['keyword_network'] = network
     
-    enhanced['keyword_network'] = {
-        k: dict(v) for k, v in cooccurrence.items()
-    }
+    if store:
+        with metrics.stage('store'):
+            store.set_themes(
+                {theme_id: {'name': t['name'], 'keywords': t['keywords']} for theme_id, t in themes.items()},
+                {repo['full_name']: theme_id for theme_id, t in themes.items() for repo in t['repos']},
+                {repo['full_name']: keywords for repo, keywords in zip(repos, keyword_sets)}
+            )
     
     # Theme summary
     enhanced['theme_summary'] = {
@@ -196,18 +838,78 @@ def create_enhanced_index(input_file):
     return enhanced
 
 if __name__ == '__main__':
-    input_file = Path(__file__).parent / 'github-ripple-index.json'
-    output_file = Path(__file__).parent / 'github-thematic-index.json'
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Cluster the ripple index into thematic rings')
+    parser.add_argument('--input', default=str(Path(__file__).parent / 'github-ripple-index.json'))
+    parser.add_argument('--output', default=str(Path(__file__).parent / 'github-thematic-index.json'))
+    parser.add_argument('--schema', type=int, choices=[1, 2], default=1,
+                        help='1: original shape read by the viewers; 2: normalized repo table + ring ids')
+    parser.add_argument('--themes', help='JSON theme table ({theme_id: {name, keywords}}) to use instead of the built-in one')
+    parser.add_argument('--word-boundary', action='store_true',
+                        help="match keywords as whole words ('ai' no longer matches 'chair')")
+    parser.add_argument('--mode', choices=['keywords', 'clusters'], default='keywords',
+                        help='keyword table themes, or TF-IDF k-means clusters (needs numpy/scipy)')
+    parser.add_argument('--clusters', type=int, default=10, help='number of clusters in clusters mode')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for clusters mode')
+    parser.add_argument('--network-weighting', choices=['count', 'pmi', 'jaccard'], default='count',
+                        help='keyword_network edge weights (pmi/jaccard need numpy/scipy)')
+    parser.add_argument('--network-top-k', type=int,
+                        help="keep only each keyword's k strongest edges")
+    parser.add_argument('--incremental', nargs='?', metavar='STATE_FILE',
+                        const=str(Path(__file__).parent / '.theme-state.json'),
+                        help='only re-score new or changed repos, keeping state in STATE_FILE')
+    parser.add_argument('--store',
+                        help='read repos from this SQLite store instead of --input and save themes back to it')
+    parser.add_argument('--shard-dir',
+                        help='also write a ring manifest plus one shard per theme ring for lazy loading')
+    parser.add_argument('--bench-matcher', nargs=2, type=int, metavar=('THEMES', 'REPOS'),
+                        help='benchmark keyword matching on a synthetic corpus and exit')
+    add_layout_arguments(parser)
+    add_output_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    instrumentation = start_instrumentation(args, 'analyze-themes')
+    
+    if args.bench_matcher:
+        timings = benchmark_matcher(*args.bench_matcher)
+        print(f"⏱️  {args.bench_matcher[0]:,} themes × {args.bench_matcher[1]:,} repos")
+        print(f"   Keyword loop: {timings['keyword_loop']:.2f}s")
+        print(f"   Substring:    {timings['substring']:.2f}s")
+        print(f"   Automaton:    {timings['automaton']:.2f}s")
+        print(f"   analyze_themes uses {timings['matcher']}: {timings['speedup']:.1f}x the keyword loop")
+        raise SystemExit(0)
+    
+    input_file = Path(args.input)
+    output_file = Path(args.output)
     
     print("📊 Analyzing themes...")
-    enhanced = create_enhanced_index(input_file)
+    store = RippleStore(args.store) if args.store else None
+    themes = load_themes(args.themes) if args.themes else None
+    enhanced = create_enhanced_index(input_file, schema=args.schema, themes=themes,
+                                     word_boundary=args.word_boundary, mode=args.mode,
+                                     n_clusters=args.clusters, seed=args.seed,
+                                     network_weighting=args.network_weighting,
+                                     network_top_k=args.network_top_k,
+                                     state_file=args.incremental, store=store)
+    if store:
+        store.close()
+    if args.layout:
+        with metrics.stage('layout'):
+            add_layout(enhanced, 'theme_rings', args.layout)
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(enhanced, f, indent=2, ensure_ascii=False)
+    with metrics.stage('write'):
+        written = write_artifact(enhanced, output_file, **output_options(args))
+        if args.shard_dir:
+            written.update(write_shards(enhanced, args.shard_dir, 'theme_rings', detach=('keyword_network',),
+                                        **output_options(args)))
     
     print(f"\n✅ Thematic analysis complete: {output_file}")
+    print_artifact_report(written)
     print(f"\n🎨 Themes identified: {enhanced['theme_summary']['total_themes']}")
     print(f"📈 Largest theme: {enhanced['theme_summary']['largest_theme']}")
     print(f"\n📊 Theme Distribution:")
     for theme, count in sorted(enhanced['theme_summary']['theme_distribution'].items(), key=lambda x: x[1], reverse=True):
         print(f"   {theme}: {count} repos")
+    
+    instrumentation.finish()
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Benchmark the pipeline stages on a seeded synthetic corpus
+
+Generates GitHub API repo payloads and an HTML page tree at the requested
+sizes and times each stage on its own:
+
+    fetch        paginated fetch through GitHubClient, from a local API stand-in
+    categorize   categorize_repos
+    rings        generate_ring_structure
+    themes       analyze_themes
+    network      keyword co-occurrence build (build_keyword_network)
+    serialize    JSON encoding of the ring index
+    pages        extract_html_metadata over the page tree
+
+Results are written as JSON. With --baseline every stage is compared with
+a stored run, and the exit status is 1 when one got slower than the
+tolerance allows. Nothing touches the network.
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+from ripple_output import encode_json, write_artifact
+from ripple_records import RepoRecord
+
+github_index = importlib.import_module('generate-github-index')
+theme_analysis = importlib.import_module('analyze-themes')
+sitemap = importlib.import_module('generate-detailed-sitemap')
+
+REPO_STAGES = ('fetch', 'categorize', 'rings', 'themes', 'network', 'serialize')
+PAGE_STAGES = ('pages',)
+STAGES = REPO_STAGES + PAGE_STAGES
+
+# Corpus sizes per --scale: (repo counts, page counts)
+SCALES = {
+    'small': ((1000,), (10,)),
+    'medium': ((1000, 10000, 100000), (10, 100, 1000)),
+    'full': ((1000, 10000, 100000, 1000000), (10, 100, 1000, 10000, 100000))
+}
+
+# Timestamps are generated relative to this instant and repos are
+# categorized against it, so a seed always gives the same buckets
+CORPUS_NOW = datetime(2025, 11, 9, 12, 0, 0)
+
+LANGUAGES = ['HTML'] * 12 + ['JavaScript'] * 4 + ['CSS', 'CSS', 'Python', 'TypeScript', None, None]
+
+def _vocabulary(rng, filler=2000):
+    """Theme keywords mixed with random filler words, so matching has work to do"""
+    alphabet = 'abcdefghijklmnopqrstuvwxyz'
+    keywords = sorted(
+        {k for theme in theme_analysis.THEMES.values() for k in theme['keywords']}
+        | set(theme_analysis.KEYWORD_TERMS)
+    )
+    filler_words = [''.join(rng.choice(alphabet) for _ in range(rng.randint(3, 10))) for _ in range(filler)]
+    return keywords, filler_words
+
+def _timestamp(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def synthetic_repos(count, seed=0, owner='bench'):
+    """GitHub API repo payloads with the fields of a real repo listing
+    
+    Descriptions mix theme keywords into filler text, stars follow a long
+    tail and update times spread over the activity buckets.
+    """
+    rng = random.Random(seed)
+    keywords, words = _vocabulary(rng)
+    owner_payload = {'login': owner, 'id': 1, 'type': 'User', 'site_admin': False,
+                     'html_url': f'https://github.com/{owner}'}
+    repos = []
+    for i in range(count):
+        name = '-'.join(rng.sample(words, rng.randint(1, 3))) + f'-{i}'
+        text = rng.choices(words, k=rng.randint(3, 14)) + rng.sample(keywords, rng.randint(0, 3))
+        rng.shuffle(text)
+        created = CORPUS_NOW - timedelta(days=rng.randint(30, 3000), seconds=rng.randint(0, 86399))
+        updated = created + (CORPUS_NOW - created) * rng.random() ** 3
+        stars = min(int(rng.paretovariate(1.2)) - 1, 5000)
+        forks = min(int(rng.paretovariate(1.6)) - 1, 1000)
+        has_pages = rng.random() < 0.7
+        repos.append({
+            'id': 100000 + i,
+            'node_id': f'R_{seed}_{i}',
+            'name': name,
+            'full_name': f'{owner}/{name}',
+            'private': False,
+            'owner': owner_payload,
+            'html_url': f'https://github.com/{owner}/{name}',
+            'description': ' '.join(text) if rng.random() < 0.9 else None,
+            'fork': rng.random() < 0.1,
+            'url': f'https://api.github.com/repos/{owner}/{name}',
+            'created_at': _timestamp(created),
+            'updated_at': _timestamp(updated),
+            'pushed_at': _timestamp(updated),
+            'git_url': f'git://github.com/{owner}/{name}.git',
+            'clone_url': f'https://github.com/{owner}/{name}.git',
+            'homepage': f'https://{owner}.github.io/{name}/' if has_pages and rng.random() < 0.5 else None,
+            'size': int(rng.lognormvariate(6, 2)),
+            'stargazers_count': stars,
+            'watchers_count': stars,
+            'language': rng.choice(LANGUAGES),
+            'has_issues': True,
+            'has_projects': True,
+            'has_wiki': False,
+            'has_pages': has_pages,
+            'forks_count': forks,
+            'archived': rng.random() < 0.03,
+            'disabled': False,
+            'open_issues_count': rng.randint(0, 3),
+            'license': None,
+            'topics': rng.sample(keywords, rng.randint(0, 3)) if rng.random() < 0.2 else [],
+            'visibility': 'public',
+            'forks': forks,
+            'open_issues': 0,
+            'watchers': stars,
+            'default_branch': 'main'
+        })
+    return repos
+
+# Snippets a page body is assembled from; several carry feature detector terms
+PAGE_SNIPPETS = [
+    '<div class="grid"><div class="cell">{word}</div><div class="cell">{word}</div></div>',
+    '<p>{text}</p>',
+    '<canvas id="{word}" width="640" height="480"></canvas>',
+    '<section class="bauhaus"><h2>{word}</h2><p>{text}</p></section>',
+    '<button onclick="exportData()">Export JSON</button>',
+    '<ul class="playlist"><li>{word}</li><li>{word}</li></ul>',
+]
+SCRIPT_SNIPPETS = [
+    'function {word}(a, b) {{ return a + b; }}',
+    'const {word} = document.getElementById("{word}");',
+    'let {word} = [];',
+    'const observer = new IntersectionObserver(() => {{}}); // observer system',
+    'fetch("https://api.github.com/users/{word}/repos").then(r => r.json());',
+]
+
+def synthetic_pages(root, count, seed=0):
+    """Write `count` HTML pages under root; returns their paths"""
+    rng = random.Random(seed)
+    _, words = _vocabulary(rng, filler=500)
+    root = Path(root)
+    paths = []
+    for i in range(count):
+        fill = lambda template: template.format(
+            word=rng.choice(words), text=' '.join(rng.choices(words, k=rng.randint(8, 40))))
+        libraries = [
+            '<script src="https://cdn.jsdelivr.net/npm/three@0.160.0/build/three.min.js"></script>',
+            '<script src="https://unpkg.com/tone/build/Tone.js"></script>'
+        ]
+        # A long tail of page sizes, like the real tree (a few pages are hundreds of KB)
+        blocks = min(int(rng.paretovariate(1.3) * 20), 5000)
+        body = '\n'.join(fill(rng.choice(PAGE_SNIPPETS)) for _ in range(blocks))
+        script = '\n'.join(fill(rng.choice(SCRIPT_SNIPPETS)) for _ in range(blocks // 2 + 1))
+        html = (
+            f'<!DOCTYPE html>\n<html>\n<head>\n<title>{fill("{text}")[:60]}</title>\n'
+            f'<meta name="description" content="{fill("{text}")[:150]}">\n'
+            f'<link rel="stylesheet" href="style-{i % 7}.css">\n'
+            + '\n'.join(rng.sample(libraries, rng.randint(0, 2)))
+            + f'\n</head>\n<body>\n{body}\n<script>\n{script}\n</script>\n</body>\n</html>\n'
+        )
+        path = root / f'page-{i:06d}.html'
+        path.write_text(html, encoding='utf-8')
+        paths.append(path)
+    return paths
+
+class _StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    api = None
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        if len(parts) != 3 or parts[0] not in ('users', 'orgs') or parts[2] != 'repos' \
+                or parts[1] != self.api.owner:
+            return self._send(404, b'{"message": "Not Found"}')
+        query = parse_qs(url.query)
+        page = int(query.get('page', ['1'])[0])
+        per_page = int(query.get('per_page', ['30'])[0])
+        last = max(1, -(-len(self.api.repos) // per_page))
+        
+        links = [f'<{self.api.url}{url.path}?per_page={per_page}&page={last}>; rel="last"']
+        if page < last:
+            links.insert(0, f'<{self.api.url}{url.path}?per_page={per_page}&page={page + 1}>; rel="next"')
+        body, etag = self.api.page(page, per_page)
+        headers = {'Link': ', '.join(links), 'ETag': etag}
+        if self.headers.get('If-None-Match') == etag:
+            return self._send(304, b'', headers)
+        self._send(200, body, headers)
+    
+    def _send(self, status, body, headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-RateLimit-Remaining', '5000')
+        self.send_header('X-RateLimit-Reset', str(int(time.time()) + 3600))
+        for name, value in dict(headers).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+class StandinAPI:
+    """Local stand-in for GitHub's repo listing endpoints over a fixed corpus
+    
+    Serves /users/<owner>/repos and /orgs/<owner>/repos with Link headers,
+    rate-limit headers and ETags (a matching If-None-Match gets a 304),
+    like the real API. Pages are encoded once, so repeated fetches measure
+    the client rather than the server. Subclasses can swap in their own
+    handler (a _StandinHandler subclass) to script failures.
+    """
+    
+    handler = _StandinHandler
+    
+    def __init__(self, repos, owner='bench'):
+        self.repos = repos
+        self.owner = owner
+        self.url = None
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._server = None
+    
+    def page(self, page, per_page):
+        """(body, ETag) of one listing page"""
+        with self._lock:
+            cached = self._pages.get((page, per_page))
+            if cached is None:
+                chunk = self.repos[(page - 1) * per_page:page * per_page]
+                body = json.dumps(chunk).encode('utf-8')
+                cached = self._pages[(page, per_page)] = (body, f'"{hashlib.sha1(body).hexdigest()}"')
+        return cached
+    
+    def __enter__(self):
+        handler = type('Handler', (self.handler,), {'api': self})
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self._server.server_port}'
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+def time_runs(run, repeat):
+    """Wall-clock seconds of `repeat` calls of run()"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return {
+        'min': round(min(timings), 6),
+        'median': round(statistics.median(timings), 6),
+        'runs': [round(t, 6) for t in timings]
+    }
+
+def benchmark_repos(count, stages, seed=0, repeat=3, concurrent=False):
+    """{stage: timing} for the repo stages on a synthetic corpus of `count` repos"""
+    payloads = synthetic_repos(count, seed)
+    records = [RepoRecord.from_api(r) for r in payloads]
+    results = {}
+    
+    if 'fetch' in stages:
+        with StandinAPI(payloads) as api:
+            def fetch():
+                client = github_index.GitHubClient(api_base=api.url)
+                try:
+                    # Silence the per-page progress lines
+                    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                        fetched = github_index.fetch_all_github_repos(api.owner, client=client,
+                                                                      concurrent=concurrent)
+                finally:
+                    client.close()
+                if len(fetched) != count:
+                    raise RuntimeError(f"fetched {len(fetched)} of {count} repos from the stand-in")
+            results['fetch'] = time_runs(fetch, repeat)
+    del payloads
+    
+    categories = github_index.categorize_repos(records, now=CORPUS_NOW)
+    if 'categorize' in stages:
+        results['categorize'] = time_runs(lambda: github_index.categorize_repos(records, now=CORPUS_NOW), repeat)
+    if 'rings' in stages:
+        results['rings'] = time_runs(lambda: github_index.generate_ring_structure(records, categories), repeat)
+    if 'themes' in stages:
+        results['themes'] = time_runs(lambda: theme_analysis.analyze_themes(records), repeat)
+    if 'network' in stages:
+        keyword_sets = [theme_analysis.extract_keywords(f"{r.name} {r.description or ''}") for r in records]
+        results['network'] = time_runs(lambda: theme_analysis.build_keyword_network(keyword_sets), repeat)
+    if 'serialize' in stages:
+        index = github_index.build_index(records, 'bench')
+        results['serialize'] = time_runs(lambda: encode_json(index), repeat)
+    return results
+
+def benchmark_pages(count, seed=0, repeat=3):
+    """{'pages': timing} for extracting metadata from `count` synthetic pages"""
+    with tempfile.TemporaryDirectory(prefix='ripple-bench-') as root:
+        paths = synthetic_pages(root, count, seed)
+        scanner = sitemap.FeatureScanner()
+        
+        def extract_all():
+            for path in paths:
+                sitemap.extract_html_metadata(path, scanner)
+        return {'pages': time_runs(extract_all, repeat)}
+
+def _optional_modules():
+    """Which optional accelerators were importable (they change some timings)"""
+    available = {}
+    for name in ('numpy', 'scipy', 'brotli'):
+        try:
+            importlib.import_module(name)
+            available[name] = True
+        except ImportError:
+            available[name] = False
+    return available
+
+def run_benchmarks(repo_counts, page_counts, stages=STAGES, seed=0, repeat=3, concurrent=False):
+    """Benchmark document: meta plus results[stage][size] timings"""
+    results = {}
+    for count in repo_counts:
+        if not set(stages) & set(REPO_STAGES):
+            break
+        print(f"⏱️  {count:,} repos...")
+        for stage, timing in benchmark_repos(count, stages, seed, repeat, concurrent).items():
+            results.setdefault(stage, {})[str(count)] = timing
+            print(f"   {stage:<11} {timing['min']:.4f}s")
+    if 'pages' in stages:
+        for count in page_counts:
+            print(f"⏱️  {count:,} pages...")
+            timing = benchmark_pages(count, seed, repeat)['pages']
+            results.setdefault('pages', {})[str(count)] = timing
+            print(f"   {'pages':<11} {timing['min']:.4f}s")
+    
+    meta = {
+        'generated': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'optional_modules': _optional_modules(),
+        'seed': seed,
+        'repeat': repeat,
+        'concurrent_fetch': concurrent,
+        'repo_counts': list(repo_counts),
+        'page_counts': list(page_counts)
+    }
+    return {'meta': meta, 'results': results}
+
+def compare_to_baseline(current, baseline, tolerance=0.2):
+    """[(stage, size, baseline s, current s, ratio, regressed)] for stages timed in both
+    
+    Compares best-of-repeat times, which are the least noisy; a stage has
+    regressed when it is more than `tolerance` slower than the baseline.
+    """
+    comparisons = []
+    for stage, sizes in current['results'].items():
+        for size, timing in sizes.items():
+            before = baseline['results'].get(stage, {}).get(size)
+            if not before or not before['min']:
+                continue
+            ratio = timing['min'] / before['min']
+            comparisons.append((stage, size, before['min'], timing['min'], ratio, ratio > 1 + tolerance))
+    return comparisons
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline stages on a synthetic corpus')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                        help='preset corpus sizes (small: 1k repos/10 pages, full: up to 1M repos/100k pages)')
+    parser.add_argument('--repos', type=int, nargs='+', metavar='N', help='repo corpus sizes (overrides --scale)')
+    parser.add_argument('--pages', type=int, nargs='+', metavar='N', help='page tree sizes (overrides --scale)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage; the best and the median are kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--concurrent', action='store_true', help='fetch pages in parallel')
+    parser.add_argument('--output', default=str(Path(__file__).parent / 'benchmark-results.json'))
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown against the baseline before failing (0.2 = 20%%)')
+    args = parser.parse_args()
+    
+    repo_counts, page_counts = SCALES[args.scale]
+    report = run_benchmarks(args.repos or repo_counts, args.pages or page_counts, args.stages,
+                            args.seed, args.repeat, args.concurrent)
+    write_artifact(report, args.output, pretty=True, compression=())
+    print(f"\n✅ Results written: {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        comparisons = compare_to_baseline(report, baseline, args.tolerance)
+        print(f"\n📏 Against {args.baseline}:")
+        if not comparisons:
+            print("   No stage was timed at the same size in both runs")
+        for stage, size, before, after, ratio, regressed in comparisons:
+            marker = '❌' if regressed else '  '
+            print(f" {marker} {stage:<11} @ {int(size):>9,}: {before:.4f}s → {after:.4f}s ({ratio - 1:+.0%})")
+        regressions = [c for c in comparisons if c[5]]
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%}")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Build a prebuilt search index for the viewers from the thematic index
+
+Output (github-search-index.json):
+    repos      full_name per repo id
+    terms      sorted token vocabulary
+    postings   per term, the ids of repos containing it, delta-encoded
+               (decode with a running sum)
+    prefixes   optional: prefix -> [start, end) range into terms
+    trigrams   optional: trigram -> ids of terms containing it
+
+Repo ids follow the thematic index: positions in the 'repos' table for
+schema 2, otherwise the order repos appear when walking theme_rings.
+"""
+
+import json
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from ripple_metrics import metrics, add_metrics_arguments, start_instrumentation
+from ripple_output import write_artifact, print_artifact_report, add_output_arguments, output_options
+from ripple_records import records_from_table
+from ripple_text import words
+
+def load_themed_repos(data):
+    """[(repo, theme ring)] in repo id order, for either thematic schema"""
+    if data['meta'].get('schema_version') == 2:
+        repos, _ = records_from_table(data['repos'])
+        themed = [None] * len(repos)
+        for ring in data['theme_rings']:
+            for repo_id in ring['repo_ids']:
+                themed[repo_id] = ring
+        return list(zip(repos, themed))
+    return [(repo, ring) for ring in data['theme_rings'] for repo in ring['repos']]
+
+def repo_search_text(repo, ring):
+    """The searchable text of a repo: name, description, topics and theme"""
+    parts = [repo['name'], repo.get('description') or '', ' '.join(repo.get('topics') or [])]
+    if ring:
+        parts += [ring['theme_name'], ring['theme_id']]
+    return ' '.join(parts)
+
+def build_search_index(themed_repos, prefix_length=0, trigrams=False):
+    """Inverted index from tokens to posting lists of repo ids"""
+    postings = defaultdict(list)
+    for repo_id, (repo, ring) in enumerate(themed_repos):
+        # Repo ids are visited in order, so every posting list comes out sorted
+        for token in set(words(repo_search_text(repo, ring))):
+            postings[token].append(repo_id)
+    
+    terms = sorted(postings)
+    index = {
+        'repos': [repo['full_name'] for repo, _ in themed_repos],
+        'terms': terms,
+        'postings': [delta_encode(postings[term]) for term in terms]
+    }
+    
+    if prefix_length:
+        # Terms are sorted, so every prefix covers one contiguous range
+        prefixes = {}
+        for term_id, term in enumerate(terms):
+            for length in range(1, min(prefix_length, len(term)) + 1):
+                prefix = term[:length]
+                if prefix in prefixes:
+                    prefixes[prefix][1] = term_id + 1
+                else:
+                    prefixes[prefix] = [term_id, term_id + 1]
+        index['prefixes'] = prefixes
+    
+    if trigrams:
+        table = defaultdict(list)
+        for term_id, term in enumerate(terms):
+            for gram in dict.fromkeys(term[i:i + 3] for i in range(len(term) - 2)):
+                table[gram].append(term_id)
+        index['trigrams'] = dict(sorted(table.items()))
+    
+    return index
+
+def delta_encode(ids):
+    previous = 0
+    deltas = []
+    for repo_id in ids:
+        deltas.append(repo_id - previous)
+        previous = repo_id
+    return deltas
+
+def delta_decode(deltas):
+    total = 0
+    ids = []
+    for delta in deltas:
+        total += delta
+        ids.append(total)
+    return ids
+
+def create_search_index(input_file, prefix_length=0, trigrams=False):
+    """Search index artifact for a thematic index file"""
+    with open(input_file, 'r') as f:
+        data = json.load(f)
+    return search_index_document(data, Path(input_file).name, prefix_length, trigrams)
+
+def search_index_document(data, source, prefix_length=0, trigrams=False):
+    """Search index artifact for a thematic index already in memory"""
+    index = build_search_index(load_themed_repos(data), prefix_length, trigrams)
+    meta = {
+        'generated': datetime.now().isoformat(),
+        'source': source,
+        'repo_count': len(index['repos']),
+        'term_count': len(index['terms'])
+    }
+    return {'meta': meta, **index}
+
+def search(index, query):
+    """Repo full_names matching every query token (the last one as a prefix)
+    
+    The same lookup the viewers do in JavaScript, for checking an index
+    from Python.
+    """
+    tokens = words(query)
+    terms = index['terms']
+    matches = None
+    for position, token in enumerate(tokens):
+        start = bisect_left(terms, token)
+        if position < len(tokens) - 1:
+            end = start + 1 if start < len(terms) and terms[start] == token else start
+        else:
+            # Sorted vocabulary: the terms with this prefix are contiguous
+            end = bisect_left(terms, token + '\uffff', start)
+        ids = set()
+        for term_id in range(start, end):
+            ids.update(delta_decode(index['postings'][term_id]))
+        matches = ids if matches is None else matches & ids
+        if not matches:
+            return []
+    return [index['repos'][i] for i in sorted(matches or ())]
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Build the client-side search index for the viewers')
+    parser.add_argument('--input', default=str(Path(__file__).parent / 'github-thematic-index.json'))
+    parser.add_argument('--output', default=str(Path(__file__).parent / 'github-search-index.json'))
+    parser.add_argument('--prefixes', type=int, default=0, metavar='N',
+                        help='add a prefix table for prefixes up to N characters')
+    parser.add_argument('--trigrams', action='store_true', help='add a trigram table for substring search')
+    parser.add_argument('--query', help='look up a query in the built index and print the matches')
+    add_output_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    instrumentation = start_instrumentation(args, 'build-search-index')
+    
+    print("🔎 Building search index...")
+    with metrics.stage('search_index'):
+        index = create_search_index(args.input, args.prefixes, args.trigrams)
+    with metrics.stage('write'):
+        written = write_artifact(index, args.output, **output_options(args))
+    
+    print(f"\n✅ Search index generated: {args.output}")
+    print(f"📇 {index['meta']['term_count']:,} terms over {index['meta']['repo_count']:,} repos")
+    print_artifact_report(written)
+    
+    if args.query:
+        matches = search(index, args.query)
+        print(f"\n🔍 '{args.query}': {len(matches)} matches")
+        for full_name in matches[:20]:
+            print(f"   {full_name}")
+    
+    instrumentation.finish()
@@ -3,17 +3,33 @@
 Generate detailed sitemap with metadata extracted from HTML files
 """
 
+import codecs
+import fnmatch
+import hashlib
+import io
 import json
 import os
 import re
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from html.parser import HTMLParser
 from datetime import datetime
 
+from ripple_metrics import metrics, add_metrics_arguments, start_instrumentation
+from ripple_output import JSONStreamWriter, print_artifact_report, add_output_arguments, output_options
+from ripple_store import RippleStore
+
 class HTMLMetadataExtractor(HTMLParser):
-    """Extract metadata from HTML files"""
+    """Extract metadata from HTML files
     
-    def __init__(self):
+    Inline script bodies are only kept (in script_content) when
+    keep_script_content=True; by default they are discarded as they arrive.
+    """
+    
+    def __init__(self, keep_script_content=False):
         super().__init__()
         self.title = None
         self.meta_description = None
@@ -23,10 +39,13 @@ class HTMLMetadataExtractor(HTMLParser):
         self.h1_tags = []
         self.in_title = False
         self.in_script = False
+        self.keep_script_content = keep_script_content
         self.script_content = ""
+        self._title_text = None
         
     def handle_starttag(self, tag, attrs):
         attrs_dict = dict(attrs)
+        self._title_text = None
         
         if tag == 'title':
             self.in_title = True
@@ -53,53 +72,296 @@ class HTMLMetadataExtractor(HTMLParser):
     
     def handle_data(self, data):
         if self.in_title:
-            self.title = data.strip()
-        elif self.in_script:
+            # A streamed feed can deliver one text run in several pieces
+            self._title_text = (self._title_text or '') + data
+            self.title = self._title_text.strip()
+        elif self.in_script and self.keep_script_content:
             self.script_content += data
     
     def handle_endtag(self, tag):
+        self._title_text = None
         if tag == 'title':
             self.in_title = False
         elif tag == 'script':
             self.in_script = False
             self.script_content = ""
 
-def extract_html_metadata(file_path):
-    """Extract metadata from an HTML file"""
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
+class ScriptBodyFilter:
+    """Strip inline <script> bodies from streamed HTML before it is parsed
+    
+    HTMLParser buffers a whole script element until its closing tag, so a
+    multi-megabyte inline bundle would sit in memory at once. The filter
+    passes the <script> tags through and drops what is between them.
+    Comments are passed through untouched, as the parser would skip them.
+    """
+    
+    _start = re.compile(r'<!--|<script(?=[\s/>])[^>]*>', re.I)
+    _end = re.compile(r'</\s*script\s*>', re.I)
+    
+    def __init__(self):
+        self.in_script = False
+        self.pending = ''
+    
+    def feed(self, text):
+        text = self.pending + text
+        self.pending = ''
+        out = []
+        pos = 0
+        
+        while pos < len(text):
+            if self.in_script:
+                match = self._end.search(text, pos)
+                if not match:
+                    # Hold back a possible partial closing tag
+                    lt = text.rfind('<', max(pos, len(text) - 64))
+                    if lt != -1:
+                        self.pending = text[lt:]
+                    return ''.join(out)
+                out.append(match.group())
+                pos = match.end()
+                self.in_script = False
+                continue
+            
+            match = self._start.search(text, pos)
+            if not match:
+                # Hold back a possible partial '<script' or '<!--' at the end
+                lt = text.rfind('<', max(pos, len(text) - 1024))
+                tail = text[lt:].lower() if lt != -1 else ''
+                if tail and '>' not in tail and (
+                    tail.startswith('<script') or '<script'.startswith(tail) or '<!--'.startswith(tail)
+                ):
+                    out.append(text[pos:lt])
+                    self.pending = text[lt:]
+                else:
+                    out.append(text[pos:])
+                return ''.join(out)
             
-        parser = HTMLMetadataExtractor()
-        parser.feed(content)
-        
-        # Additional analysis
-        features = []
-        
-        # Check for common frameworks/libraries
-        if 'three.js' in content.lower() or 'three.min.js' in content.lower():
-            features.append('Three.js 3D')
-        if 'tone.js' in content.lower():
-            features.append('Tone.js Audio')
-        if 'github api' in content.lower() or 'api.github.com' in content.lower():
-            features.append('GitHub API')
-        if 'playlist' in content.lower():
-            features.append('Playlist System')
-        if 'export' in content.lower() and ('json' in content.lower() or 'csv' in content.lower()):
-            features.append('Export Functionality')
-        if 'bauhaus' in content.lower():
-            features.append('Bauhaus Design')
-        if 'grid' in content.lower() and 'cell' in content.lower():
-            features.append('Grid System')
-        if 'canvas' in content.lower():
-            features.append('Canvas Rendering')
-        if 'observer' in content.lower() and 'system' in content.lower():
-            features.append('Observer Pattern')
-        
-        # Count elements
-        function_count = len(re.findall(r'\bfunction\s+\w+', content))
-        const_count = len(re.findall(r'\bconst\s+\w+', content))
-        let_count = len(re.findall(r'\blet\s+\w+', content))
+            if match.group() == '<!--':
+                close = text.find('-->', match.end())
+                if close == -1:
+                    out.append(text[pos:match.start()])
+                    self.pending = text[match.start():]
+                    return ''.join(out)
+                out.append(text[pos:close + 3])
+                pos = close + 3
+            else:
+                out.append(text[pos:match.end()])
+                pos = match.end()
+                self.in_script = True
+        
+        return ''.join(out)
+    
+    def close(self):
+        """Flush whatever was held back at the end of the stream"""
+        text, self.pending = self.pending, ''
+        return '' if self.in_script else text
+
+_LINE_BREAKS = re.compile('[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]')
+
+class LineCounter:
+    """Count lines the way str.splitlines() would, one chunk at a time
+    
+    Expects newline-translated text (files opened in text mode), so '\\r\\n'
+    pairs never occur.
+    """
+    
+    def __init__(self):
+        self.breaks = 0
+        self.open_line = False
+    
+    def feed(self, text):
+        if text:
+            self.breaks += len(_LINE_BREAKS.findall(text))
+            self.open_line = not _LINE_BREAKS.match(text[-1])
+    
+    @property
+    def lines(self):
+        return self.breaks + (1 if self.open_line else 0)
+
+# Feature detectors: label -> term groups. A feature is present when every
+# group has at least one of its terms in the page (case-insensitive).
+FEATURE_DETECTORS = {
+    'Three.js 3D': [['three.js', 'three.min.js']],
+    'Tone.js Audio': [['tone.js']],
+    'GitHub API': [['github api', 'api.github.com']],
+    'Playlist System': [['playlist']],
+    'Export Functionality': [['export'], ['json', 'csv']],
+    'Bauhaus Design': [['bauhaus']],
+    'Grid System': [['grid'], ['cell']],
+    'Canvas Rendering': [['canvas']],
+    'Observer Pattern': [['observer'], ['system']]
+}
+
+# Declaration keywords counted into stats
+DECLARATIONS = ('function', 'const', 'let')
+
+def load_feature_detectors(path, extend=True):
+    """Load feature detectors from JSON ({label: [[term, ...], ...]})
+    
+    A bare string stands for a single-term group. With extend=True the
+    file adds to (or overrides) the built-in detectors.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        loaded = json.load(f)
+    detectors = dict(FEATURE_DETECTORS) if extend else {}
+    for label, groups in loaded.items():
+        if isinstance(groups, str):
+            groups = [groups]
+        detectors[label] = [[group] if isinstance(group, str) else list(group) for group in groups]
+    return detectors
+
+class FeatureScanner:
+    """Feature detectors and declaration counters compiled into one scan
+    
+    Every term and declaration keyword is matched by a single zero-width
+    regex over the lowercased page, so overlapping and nested terms are all
+    seen. Declaration hits are checked against the original text to keep
+    the counts case-sensitive.
+    """
+    
+    def __init__(self, detectors=None):
+        self.detectors = FEATURE_DETECTORS if detectors is None else detectors
+        terms = sorted(
+            {term.lower() for groups in self.detectors.values() for group in groups for term in group},
+            key=lambda t: (-len(t), t)
+        )
+        alternation = '|'.join(map(re.escape, terms)) or '(?!)'
+        first_chars = ''.join(sorted({t[0] for t in terms} | {k[0] for k in DECLARATIONS}))
+        keywords = '|'.join(DECLARATIONS)
+        
+        # The leading character class lets the engine skip positions cheaply
+        self.pattern = re.compile(
+            rf'(?=[{re.escape(first_chars)}])(?=\b({keywords})\s+\w|({alternation}))'
+        )
+        self.term_pattern = re.compile(alternation)
+        self.longest_term = max(map(len, terms), default=0)
+        self.declaration_pattern = re.compile(rf'\b({keywords})\s+\w+')
+        self.declaration_starts = re.compile(rf'(?=\b({keywords})\s+\w)')
+        # Terms are tried longest first, so a hit also implies any term that is its prefix
+        self.implied = {t: [u for u in terms if t.startswith(u)] for t in terms}
+        self.groups = [
+            (label, [{term.lower() for term in group} for group in groups])
+            for label, groups in self.detectors.items()
+        ]
+    
+    def scan(self, content):
+        """Return (features, declaration counts) for a page"""
+        return self.scan_chunks([content])
+    
+    def scan_chunks(self, chunks, overlap=1024):
+        """Scan a page delivered as text chunks, holding at most one chunk plus overlap
+        
+        Matches starting within `overlap` characters of a chunk's end are
+        deferred to the next window, so terms and declarations that straddle
+        a boundary are still seen exactly once.
+        """
+        overlap = max(overlap, self.longest_term)
+        found = set()
+        counts = dict.fromkeys(DECLARATIONS, 0)
+        # Per keyword, where the last counted declaration ended: like
+        # re.findall, one keyword's matches never overlap each other
+        resume = dict.fromkeys(DECLARATIONS, 0)
+        carry = ''
+        begin = 0
+        offset = 0
+        
+        for chunk in chunks:
+            window = carry + chunk
+            end = len(window) - overlap
+            if end <= begin:
+                carry = window
+                continue
+            self._scan_window(window, begin, end, offset, found, counts, resume)
+            # Keep one already-scanned character as context for \b
+            carry = window[end - 1:]
+            offset += end - 1
+            begin = 1
+        if len(carry) > begin:
+            self._scan_window(carry, begin, len(carry), offset, found, counts, resume)
+        
+        features = [
+            label for label, groups in self.groups
+            if all(group & found for group in groups)
+        ]
+        return features, counts
+    
+    def _scan_window(self, window, begin, end, offset, found, counts, resume):
+        """Record hits that start in window[begin:end]; window[0] is at offset in the page"""
+        lowered = window.lower()
+        # str.lower() only ever lengthens text, so equal lengths mean equal offsets
+        aligned = len(lowered) == len(window)
+        if aligned:
+            lowered_begin, lowered_end = begin, end
+        else:
+            lowered_begin, lowered_end = len(window[:begin].lower()), len(window[:end].lower())
+        
+        for match in self.pattern.finditer(lowered, lowered_begin):
+            if match.start() >= lowered_end:
+                break
+            keyword, term = match.groups()
+            if keyword:
+                if aligned:
+                    self._count_declaration(window, match.start(), offset, counts, resume)
+                term_match = self.term_pattern.match(lowered, match.start())
+                term = term_match.group() if term_match else None
+            if term:
+                found.update(self.implied[term])
+        
+        if not aligned:
+            for match in self.declaration_starts.finditer(window, begin):
+                if match.start() >= end:
+                    break
+                self._count_declaration(window, match.start(), offset, counts, resume)
+    
+    def _count_declaration(self, window, position, offset, counts, resume):
+        match = self.declaration_pattern.match(window, position)
+        if match and offset + position >= resume[match.group(1)]:
+            counts[match.group(1)] += 1
+            resume[match.group(1)] = offset + match.end()
+    
+    def signature(self):
+        """Stable hash of the detector configuration, for cache invalidation"""
+        payload = json.dumps(self.detectors, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def extract_html_metadata(file_path, scanner=None, chunk_size=1 << 20, keep_script_content=False,
+                          digest=None):
+    """Extract metadata from an HTML file
+    
+    The file is streamed in chunk_size pieces through the parser, the
+    feature scanner and the line counter, so peak memory stays bounded by
+    the chunk size rather than the page size. Bytes are decoded as UTF-8
+    (invalid sequences dropped, newlines translated as in text mode); a
+    hashlib object passed as digest is fed the raw bytes on the way, so
+    the file is only read once.
+    """
+    scanner = scanner or FeatureScanner()
+    try:
+        parser = HTMLMetadataExtractor(keep_script_content)
+        script_filter = None if keep_script_content else ScriptBodyFilter()
+        line_counter = LineCounter()
+        
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')('ignore'), translate=True)
+        
+        def chunks():
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(chunk_size), b''):
+                    if digest is not None:
+                        digest.update(block)
+                    yield decoder.decode(block)
+            yield decoder.decode(b'', final=True)
+        
+        def text():
+            for chunk in chunks():
+                if chunk:
+                    line_counter.feed(chunk)
+                    parser.feed(script_filter.feed(chunk) if script_filter else chunk)
+                    yield chunk
+            if script_filter:
+                parser.feed(script_filter.close())
+        
+        # Framework/library features and declaration counts in one scan
+        features, counts = scanner.scan_chunks(text())
         
         return {
             'title': parser.title,
@@ -109,44 +371,210 @@ def extract_html_metadata(file_path):
             'external_stylesheets': parser.stylesheets,
             'features': features,
             'stats': {
-                'functions': function_count,
-                'constants': const_count,
-                'variables': let_count,
-                'lines': len(content.splitlines())
+                'functions': counts['function'],
+                'constants': counts['const'],
+                'variables': counts['let'],
+                'lines': line_counter.lines
             }
         }
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
         return None
 
-def generate_detailed_sitemap():
-    """Generate detailed sitemap with metadata"""
+# Pages live next to the scripts in this repo
+DEFAULT_ROOT = Path(__file__).parent
+
+class MetadataCache:
+    """Extracted page metadata keyed on (path, size, mtime, content hash)
+    
+    A file whose size and mtime are unchanged is a hit without being read.
+    If only the mtime moved, the content hash decides.
+    """
+    
+    def __init__(self, cache_file, signature=''):
+        self.cache_file = Path(cache_file)
+        self.signature = signature
+        self.entries = {}
+        if self.cache_file.exists():
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+            except (OSError, ValueError):
+                cached = {}
+            # Entries extracted with different feature detectors are stale
+            if cached.get('signature') == signature:
+                self.entries = cached.get('entries', {})
+    
+    def lookup(self, key, path, stat):
+        """Cached metadata for a file, or None when it must be re-extracted"""
+        entry = self.entries.get(key)
+        if entry is None or entry['size'] != stat.st_size:
+            return None
+        if entry['mtime_ns'] != stat.st_mtime_ns:
+            if entry['sha256'] != file_digest(path):
+                return None
+            entry['mtime_ns'] = stat.st_mtime_ns
+        return entry['metadata']
+    
+    def store(self, key, stat, digest, metadata):
+        self.entries[key] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': digest,
+            'metadata': metadata
+        }
+    
+    def save(self, keep_keys):
+        """Write the cache, dropping entries for files that no longer exist"""
+        self.entries = {k: v for k, v in self.entries.items() if k in keep_keys}
+        tmp_file = self.cache_file.with_name(self.cache_file.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'signature': self.signature, 'entries': self.entries}, f, ensure_ascii=False)
+        tmp_file.replace(self.cache_file)
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _extract_timed(path, scanner=None):
+    """Worker: hash and extract one file in a single read, returning (digest, metadata, seconds)"""
+    start = time.perf_counter()
+    digest = hashlib.sha256()
+    metadata = extract_html_metadata(path, scanner, digest=digest)
+    return digest.hexdigest(), metadata, time.perf_counter() - start
+
+def _matches(relative_path, patterns):
+    """Patterns with a '/' match the path relative to the root, others the name"""
+    return any(
+        fnmatch.fnmatch(relative_path if '/' in pattern else relative_path.rsplit('/', 1)[-1], pattern)
+        for pattern in patterns
+    )
+
+def iter_pages(root, include=('*.html',), exclude=(), recursive=False):
+    """Page paths under root matching include and not exclude, yielded in sorted path order
     
-    root = Path('/Users/gaia/WH_RIPPLE')
-    html_files = sorted(root.glob('*.html'))
+    Directories are listed one at a time, so the walk never holds more than
+    the current directory's entries. Excluded directories are pruned
+    without being walked, and hidden directories are skipped when
+    recursing.
+    """
+    root = Path(root)
     
-    sitemap = {
-        'project': 'WH_RIPPLE Repository Index',
-        'generated': datetime.now().isoformat(),
-        'root_path': str(root),
-        'repository': 'hartswf0/potters-wheel',
-        'pages': []
-    }
+    def walk(directory, prefix):
+        with os.scandir(directory) as scan:
+            entries = sorted(scan, key=lambda entry: entry.name)
+        # Names sort the way the paths do, so files and subdirectories interleave correctly
+        for entry in entries:
+            relative_path = prefix + entry.name
+            if entry.is_dir():
+                if (recursive and not entry.is_symlink() and not entry.name.startswith('.')
+                        and not _matches(relative_path, exclude)):
+                    yield from walk(entry.path, relative_path + '/')
+            elif _matches(relative_path, include) and not _matches(relative_path, exclude):
+                yield root / relative_path
     
-    for html_file in html_files:
-        print(f"Processing {html_file.name}...")
+    yield from walk(root, '')
+
+def discover_pages(root, include=('*.html',), exclude=(), recursive=False):
+    """Sorted list of the page paths iter_pages yields"""
+    return list(iter_pages(root, include, exclude, recursive))
+
+# Page categories: name -> predicate on the page's filename
+CATEGORY_RULES = {
+    'github_indices': lambda name: 'github' in name.lower(),
+    'kimi_lego': lambda name: 'kimi' in name.lower() or 'lego' in name.lower(),
+    'presentations': lambda name: 'presentation' in name.lower() or 'mythos' in name.lower(),
+    'wh_pages': lambda name: name.startswith('wh') and name[2:3].isdigit()
+}
+
+class SitemapSummary:
+    """Summary totals and category membership, accumulated one page at a time"""
+    
+    def __init__(self, category_rules=None):
+        self.category_rules = CATEGORY_RULES if category_rules is None else category_rules
+        self.total_pages = 0
+        self.total_size_kb = 0
+        self.total_functions = 0
+        self.total_lines = 0
+        self.features = set()
+        self.categories = {name: [] for name in self.category_rules}
+    
+    def add(self, page):
+        self.total_pages += 1
+        self.total_size_kb += page['size_kb']
+        self.total_functions += page['stats']['functions']
+        self.total_lines += page['stats']['lines']
+        self.features.update(page['features'])
+        for name, rule in self.category_rules.items():
+            if rule(page['filename']):
+                self.categories[name].append(page['path'])
+    
+    def summary(self):
+        return {
+            'total_pages': self.total_pages,
+            'total_size_kb': self.total_size_kb,
+            'total_size_mb': round(self.total_size_kb / 1024, 2),
+            'avg_page_size_kb': round(self.total_size_kb / self.total_pages, 2) if self.total_pages else 0,
+            'total_functions': self.total_functions,
+            'total_lines': self.total_lines,
+            'all_features': sorted(self.features)
+        }
+
+def generate_detailed_sitemap(root=DEFAULT_ROOT, workers=None, use_cache=True, cache_file=None,
+                              detectors=None, include=('*.html',), exclude=(), recursive=False,
+                              output_file=None, store=None, mp_context=None, window=None, **output_options):
+    """Generate detailed sitemap with metadata
+    
+    Pages are discovered, looked up in the metadata cache and written one
+    at a time in path order. The first changed page is extracted in-process;
+    once a second one turns up the rest go to a process pool (workers=1
+    keeps everything in-process; mp_context picks its start method). At
+    most `window` pages wait to be written behind one still being
+    extracted, and categories list page paths, so apart from the metadata
+    cache itself memory does not grow with the number of pages. With a
+    RippleStore the page records are also upserted into it in batches.
+    """
+    
+    root = Path(root)
+    output_file = Path(output_file) if output_file else root / 'sitemap-detailed.json'
+    
+    scanner = FeatureScanner(detectors)
+    extract = partial(_extract_timed, scanner=scanner)
+    cache = MetadataCache(cache_file or root / '.sitemap-cache.json', scanner.signature()) if use_cache else None
+    window = window or max(64, 8 * (workers or os.cpu_count() or 1))
+    keys = set()
+    counts = {'hits': 0, 'misses': 0}
+    summary = SitemapSummary()
+    pending = []
+    executor = None
+    # Pages waiting to be written, in path order: (path, key, stat, cached metadata, extraction)
+    queue = deque()
+    
+    def write_page(writer, html_file, key, stat, metadata, extraction):
+        if metadata is not None:
+            timing = 'cached'
+        else:
+            digest, metadata, seconds = extraction.result() if isinstance(extraction, Future) else extraction
+            timing = f'{seconds * 1000:.1f} ms'
+            metrics.count('pages_extracted')
+            metrics.count('page_extract_seconds', seconds)
+            if cache and metadata:
+                cache.store(key, stat, digest, metadata)
+        print(f"Processing {key}... ({timing})")
         
-        metadata = extract_html_metadata(html_file)
         if not metadata:
-            continue
+            return
         
         page_info = {
             'filename': html_file.name,
-            'path': str(html_file.relative_to(root)),
+            'path': key,
             'url': f"file://{html_file}",
-            'size_bytes': html_file.stat().st_size,
-            'size_kb': round(html_file.stat().st_size / 1024, 2),
-            'modified': datetime.fromtimestamp(html_file.stat().st_mtime).isoformat(),
+            'size_bytes': stat.st_size,
+            'size_kb': round(stat.st_size / 1024, 2),
+            'modified': datetime.fromtimestamp(stat.st_mtime).isoformat(),
             'title': metadata['title'],
             'description': metadata['description'],
             'features': metadata['features'],
@@ -155,40 +583,101 @@ def generate_detailed_sitemap():
             'external_stylesheets': metadata['external_stylesheets']
         }
         
-        sitemap['pages'].append(page_info)
-    
-    # Add summary statistics
-    sitemap['summary'] = {
-        'total_pages': len(sitemap['pages']),
-        'total_size_kb': sum(p['size_kb'] for p in sitemap['pages']),
-        'total_size_mb': round(sum(p['size_kb'] for p in sitemap['pages']) / 1024, 2),
-        'avg_page_size_kb': round(sum(p['size_kb'] for p in sitemap['pages']) / len(sitemap['pages']), 2) if sitemap['pages'] else 0,
-        'total_functions': sum(p['stats']['functions'] for p in sitemap['pages']),
-        'total_lines': sum(p['stats']['lines'] for p in sitemap['pages']),
-        'all_features': sorted(list(set(feat for p in sitemap['pages'] for feat in p['features'])))
-    }
-    
-    # Group by category
-    sitemap['categories'] = {
-        'github_indices': [p for p in sitemap['pages'] if 'github' in p['filename'].lower()],
-        'kimi_lego': [p for p in sitemap['pages'] if 'kimi' in p['filename'].lower() or 'lego' in p['filename'].lower()],
-        'presentations': [p for p in sitemap['pages'] if 'presentation' in p['filename'].lower() or 'mythos' in p['filename'].lower()],
-        'wh_pages': [p for p in sitemap['pages'] if p['filename'].startswith('wh') and p['filename'][2].isdigit()]
-    }
-    
-    # Save sitemap
-    output_file = root / 'sitemap-detailed.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(sitemap, f, indent=2, ensure_ascii=False)
+        writer.item(page_info)
+        summary.add(page_info)
+        if store:
+            pending.append(page_info)
+            if len(pending) >= 500:
+                store.upsert_pages(pending)
+                pending.clear()
+    
+    def ready(entry):
+        extraction = entry[4]
+        return not isinstance(extraction, Future) or extraction.done()
     
+    try:
+        with JSONStreamWriter(output_file, **output_options) as writer:
+            writer.field('project', 'WH_RIPPLE Repository Index')
+            writer.field('generated', datetime.now().isoformat())
+            writer.field('root_path', str(root))
+            writer.field('repository', 'hartswf0/potters-wheel')
+            writer.begin_list('pages')
+            
+            for html_file in iter_pages(root, include, exclude, recursive):
+                key = html_file.relative_to(root).as_posix()
+                keys.add(key)
+                stat = html_file.stat()
+                metadata = cache.lookup(key, html_file, stat) if cache else None
+                extraction = None
+                if metadata is None:
+                    counts['misses'] += 1
+                    if executor is None and counts['misses'] > 1 and workers != 1:
+                        executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+                    extraction = executor.submit(extract, html_file) if executor else extract(html_file)
+                else:
+                    counts['hits'] += 1
+                queue.append((html_file, key, stat, metadata, extraction))
+                
+                # Write whatever is finished at the head; block on it once the window is full
+                while queue and (len(queue) > window or ready(queue[0])):
+                    write_page(writer, *queue.popleft())
+            
+            while queue:
+                write_page(writer, *queue.popleft())
+            writer.end_list()
+            writer.field('summary', summary.summary())
+            writer.field('categories', summary.categories)
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    
+    if cache:
+        metrics.record_cache('sitemap_metadata', **counts)
+        cache.save(keys)
+    if store:
+        store.upsert_pages(pending)
+        store.remove_pages_not_in(keys)
+    
+    totals = summary.summary()
     print(f"\n✅ Detailed sitemap generated: {output_file}")
-    print(f"📊 Total pages: {sitemap['summary']['total_pages']}")
-    print(f"💾 Total size: {sitemap['summary']['total_size_mb']} MB")
-    print(f"🔧 Total functions: {sitemap['summary']['total_functions']}")
-    print(f"📝 Total lines: {sitemap['summary']['total_lines']:,}")
+    if cache:
+        print(f"🗄️  Metadata cache: {counts['hits']} hits, {counts['misses']} misses")
+    print(f"📊 Total pages: {totals['total_pages']}")
+    print(f"💾 Total size: {totals['total_size_mb']} MB")
+    print(f"🔧 Total functions: {totals['total_functions']}")
+    print(f"📝 Total lines: {totals['total_lines']:,}")
     print(f"\n🎨 Features found:")
-    for feat in sitemap['summary']['all_features']:
+    for feat in totals['all_features']:
         print(f"  - {feat}")
+    print_artifact_report(writer.written)
 
 if __name__ == '__main__':
-    generate_detailed_sitemap()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Generate the detailed HTML sitemap')
+    parser.add_argument('--root', default=str(DEFAULT_ROOT), help='directory to scan')
+    parser.add_argument('--output', help='sitemap file (default: <root>/sitemap-detailed.json)')
+    parser.add_argument('-r', '--recursive', action='store_true', help='scan subdirectories too')
+    parser.add_argument('--include', action='append',
+                        help="glob for pages to include, repeatable (default: '*.html')")
+    parser.add_argument('--exclude', action='append', default=[],
+                        help="glob for files or directories to skip, repeatable (e.g. 'node_modules')")
+    parser.add_argument('--workers', type=int, help='processes for extracting changed pages')
+    parser.add_argument('--no-cache', action='store_true', help='re-extract every page')
+    parser.add_argument('--store', help='also upsert page records into this SQLite store')
+    parser.add_argument('--features', help='JSON file of extra feature detectors ({label: [[term, ...], ...]})')
+    add_output_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    instrumentation = start_instrumentation(args, 'generate-detailed-sitemap')
+    
+    detectors = load_feature_detectors(args.features) if args.features else None
+    store = RippleStore(args.store) if args.store else None
+    with metrics.stage('sitemap'):
+        generate_detailed_sitemap(args.root, workers=args.workers, use_cache=not args.no_cache,
+                                  detectors=detectors, include=args.include or ('*.html',),
+                                  exclude=args.exclude, recursive=args.recursive, output_file=args.output,
+                                  store=store, **output_options(args))
+    if store:
+        store.close()
+    instrumentation.finish()
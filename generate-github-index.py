@@ -1,154 +1,491 @@
 #!/usr/bin/env python3
 """
-Generate comprehensive JSON index from GitHub user hartswf0
+Generate comprehensive JSON index from GitHub user hartswf0 (or a batch of users/orgs)
 """
 
+import hashlib
+import http.client
 import json
-import urllib.request
+import os
+import time
+import threading
 import urllib.error
-from datetime import datetime
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
 from pathlib import Path
+from urllib.parse import urljoin, urlparse, parse_qs
 
-def fetch_all_github_repos(username):
-    """Fetch all repositories for a GitHub user"""
+from ripple_output import write_artifact, write_shards, print_artifact_report, add_output_arguments, output_options
+from ripple_metrics import metrics, add_metrics_arguments, start_instrumentation
+from ripple_layout import add_layout, add_layout_arguments
+from ripple_snapshots import SnapshotStore
+from ripple_records import RepoRecord, ALL_REPOS_FIELDS, records_table, records_from_table
+from ripple_store import RippleStore
+
+GITHUB_API = 'https://api.github.com'
+
+# Statuses GitHub answers renamed or transferred users, orgs and repos with
+REDIRECT_STATUSES = (301, 302, 307, 308)
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header, or None if it can't be parsed
+
+    RFC 9110 allows delay-seconds ('120') or an HTTP-date ('Wed, 21 Oct
+    2026 07:28:00 GMT'); a date in the past means no wait.
+    """
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+class RateLimiter:
+    """Track GitHub rate-limit headers and pause before the budget runs out"""
+    
+    def __init__(self, reserve=0, max_backoff=900):
+        self.reserve = reserve
+        self.max_backoff = max_backoff
+        self.remaining = None
+        self.reset_at = None
+        self._lock = threading.Lock()
+    
+    def update(self, headers):
+        """Record X-RateLimit-Remaining/Reset from a response"""
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        with self._lock:
+            if remaining is not None:
+                self.remaining = int(remaining)
+            if reset is not None:
+                self.reset_at = int(reset)
+    
+    def wait(self):
+        """Block until the reset time if the remaining budget is exhausted"""
+        with self._lock:
+            if self.remaining is None or self.remaining > self.reserve or self.reset_at is None:
+                return
+            delay = min(self.reset_at - time.time() + 1, self.max_backoff)
+        if delay > 0:
+            print(f"   ⏳ Rate limit reached, waiting {delay:.0f}s")
+            time.sleep(delay)
+        with self._lock:
+            self.remaining = None
+    
+    def backoff_delay(self, error, attempt):
+        """Seconds to wait before retrying a 403/429, or None if not retryable"""
+        headers = error.headers or {}
+        retry_after = headers.get('Retry-After')
+        delay = parse_retry_after(retry_after) if retry_after is not None else None
+        if delay is not None:
+            return min(delay, self.max_backoff)
+        if headers.get('X-RateLimit-Remaining') == '0' and headers.get('X-RateLimit-Reset'):
+            return min(max(int(headers['X-RateLimit-Reset']) - time.time() + 1, 1), self.max_backoff)
+        # An unreadable Retry-After still asks for a retry; back off exponentially
+        if error.code == 429 or retry_after is not None:
+            return min(2 ** attempt, self.max_backoff)
+        return None
+
+class ResponseCache:
+    """On-disk cache of API responses with their ETag/Last-Modified validators
+    
+    Entries are keyed by URL. Cached pages are revalidated with conditional
+    requests, so an unchanged page costs a 304 instead of a full download.
+    """
+    
+    def __init__(self, directory, max_age_days=30, max_mb=100):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_age = max_age_days * 86400
+        self.max_bytes = max_mb * 1024 * 1024
+        self.revalidated = 0
+        self.downloaded = 0
+        self._lock = threading.Lock()
+    
+    def _path(self, url):
+        return self.directory / (hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+    
+    def get(self, url):
+        """Return the cached entry for a URL, or None"""
+        path = self._path(url)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry['stored_at'] > self.max_age:
+            return None
+        return entry
+    
+    def conditional_headers(self, entry):
+        """Validators to send with a request for a cached URL"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def store(self, url, body, headers):
+        """Save a fresh 200 response"""
+        entry = {
+            'url': url,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'headers': {'Link': headers.get('Link', '')},
+            'body': body,
+            'stored_at': time.time()
+        }
+        path = self._path(url)
+        tmp_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.downloaded += 1
+    
+    def touch(self, url, entry):
+        """Mark a cached entry as revalidated by a 304"""
+        entry['stored_at'] = time.time()
+        path = self._path(url)
+        tmp_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.revalidated += 1
+    
+    def prune(self):
+        """Evict expired entries, then the least recently validated until under the size budget"""
+        now = time.time()
+        entries = []
+        for path in self.directory.glob('*.json'):
+            stat = path.stat()
+            if now - stat.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        return evicted
+
+def parse_link_header(link_header):
+    """Parse a Link header into a {rel: url} dict"""
+    links = {}
+    for part in (link_header or '').split(','):
+        if ';' not in part:
+            continue
+        url, params = part.split(';', 1)
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'rel':
+                links[value.strip('"')] = url.strip().strip('<>')
+    return links
+
+class GitHubClient:
+    """GitHub API client with keep-alive connections, rate limiting and caching
+    
+    One client can be shared by many threads: idle persistent connections
+    are pooled per host and reused by whichever thread asks next, while the
+    rate-limit budget and the response cache are shared.
+    """
+    
+    def __init__(self, api_base=GITHUB_API, rate_limiter=None, cache=None, timeout=30, max_retries=5,
+                 max_redirects=5):
+        self.api_base = api_base.rstrip('/')
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.cache = cache
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_redirects = max_redirects
+        self.connections_opened = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+    
+    def _acquire(self, scheme, netloc, fresh=False):
+        """An idle pooled connection to the host, or a new one (always new with fresh=True)"""
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle and not fresh:
+                return idle.pop()
+            self.connections_opened += 1
+        conn_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return conn_class(netloc, timeout=self.timeout)
+    
+    def _release(self, scheme, netloc, conn):
+        with self._lock:
+            self._idle.setdefault((scheme, netloc), []).append(conn)
+    
+    def _send(self, url, headers):
+        """Issue a GET over a pooled connection; returns (status, headers, body)"""
+        parts = urlparse(url)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        
+        for reconnect in (False, True):
+            # The retry must not draw another idle connection that may be just as stale
+            conn = self._acquire(parts.scheme, parts.netloc, fresh=reconnect)
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                    ConnectionResetError, BrokenPipeError):
+                # The server closed an idle keep-alive connection; retry once on a fresh one
+                conn.close()
+                if reconnect:
+                    raise
+                continue
+            except Exception:
+                conn.close()
+                raise
+            
+            metrics.record_request(time.perf_counter() - start, len(body), response.status)
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(parts.scheme, parts.netloc, conn)
+            return response.status, response.headers, body
+    
+    def get_json(self, url):
+        """GET a GitHub API URL, honouring rate limits; returns (data, headers)
+        
+        With a ResponseCache the request is made conditional and a 304 is
+        answered from the cached body. Redirects (renamed users, orgs and
+        repos) are followed up to max_redirects hops; the response is cached
+        under the URL that was asked for.
+        """
+        cached = self.cache.get(url) if self.cache else None
+        target = url
+        redirects = 0
+        attempt = 0
+        
+        while True:
+            self.rate_limiter.wait()
+            
+            headers = {
+                'Accept': 'application/vnd.github+json',
+                'User-Agent': 'Python-GitHub-Index-Generator'
+            }
+            if cached:
+                headers.update(self.cache.conditional_headers(cached))
+            
+            status, response_headers, body = self._send(target, headers)
+            self.rate_limiter.update(response_headers)
+            
+            if status == 200:
+                body = body.decode('utf-8')
+                if self.cache:
+                    self.cache.store(url, body, response_headers)
+                    metrics.record_cache('github_api', misses=1)
+                return json.loads(body), response_headers
+            
+            if status == 304 and cached:
+                self.cache.touch(url, cached)
+                metrics.record_cache('github_api', hits=1)
+                return json.loads(cached['body']), cached['headers']
+            
+            if status in REDIRECT_STATUSES and response_headers.get('Location'):
+                redirects += 1
+                if redirects > self.max_redirects:
+                    raise urllib.error.HTTPError(url, status, f'More than {self.max_redirects} redirects',
+                                                 response_headers, None)
+                target = urljoin(target, response_headers['Location'])
+                continue
+            
+            error = urllib.error.HTTPError(target, status, http.client.responses.get(status, ''),
+                                           response_headers, None)
+            if status not in (403, 429) or attempt == self.max_retries:
+                raise error
+            delay = self.rate_limiter.backoff_delay(error, attempt)
+            if delay is None:
+                raise error
+            print(f"   ⏳ GitHub API returned {status}, retrying in {delay:.0f}s")
+            time.sleep(delay)
+            attempt += 1
+    
+    def repos_page_url(self, account, page):
+        """Repo listing URL for a user, or for an organisation given as 'org:name'"""
+        if account.startswith('org:'):
+            return f"{self.api_base}/orgs/{account[4:]}/repos?per_page=100&page={page}&type=all&sort=updated"
+        return f"{self.api_base}/users/{account}/repos?per_page=100&page={page}&type=owner&sort=updated"
+    
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+def fetch_all_github_repos(username, client=None, concurrent=False, max_workers=8):
+    """Fetch all repositories for a GitHub user (or 'org:name' organisation)
+    
+    With concurrent=True the page count is read from the first response's
+    Link header and the remaining pages are fetched in parallel; the result
+    is identical to the sequential walk. Each page's API dicts are reduced
+    to RepoRecords as soon as it arrives.
+    """
+    client = client or GitHubClient()
     all_repos = []
     page = 1
     
     print(f"🔍 Fetching repositories for {username}...")
     
-    while True:
-        url = f"https://api.github.com/users/{username}/repos?per_page=100&page={page}&type=owner&sort=updated"
-        
-        try:
-            req = urllib.request.Request(url)
-            req.add_header('Accept', 'application/vnd.github+json')
-            req.add_header('User-Agent', 'Python-GitHub-Index-Generator')
+    try:
+        while True:
+            repos, headers = client.get_json(client.repos_page_url(username, page))
             
-            with urllib.request.urlopen(req) as response:
-                repos = json.loads(response.read().decode('utf-8'))
-                
-                if not repos:
-                    break
-                    
-                all_repos.extend(repos)
-                print(f"   Fetched page {page}: {len(repos)} repos")
-                
-                # Check if there are more pages
-                link_header = response.headers.get('Link', '')
-                if not link_header or 'rel="next"' not in link_header:
-                    break
-                    
-                page += 1
-                
-        except urllib.error.HTTPError as e:
-            if e.code == 404:
-                print(f"❌ User {username} not found")
-            else:
-                print(f"❌ GitHub API error: {e.code}")
-            return []
-        except Exception as e:
-            print(f"❌ Error: {e}")
-            return []
+            if not repos:
+                break
+            
+            all_repos.extend(RepoRecord.from_api(r) for r in repos)
+            print(f"   Fetched page {page}: {len(repos)} repos")
+            
+            # Check if there are more pages
+            links = parse_link_header(headers.get('Link', ''))
+            if 'next' not in links:
+                break
+            
+            if concurrent and 'last' in links:
+                last_page = int(parse_qs(urlparse(links['last']).query)['page'][0])
+                all_repos.extend(_fetch_pages_concurrently(
+                    client, username, range(page + 1, last_page + 1), max_workers
+                ))
+                break
+            
+            page += 1
+            
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            print(f"❌ User {username} not found")
+        else:
+            print(f"❌ GitHub API error: {e.code}")
+        return []
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return []
     
     print(f"✅ Total repositories found: {len(all_repos)}")
     return all_repos
 
-def categorize_repos(repos):
-    """Categorize repos by various criteria for ring visualization"""
+def _fetch_pages_concurrently(client, username, pages, max_workers):
+    """Fetch the given pages in parallel, returning repos in page order"""
     
-    # Category 1: By language (most common)
-    by_language = {}
-    for repo in repos:
-        lang = repo.get('language') or 'Other'
-        if lang not in by_language:
-            by_language[lang] = []
-        by_language[lang].append(repo)
-    
-    # Category 2: By activity (last updated)
-    now = datetime.now()
-    by_activity = {
-        'very_recent': [],  # < 30 days
-        'recent': [],       # 30-90 days
-        'moderate': [],     # 90-180 days
-        'older': [],        # 180-365 days
-        'archived': []      # > 365 days
-    }
+    def fetch_page(page):
+        repos, _ = client.get_json(client.repos_page_url(username, page))
+        return page, repos
     
-    for repo in repos:
-        if repo.get('archived'):
-            by_activity['archived'].append(repo)
-            continue
-            
-        updated = datetime.strptime(repo['updated_at'], '%Y-%m-%dT%H:%M:%SZ')
-        days_ago = (now - updated).days
-        
-        if days_ago < 30:
-            by_activity['very_recent'].append(repo)
-        elif days_ago < 90:
-            by_activity['recent'].append(repo)
-        elif days_ago < 180:
-            by_activity['moderate'].append(repo)
-        elif days_ago < 365:
-            by_activity['older'].append(repo)
-        else:
-            by_activity['archived'].append(repo)
-    
-    # Category 3: By size
-    by_size = {
-        'tiny': [],      # < 100 KB
-        'small': [],     # 100KB - 1MB
-        'medium': [],    # 1MB - 10MB
-        'large': [],     # 10MB - 50MB
-        'huge': []       # > 50MB
+    repos_in_order = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for page, repos in executor.map(fetch_page, pages):
+            # Match the sequential walk, which stops at the first empty page
+            if not repos:
+                break
+            repos_in_order.extend(RepoRecord.from_api(r) for r in repos)
+            print(f"   Fetched page {page}: {len(repos)} repos")
+    
+    return repos_in_order
+
+@lru_cache(maxsize=1 << 16)
+def parse_github_timestamp(value):
+    """Parse a GitHub '%Y-%m-%dT%H:%M:%SZ' timestamp into a naive datetime"""
+    return datetime.fromisoformat(value[:19])
+
+def age_in_days(field):
+    """Dimension value: whole days since a timestamp field"""
+    def value(repo, now):
+        return (now - parse_github_timestamp(repo[field])).days
+    return value
+
+def _activity_age(repo, now):
+    # Archived repos always land in the outermost bucket
+    if repo.archived:
+        return float('inf')
+    return (now - parse_github_timestamp(repo.updated_at)).days
+
+# Declarative bucket tables. A dimension maps a repo to a value; with
+# 'bounds' the value is bucketed by bisect (bounds are exclusive upper
+# limits, the last label catches the rest), without them the value itself
+# is the bucket key.
+CATEGORY_DIMENSIONS = {
+    'by_language': {
+        'value': lambda repo, now: repo.language or 'Other'
+    },
+    'by_activity': {
+        'value': _activity_age,
+        'bounds': [30, 90, 180, 365],
+        'labels': ['very_recent', 'recent', 'moderate', 'older', 'archived']
+    },
+    'by_size': {
+        'value': lambda repo, now: repo.size_kb,
+        'bounds': [100, 1024, 10240, 51200],  # KB
+        'labels': ['tiny', 'small', 'medium', 'large', 'huge']
+    },
+    'by_stars': {
+        'value': lambda repo, now: repo.stars,
+        'bounds': [1, 6, 21, 101],
+        'labels': ['no_stars', 'few_stars', 'some_stars', 'many_stars', 'popular']
     }
+}
+
+def categorize_repos(repos, dimensions=None, now=None):
+    """Categorize repos by various criteria for ring visualization
     
-    for repo in repos:
-        size_kb = repo.get('size', 0)
-        if size_kb < 100:
-            by_size['tiny'].append(repo)
-        elif size_kb < 1024:
-            by_size['small'].append(repo)
-        elif size_kb < 10240:
-            by_size['medium'].append(repo)
-        elif size_kb < 51200:
-            by_size['large'].append(repo)
+    All dimensions are filled in a single pass over the repos. Pass
+    dimensions={**CATEGORY_DIMENSIONS, 'by_forks': {...}} to add more.
+    """
+    dimensions = CATEGORY_DIMENSIONS if dimensions is None else dimensions
+    now = now or datetime.now()
+    
+    categories = {}
+    compiled = []
+    for name, spec in dimensions.items():
+        buckets = categories[name] = {}
+        if 'bounds' in spec:
+            bucket_lists = [buckets.setdefault(label, []) for label in spec['labels']]
+            compiled.append((spec['value'], spec['bounds'], bucket_lists, None))
         else:
-            by_size['huge'].append(repo)
-    
-    # Category 4: By stars
-    by_stars = {
-        'no_stars': [],
-        'few_stars': [],    # 1-5
-        'some_stars': [],   # 6-20
-        'many_stars': [],   # 21-100
-        'popular': []       # > 100
-    }
+            compiled.append((spec['value'], None, None, buckets))
     
     for repo in repos:
-        stars = repo.get('stargazers_count', 0)
-        if stars == 0:
-            by_stars['no_stars'].append(repo)
-        elif stars <= 5:
-            by_stars['few_stars'].append(repo)
-        elif stars <= 20:
-            by_stars['some_stars'].append(repo)
-        elif stars <= 100:
-            by_stars['many_stars'].append(repo)
-        else:
-            by_stars['popular'].append(repo)
+        for value, bounds, bucket_lists, buckets in compiled:
+            key = value(repo, now)
+            if bounds is None:
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = []
+                bucket.append(repo)
+            else:
+                bucket_lists[bisect_right(bounds, key)].append(repo)
     
-    return {
-        'by_language': by_language,
-        'by_activity': by_activity,
-        'by_size': by_size,
-        'by_stars': by_stars
-    }
+    return categories
 
-def generate_ring_structure(repos, categories):
-    """Generate concentric ring structure for visualization"""
+def generate_ring_structure(repos, categories, normalized=False):
+    """Generate concentric ring structure for visualization
+    
+    With normalized=True each ring lists 'repo_ids' (positions in repos)
+    instead of embedding full repo records.
+    """
     
     # Each repo gets assigned to rings based on different criteria
     rings = []
+    repo_ids = {id(r): i for i, r in enumerate(repos)} if normalized else None
     
     # Ring assignment: activity-based (innermost = most recent)
     ring_order = ['very_recent', 'recent', 'moderate', 'older', 'archived']
@@ -165,42 +502,106 @@ def generate_ring_structure(repos, categories):
             'radius_start': idx * 50 + 100,
             'radius_end': (idx + 1) * 50 + 100,
             'color': ['#ff6b35', '#f7931e', '#fdc500', '#c1d82f', '#8ac926'][idx],
-            'repo_count': len(repos_in_ring),
-            'repos': [
-                {
-                    'name': r['name'],
-                    'full_name': r['full_name'],
-                    'description': r['description'],
-                    'language': r.get('language'),
-                    'stars': r['stargazers_count'],
-                    'forks': r['forks_count'],
-                    'size_kb': r['size'],
-                    'updated_at': r['updated_at'],
-                    'created_at': r['created_at'],
-                    'html_url': r['html_url'],
-                    'homepage': r.get('homepage'),
-                    'has_pages': r.get('has_pages', False),
-                    'is_fork': r.get('fork', False),
-                    'archived': r.get('archived', False),
-                    'topics': r.get('topics', [])
-                }
-                for r in repos_in_ring
-            ]
+            'repo_count': len(repos_in_ring)
         }
+        if normalized:
+            ring['repo_ids'] = [repo_ids[id(r)] for r in repos_in_ring]
+        else:
+            ring['repos'] = [r.to_dict() for r in repos_in_ring]
         rings.append(ring)
     
     return rings
 
-def generate_comprehensive_index(username):
-    """Generate complete GitHub index"""
+def generate_comprehensive_index(username, schema=1, store=None, **fetch_options):
+    """Generate complete GitHub index
+    
+    With a RippleStore the fetched repos are also upserted into it.
+    """
     
-    repos = fetch_all_github_repos(username)
+    with metrics.stage('fetch'):
+        repos = fetch_all_github_repos(username, **fetch_options)
     
     if not repos:
         return None
     
-    categories = categorize_repos(repos)
-    rings = generate_ring_structure(repos, categories)
+    if store:
+        save_repos(store, username, repos)
+    return build_index(repos, username, schema)
+
+def generate_batch_index(accounts, client=None, merge=False, max_parallel=8, schema=1, store=None,
+                         **fetch_options):
+    """Index several users/orgs in parallel over one shared client
+    
+    All accounts share the client's keep-alive connections and rate-limit
+    budget. Returns {account: index} or, with merge=True, one merged index.
+    """
+    client = client or GitHubClient()
+    fetched = fetch_accounts(accounts, client, max_parallel, **fetch_options)
+    
+    if store:
+        for account in accounts:
+            if fetched[account]:
+                save_repos(store, account, fetched[account])
+    return build_indexes(accounts, fetched, merge, schema)
+
+def fetch_accounts(accounts, client, max_parallel=8, **fetch_options):
+    """{account: repos}, fetching up to max_parallel accounts at once over one client"""
+    
+    def fetch(account):
+        with metrics.stage('fetch'):
+            return account, fetch_all_github_repos(account, client=client, **fetch_options)
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(accounts)))) as executor:
+        return dict(executor.map(fetch, accounts))
+
+def merge_repos(accounts, fetched):
+    """The accounts' repos in account order, each full_name once"""
+    seen = set()
+    repos = []
+    for account in accounts:
+        for repo in fetched[account]:
+            if repo.full_name not in seen:
+                seen.add(repo.full_name)
+                repos.append(repo)
+    return repos
+
+def build_indexes(accounts, fetched, merge=False, schema=1):
+    """{account: index} for fetched {account: repos}, or one merged index"""
+    if merge:
+        repos = merge_repos(accounts, fetched)
+        if not repos:
+            return None
+        index = build_index(repos, ', '.join(accounts), schema)
+        index['meta']['github_users'] = list(accounts)
+        return index
+    
+    return {
+        account: build_index(repos, account, schema)
+        for account, repos in fetched.items() if repos
+    }
+
+def save_repos(store, account, repos):
+    """Upsert an account's repos into a RippleStore, dropping ones it no longer lists"""
+    with metrics.stage('store'):
+        store.upsert_repos(repos, account)
+        store.remove_repos_not_in(account, [r.full_name for r in repos])
+
+def load_repos_from_store(store, accounts):
+    """{account: repos} from a RippleStore, in the order they were fetched"""
+    return {account: [RepoRecord.from_dict(r) for r in store.repos(account=account)] for account in accounts}
+
+def build_index(repos, username, schema=1):
+    """Build the ring index document for a list of repos
+    
+    Schema 1 is the original shape, with full repo records in every ring
+    and again in all_repos. Schema 2 stores each repo once in a columnar
+    'repos' table and has rings reference repos by integer id.
+    """
+    
+    with metrics.stage('categorize'):
+        categories = categorize_repos(repos)
+    with metrics.stage('rings'):
+        rings = generate_ring_structure(repos, categories, normalized=schema == 2)
     
     # Generate comprehensive index
     index = {
@@ -213,79 +614,298 @@ def generate_comprehensive_index(username):
         },
         'summary': {
             'total_repos': len(repos),
-            'total_stars': sum(r.get('stargazers_count', 0) for r in repos),
-            'total_forks': sum(r.get('forks_count', 0) for r in repos),
-            'total_size_mb': round(sum(r.get('size', 0) for r in repos) / 1024, 2),
+            'total_stars': sum(r.stars for r in repos),
+            'total_forks': sum(r.forks for r in repos),
+            'total_size_mb': round(sum(r.size_kb for r in repos) / 1024, 2),
             'languages': {
                 lang: len(repos_list) 
                 for lang, repos_list in categories['by_language'].items()
             },
-            'has_pages_count': sum(1 for r in repos if r.get('has_pages')),
-            'archived_count': sum(1 for r in repos if r.get('archived')),
-            'fork_count': sum(1 for r in repos if r.get('fork'))
+            'has_pages_count': sum(1 for r in repos if r.has_pages),
+            'archived_count': sum(1 for r in repos if r.archived),
+            'fork_count': sum(1 for r in repos if r.is_fork)
         },
         'rings': rings,
         'categories': {
-            'by_language': {
-                lang: len(repos_list)
-                for lang, repos_list in categories['by_language'].items()
-            },
-            'by_activity': {
-                level: len(repos_list)
-                for level, repos_list in categories['by_activity'].items()
-            },
-            'by_size': {
-                size: len(repos_list)
-                for size, repos_list in categories['by_size'].items()
-            },
-            'by_stars': {
-                level: len(repos_list)
-                for level, repos_list in categories['by_stars'].items()
+            dimension: {
+                bucket: len(repos_list)
+                for bucket, repos_list in buckets.items()
             }
-        },
-        'all_repos': [
+            for dimension, buckets in categories.items()
+        }
+    }
+    
+    if schema == 2:
+        index['meta']['schema_version'] = 2
+        index['repos'] = records_table(repos)
+        return index
+    
+    index['all_repos'] = [r.to_dict(ALL_REPOS_FIELDS) for r in repos]
+    
+    return index
+
+def index_repos(index):
+    """Repo records of a ring index of either schema"""
+    if index['meta'].get('schema_version') == 2:
+        return records_from_table(index['repos'])[0]
+    return index['all_repos']
+
+DETAIL_ENDPOINTS = ('topics', 'contents', 'commits')
+
+def fetch_repo_details(client, full_name):
+    """Topics, root contents and the 5 latest commits of a repo, trimmed for the viewers"""
+    base = f"{client.api_base}/repos/{full_name}"
+    details = {}
+    for endpoint, url in (('topics', f"{base}/topics"),
+                          ('contents', f"{base}/contents"),
+                          ('commits', f"{base}/commits?per_page=5")):
+        try:
+            data, _ = client.get_json(url)
+        except urllib.error.HTTPError as e:
+            # Empty repos answer 404 for contents and 409 for commits
+            if e.code in (404, 409):
+                data = {} if endpoint == 'topics' else []
+            else:
+                raise
+        details[endpoint] = data
+    
+    return {
+        'topics': details['topics'].get('names', []),
+        'contents': [
+            {'name': item['name'], 'path': item['path'], 'type': item['type'],
+             'size': item.get('size', 0), 'html_url': item.get('html_url')}
+            for item in details['contents'] if isinstance(item, dict)
+        ],
+        'commits': [
             {
-                'name': r['name'],
-                'full_name': r['full_name'],
-                'description': r['description'],
-                'language': r.get('language'),
-                'stars': r['stargazers_count'],
-                'forks': r['forks_count'],
-                'size_kb': r['size'],
-                'updated_at': r['updated_at'],
-                'created_at': r['created_at'],
-                'html_url': r['html_url'],
-                'homepage': r.get('homepage'),
-                'has_pages': r.get('has_pages', False),
-                'topics': r.get('topics', [])
+                'sha': c['sha'],
+                'message': c['commit']['message'],
+                'author': (c['commit'].get('author') or {}).get('name'),
+                'date': (c['commit'].get('author') or {}).get('date'),
+                'html_url': c.get('html_url')
             }
-            for r in repos
+            for c in details['commits']
         ]
     }
+
+def enrich_repos(repos, client=None, details_dir='github-repo-details', max_workers=8,
+                 budget=None, reserve=50):
+    """Write a details shard per repo: <details_dir>/<owner>/<name>.json
     
-    return index
+    Repos whose updated_at matches the last run's (recorded in
+    <details_dir>/index.json) are skipped. At most `budget` API requests
+    are spent, and `reserve` requests of the rate limit are left over;
+    repos that don't fit are deferred to the next run. Returns
+    {'fetched', 'skipped', 'deferred', 'failed'} counts.
+    """
+    client = client or GitHubClient()
+    details_dir = Path(details_dir)
+    manifest_file = details_dir / 'index.json'
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    
+    stale = [r for r in repos if manifest.get(r['full_name']) != r['updated_at']]
+    
+    # Budget whole repos: every repo costs one request per endpoint
+    allowed = len(stale)
+    if budget is not None:
+        allowed = min(allowed, budget // len(DETAIL_ENDPOINTS))
+    remaining = client.rate_limiter.remaining
+    if remaining is not None:
+        allowed = min(allowed, max(remaining - reserve, 0) // len(DETAIL_ENDPOINTS))
+    stale, deferred = stale[:allowed], stale[allowed:]
+    
+    print(f"🧱 Enriching {len(stale)} repos ({len(repos) - len(stale) - len(deferred)} unchanged, "
+          f"{len(deferred)} deferred)...")
+    
+    def enrich(repo):
+        try:
+            details = fetch_repo_details(client, repo['full_name'])
+        except Exception as e:
+            # Network errors and payloads of an unexpected shape (KeyError,
+            # TypeError, ...) fail this repo only
+            print(f"   ❌ {repo['full_name']}: {type(e).__name__}: {e}")
+            return repo, False
+        shard = {
+            'full_name': repo['full_name'],
+            'updated_at': repo['updated_at'],
+            'fetched_at': datetime.now().isoformat(),
+            **details
+        }
+        path = details_dir / f"{repo['full_name']}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_artifact(shard, path, compression=())
+        return repo, True
+    
+    failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for repo, ok in executor.map(enrich, stale):
+                if ok:
+                    manifest[repo['full_name']] = repo['updated_at']
+                else:
+                    failed += 1
+    finally:
+        # Record the shards already written even if the run is cut short
+        details_dir.mkdir(parents=True, exist_ok=True)
+        write_artifact(dict(sorted(manifest.items())), manifest_file, compression=())
+    metrics.record_cache('repo_details', hits=len(repos) - len(stale) - len(deferred), misses=len(stale))
+    return {
+        'fetched': len(stale) - failed,
+        'skipped': len(repos) - len(stale) - len(deferred),
+        'deferred': len(deferred),
+        'failed': failed
+    }
+
+def print_index_summary(index):
+    print(f"\n📊 Summary:")
+    print(f"   Total repos: {index['summary']['total_repos']}")
+    print(f"   Total stars: {index['summary']['total_stars']}")
+    print(f"   Total size: {index['summary']['total_size_mb']} MB")
+    print(f"   Rings created: {len(index['rings'])}")
+    print(f"\n🌳 Tree Rings:")
+    for ring in index['rings']:
+        print(f"   Ring {ring['ring_id']}: {ring['ring_name']} - {ring['repo_count']} repos")
+    print(f"\n🎨 Languages:")
+    for lang, count in sorted(index['summary']['languages'].items(), key=lambda x: x[1], reverse=True):
+        print(f"   {lang}: {count}")
+
+def write_index(index, output_file, shard_dir=None, **output_options):
+    """Write the index, plus a ring manifest and per-ring shards when shard_dir is given"""
+    with metrics.stage('write'):
+        written = write_artifact(index, output_file, **output_options)
+        if shard_dir:
+            written.update(write_shards(index, shard_dir, 'rings', detach=('all_repos',), **output_options))
+    print(f"\n✅ Index generated: {output_file}")
+    print_artifact_report(written)
+
+def record_snapshot(index, snapshot_dir, feeds=10, **output_options):
+    """Add the index to a SnapshotStore as a delta and refresh its change feeds"""
+    store = SnapshotStore(snapshot_dir)
+    entry = store.add(index)
+    if entry is None:
+        print(f"\n🕰️  No repo changes since snapshot {store.snapshots[-1]['timestamp']}")
+        return
+    store.publish_feeds(count=feeds, **output_options)
+    print(f"\n🕰️  Snapshot {entry['timestamp']} ({entry['kind']}): +{entry['added']} added, "
+          f"-{entry['removed']} removed, ~{entry['changed']} changed → {snapshot_dir}")
 
 if __name__ == '__main__':
-    username = 'hartswf0'
+    import argparse
     
-    index = generate_comprehensive_index(username)
+    parser = argparse.ArgumentParser(description='Generate the GitHub ripple index')
+    parser.add_argument('accounts', nargs='*', default=['hartswf0'],
+                        help="GitHub users to index; prefix organisations with 'org:'")
+    parser.add_argument('--merge', action='store_true',
+                        help='write one merged index instead of one index per account')
+    parser.add_argument('--output', help='output file (single account or --merge)')
+    parser.add_argument('--schema', type=int, choices=[1, 2], default=1,
+                        help='1: original shape read by the viewers; 2: normalized repo table + ring ids')
+    parser.add_argument('--concurrent', action='store_true',
+                        help='fetch pages in parallel once the last page is known')
+    parser.add_argument('--workers', type=int, default=8, help='parallel page fetches per account')
+    parser.add_argument('--parallel-accounts', type=int, default=8, help='accounts fetched at once')
+    parser.add_argument('--api-base', default=GITHUB_API,
+                        help='GitHub API root (point at a local stand-in for testing)')
+    parser.add_argument('--cache-dir', default=str(Path(__file__).parent / '.github-cache'),
+                        help='conditional-request cache for API responses')
+    parser.add_argument('--no-cache', action='store_true', help='always download every page')
+    parser.add_argument('--cache-max-age-days', type=float, default=30)
+    parser.add_argument('--cache-max-mb', type=float, default=100)
+    parser.add_argument('--shard-dir',
+                        help='also write a ring manifest plus one shard per ring for lazy loading '
+                             '(a subdirectory per account when indexing several)')
+    parser.add_argument('--store', help='SQLite store to upsert fetched repos into (see ripple_store.py)')
+    parser.add_argument('--from-store', action='store_true',
+                        help='rebuild the index files from --store without calling the API')
+    parser.add_argument('--enrich', action='store_true',
+                        help='prefetch topics, root contents and recent commits into per-repo shards')
+    parser.add_argument('--details-dir', default=str(Path(__file__).parent / 'github-repo-details'),
+                        help='where --enrich writes <owner>/<repo>.json shards')
+    parser.add_argument('--enrich-budget', type=int,
+                        help='most API requests --enrich may spend this run (the rest are deferred)')
+    parser.add_argument('--snapshots',
+                        help='keep each index as a delta in this snapshot directory and publish '
+                             'changes-since-<timestamp>.json feeds there (a subdirectory per account when indexing several)')
+    parser.add_argument('--feeds', type=int, default=10, help='snapshots to publish change feeds for')
+    add_layout_arguments(parser)
+    add_output_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    if args.from_store and not args.store:
+        parser.error('--from-store needs --store')
+    instrumentation = start_instrumentation(args, 'generate-github-index')
     
-    if index:
-        output_file = Path(__file__).parent / 'github-ripple-index.json'
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(index, f, indent=2, ensure_ascii=False)
-        
-        print(f"\n✅ Index generated: {output_file}")
-        print(f"\n📊 Summary:")
-        print(f"   Total repos: {index['summary']['total_repos']}")
-        print(f"   Total stars: {index['summary']['total_stars']}")
-        print(f"   Total size: {index['summary']['total_size_mb']} MB")
-        print(f"   Rings created: {len(index['rings'])}")
-        print(f"\n🌳 Tree Rings:")
-        for ring in index['rings']:
-            print(f"   Ring {ring['ring_id']}: {ring['ring_name']} - {ring['repo_count']} repos")
-        print(f"\n🎨 Languages:")
-        for lang, count in sorted(index['summary']['languages'].items(), key=lambda x: x[1], reverse=True):
-            print(f"   {lang}: {count}")
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(args.cache_dir, args.cache_max_age_days, args.cache_max_mb)
+    client = GitHubClient(api_base=args.api_base, cache=cache)
+    fetch_options = {'concurrent': args.concurrent, 'max_workers': args.workers}
+    out_dir = Path(__file__).parent
+    store = RippleStore(args.store) if args.store else None
+    
+    merge = args.merge and len(args.accounts) > 1
+    if args.from_store:
+        with metrics.stage('load'):
+            fetched = load_repos_from_store(store, args.accounts)
+        indexes = build_indexes(args.accounts, fetched, merge, args.schema)
+    elif len(args.accounts) == 1:
+        index = generate_comprehensive_index(args.accounts[0], schema=args.schema, client=client,
+                                             store=store, **fetch_options)
+        indexes = {args.accounts[0]: index} if index else {}
     else:
+        indexes = generate_batch_index(args.accounts, client=client, merge=merge,
+                                       max_parallel=args.parallel_accounts, schema=args.schema,
+                                       store=store, **fetch_options)
+    if merge:
+        indexes = {'merged': indexes} if indexes else {}
+    
+    if store and (len(args.accounts) == 1 or args.merge) and indexes:
+        # analyze-themes --store reads the index meta and summary from here
+        index = next(iter(indexes.values()))
+        store.set_meta('ripple_index', {'meta': index['meta'], 'summary': index['summary']})
+    
+    for account, index in indexes.items():
+        if len(args.accounts) == 1 or args.merge:
+            output_file = Path(args.output) if args.output else out_dir / 'github-ripple-index.json'
+        else:
+            output_file = out_dir / f"github-ripple-index-{account.replace('org:', '')}.json"
+        shard_dir = args.shard_dir
+        if shard_dir and len(args.accounts) > 1 and not args.merge:
+            shard_dir = Path(shard_dir) / account.replace('org:', '')
+        if args.layout:
+            with metrics.stage('layout'):
+                add_layout(index, 'rings', args.layout)
+        write_index(index, output_file, shard_dir, **output_options(args))
+        print_index_summary(index)
+        if args.snapshots:
+            snapshot_dir = Path(args.snapshots)
+            if len(args.accounts) > 1 and not args.merge:
+                snapshot_dir = snapshot_dir / account.replace('org:', '')
+            with metrics.stage('snapshot'):
+                record_snapshot(index, snapshot_dir, args.feeds, **output_options(args))
+    
+    if args.enrich and indexes:
+        # Accounts can share repos (an org and its members); enrich each once
+        repos = list({r['full_name']: r for index in indexes.values() for r in index_repos(index)}.values())
+        with metrics.stage('enrich'):
+            counts = enrich_repos(repos, client, args.details_dir, max_workers=args.workers,
+                                  budget=args.enrich_budget)
+        print(f"🧱 Details: {counts['fetched']} fetched, {counts['skipped']} unchanged, "
+              f"{counts['deferred']} deferred, {counts['failed']} failed → {args.details_dir}")
+    client.close()
+    if store:
+        store.close()
+    
+    if cache:
+        evicted = cache.prune()
+        print(f"🗄️  Cache: {cache.revalidated} pages revalidated (304), "
+              f"{cache.downloaded} re-downloaded, {evicted} evicted")
+    
+    if not indexes:
         print("❌ Failed to generate index")
+    
+    instrumentation.finish()
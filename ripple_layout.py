@@ -0,0 +1,178 @@
+"""
+Precomputed ring layout for the viewers (needs numpy)
+
+For every ring of a ripple or thematic index, places each repo as a node
+inside the ring's [radius_start, radius_end) band:
+- node radii scale with log(size) or log(stars)
+- nodes are packed by angle in ring order
+- a ring that doesn't fit on one circle spills onto extra concentric
+  tracks, so no two nodes overlap
+
+The result is stored under index['layout'] as base64 little-endian typed
+arrays, in ring order (ring i's nodes start at offsets[i]):
+
+    x, y, angle, radius, node_radius   float32
+    track                              uint8
+
+A viewer decodes one with new Float32Array(Uint8Array.from(atob(data),
+c => c.charCodeAt(0)).buffer). In sharded output (write_shards) the
+manifest keeps only the layout header and each ring shard carries its own
+nodes' arrays under 'layout' (split_layout).
+"""
+
+import base64
+import math
+
+LAYOUT_VERSION = 1
+
+# Repo field each --layout scale reads
+SCALE_FIELDS = {'size': 'size_kb', 'stars': 'stars', 'none': None}
+
+ARRAYS = ('x', 'y', 'angle', 'radius', 'node_radius', 'track')
+
+# Bytes per element of each encoded dtype
+ITEM_SIZES = {'float32': 4, 'uint8': 1}
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError("Ring layout needs numpy (pip install numpy)")
+    return np
+
+def encode_array(values, dtype):
+    """{'dtype', 'length', 'data'} with the values as base64 little-endian bytes"""
+    np = _numpy()
+    array = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': dtype, 'length': int(array.size), 'data': base64.b64encode(array.tobytes()).decode('ascii')}
+
+def decode_array(encoded):
+    np = _numpy()
+    return np.frombuffer(base64.b64decode(encoded['data']), dtype=np.dtype(encoded['dtype']).newbyteorder('<'))
+
+def node_radii(values, min_radius=2.0, max_radius=10.0):
+    """Node radii between min and max, scaled by log1p of the values"""
+    np = _numpy()
+    values = np.log1p(np.maximum(np.asarray(values, dtype=np.float64), 0))
+    top = values.max() if values.size else 0
+    if top <= 0:
+        return np.full(values.shape, min_radius)
+    return min_radius + (max_radius - min_radius) * values / top
+
+def pack_ring(node_radius, radius_start, radius_end, gap=1.0):
+    """(angle, radius, track, node_radius) for nodes packed into a ring band
+
+    Each node needs an arc of its diameter plus the gap. With t evenly
+    spaced tracks across the band, nodes are dealt out in order in
+    proportion to each track's circumference; t grows until every track
+    can hold its nodes, and each track's nodes are then spread over its
+    whole circle. Node radii shrink when the tracks get closer together
+    than the nodes are wide.
+    """
+    np = _numpy()
+    node_radius = np.asarray(node_radius, dtype=np.float64)
+    if node_radius.size == 0:
+        empty = np.zeros(0)
+        return empty, empty, np.zeros(0, dtype=np.uint8), empty
+    band = max(radius_end - radius_start, 1e-6)
+
+    tracks = 1
+    while True:
+        spacing = band / tracks
+        radius = np.minimum(node_radius, max((spacing - gap) / 2, 0))
+        track_radii = radius_start + (np.arange(tracks) + 0.5) * spacing
+        # Chords are a little shorter than arcs; the margin covers it
+        widths = (2 * radius + gap) * 1.02
+        capacity = 2 * math.pi * track_radii
+        centers = (np.cumsum(widths) - widths / 2) / widths.sum() * capacity.sum()
+        track = np.minimum(np.searchsorted(np.cumsum(capacity), centers), tracks - 1)
+        used = np.bincount(track, weights=widths, minlength=tracks)
+        if (used <= capacity).all() or tracks >= 255:
+            break
+        tracks += 1
+
+    # Position along the track, as a fraction of the arc its nodes use
+    first = np.searchsorted(track, np.arange(tracks))
+    before = np.concatenate(([0.0], np.cumsum(widths)))
+    local = before[:-1] - before[first[track]] + widths / 2
+    # Rotate each track a little so the tracks' first nodes don't line up
+    angle = 2 * math.pi * local / used[track] + math.pi * track / max(tracks, 1)
+    return np.mod(angle, 2 * math.pi), track_radii[track], track.astype(np.uint8), radius
+
+def _ring_values(index, ring, field):
+    """Values of a repo field for a ring's members, in ring order, for either schema"""
+    if 'repo_ids' in ring:
+        column = index['repos'][field]
+        return [column[i] or 0 for i in ring['repo_ids']]
+    return [repo.get(field) or 0 for repo in ring['repos']]
+
+def compute_layout(index, rings_key, scale='size', min_radius=2.0, max_radius=10.0, gap=1.0):
+    """The layout block for an index's rings (see the module docstring)"""
+    np = _numpy()
+    field = SCALE_FIELDS[scale]
+    parts = {name: [] for name in ('x', 'y', 'angle', 'radius', 'node_radius', 'track')}
+    offsets = []
+    total = 0
+    for ring in index[rings_key]:
+        count = ring['repo_count']
+        offsets.append(total)
+        total += count
+        values = _ring_values(index, ring, field) if field else [0] * count
+        angle, radius, track, node_radius = pack_ring(
+            node_radii(values, min_radius, max_radius), ring['radius_start'], ring['radius_end'], gap
+        )
+        parts['x'].append(radius * np.cos(angle))
+        parts['y'].append(radius * np.sin(angle))
+        parts['angle'].append(angle)
+        parts['radius'].append(radius)
+        parts['node_radius'].append(node_radius)
+        parts['track'].append(track)
+
+    def joined(name):
+        return np.concatenate(parts[name]) if parts[name] else np.zeros(0)
+
+    layout = {
+        'version': LAYOUT_VERSION,
+        'rings_key': rings_key,
+        'scale': scale,
+        'count': total,
+        'offsets': offsets
+    }
+    for name in ('x', 'y', 'angle', 'radius', 'node_radius'):
+        layout[name] = encode_array(joined(name), 'float32')
+    layout['track'] = encode_array(joined('track'), 'uint8')
+    return layout
+
+def split_layout(layout):
+    """(header, [per-ring layout]) from a layout block, without numpy
+
+    The header is the layout minus its arrays; ring i's part holds the
+    slice of every array for that ring's nodes, re-encoded on its own.
+    """
+    header = {key: value for key, value in layout.items() if key not in ARRAYS}
+    decoded = {name: base64.b64decode(layout[name]['data']) for name in ARRAYS}
+    bounds = layout['offsets'] + [layout['count']]
+    parts = []
+    for start, end in zip(bounds, bounds[1:]):
+        part = {'count': end - start}
+        for name in ARRAYS:
+            dtype = layout[name]['dtype']
+            size = ITEM_SIZES[dtype]
+            part[name] = {
+                'dtype': dtype,
+                'length': end - start,
+                'data': base64.b64encode(decoded[name][start * size:end * size]).decode('ascii')
+            }
+        parts.append(part)
+    return header, parts
+
+def add_layout(index, rings_key, scale='size', **options):
+    """Compute the layout and store it in index['layout']; returns the index"""
+    index['layout'] = compute_layout(index, rings_key, scale, **options)
+    return index
+
+def add_layout_arguments(parser):
+    """Register --layout on an argparse parser"""
+    parser.add_argument('--layout', nargs='?', const='size', choices=sorted(SCALE_FIELDS),
+                        help='precompute node positions for the viewers, node size scaled by '
+                             'size (default), stars or none (needs numpy)')
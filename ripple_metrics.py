@@ -0,0 +1,290 @@
+"""
+Shared instrumentation for the pipeline scripts
+
+One process-wide Metrics registry collects:
+- per-stage wall time, CPU time and memory
+- per-request HTTP latency, bytes and status
+- cache hits and misses
+- plain counters
+
+Every script registers --metrics FILE, which writes the registry as JSON
+(or as Prometheus text for a .prom/.txt file) when the run ends, and
+--profile DIR, which adds a cProfile dump and a tracemalloc report.
+
+    with metrics.stage('categorize'):
+        categories = categorize_repos(repos)
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Upper bounds (seconds) of the HTTP latency histogram buckets
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+PROMETHEUS_EXTENSIONS = ('.prom', '.txt')
+
+def _peak_rss_bytes():
+    """The process's resident-memory high-water mark, or None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _current_rss_bytes():
+    """The process's resident memory right now (Linux /proc), or None where unsupported"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+class Metrics:
+    """Thread-safe registry of stage timings, HTTP requests, cache lookups and counters
+
+    Stage CPU time is that of the thread running the stage, so stages that
+    run side by side (as in ripple_pipeline) are not charged for each other;
+    work a stage hands to a thread or process pool is not included. Stage
+    memory is the traced peak (peak_memory_bytes) while tracemalloc is
+    running, as under --profile, and the resident-memory growth from stage
+    start to end (rss_growth_bytes, largest single run) where the platform
+    exposes current RSS. The process-wide RSS high-water mark is reported
+    once, under 'process', since it is not specific to any stage. Stages
+    entered more than once accumulate.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+        self.caches = {}
+        self.http = {
+            'requests': 0,
+            'bytes': 0,
+            'seconds': 0.0,
+            'max_seconds': 0.0,
+            'status': {},
+            'buckets': [0] * (len(LATENCY_BUCKETS) + 1)
+        }
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one run of stage `name`"""
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        rss = _current_rss_bytes()
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu
+            peak = tracemalloc.get_traced_memory()[1] if tracing else None
+            end_rss = _current_rss_bytes()
+            growth = end_rss - rss if rss is not None and end_rss is not None else None
+            with self._lock:
+                entry = self.stages.setdefault(name, {
+                    'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                    'peak_memory_bytes': None, 'rss_growth_bytes': None
+                })
+                entry['calls'] += 1
+                entry['wall_seconds'] += wall
+                entry['cpu_seconds'] += cpu
+                if peak is not None:
+                    entry['peak_memory_bytes'] = max(entry['peak_memory_bytes'] or 0, peak)
+                if growth is not None:
+                    previous = entry['rss_growth_bytes']
+                    entry['rss_growth_bytes'] = growth if previous is None else max(previous, growth)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_request(self, seconds, nbytes, status):
+        """One HTTP round trip: latency, response body size and status code"""
+        with self._lock:
+            http = self.http
+            http['requests'] += 1
+            http['bytes'] += nbytes
+            http['seconds'] += seconds
+            http['max_seconds'] = max(http['max_seconds'], seconds)
+            http['status'][str(status)] = http['status'].get(str(status), 0) + 1
+            bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound),
+                          len(LATENCY_BUCKETS))
+            http['buckets'][bucket] += 1
+
+    def record_cache(self, cache, hits=0, misses=0):
+        with self._lock:
+            entry = self.caches.setdefault(cache, {'hits': 0, 'misses': 0})
+            entry['hits'] += hits
+            entry['misses'] += misses
+
+    def snapshot(self, script=None):
+        """The registry as a JSON-ready dict"""
+        with self._lock:
+            http = dict(self.http, status=dict(self.http['status']))
+            buckets = http.pop('buckets')
+            http['mean_seconds'] = http['seconds'] / http['requests'] if http['requests'] else 0.0
+            # Cumulative counts per upper bound, as in a Prometheus histogram
+            cumulative = 0
+            http['latency_buckets'] = {}
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+                cumulative += count
+                http['latency_buckets'][str(bound)] = cumulative
+            return {
+                'script': script,
+                'started': datetime.fromtimestamp(self.started).isoformat(),
+                'run_seconds': time.time() - self.started,
+                'process': {'peak_rss_bytes': _peak_rss_bytes()},
+                'stages': {name: dict(entry) for name, entry in self.stages.items()},
+                'http': http,
+                'caches': {
+                    name: dict(entry, hit_rate=entry['hits'] / (entry['hits'] + entry['misses'])
+                               if entry['hits'] + entry['misses'] else None)
+                    for name, entry in self.caches.items()
+                },
+                'counters': dict(self.counters)
+            }
+
+    def to_prometheus(self, script=None):
+        """The registry in the Prometheus text exposition format"""
+        data = self.snapshot(script)
+        base = f'script="{script}"' if script else ''
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP ripple_{name} {help_text}')
+            lines.append(f'# TYPE ripple_{name} {kind}')
+            for labels, value, *suffix in samples:
+                labels = ','.join(filter(None, [base, labels]))
+                series = f"ripple_{name}{suffix[0] if suffix else ''}"
+                lines.append(f'{series}{{{labels}}} {value}' if labels else f'{series} {value}')
+
+        stages = data['stages']
+        metric('stage_wall_seconds_total', 'counter', 'Wall-clock time spent in a stage',
+               [(f'stage="{s}"', e['wall_seconds']) for s, e in stages.items()])
+        metric('stage_cpu_seconds_total', 'counter', 'CPU time of the thread running a stage',
+               [(f'stage="{s}"', e['cpu_seconds']) for s, e in stages.items()])
+        metric('stage_calls_total', 'counter', 'Times a stage ran',
+               [(f'stage="{s}"', e['calls']) for s, e in stages.items()])
+        metric('stage_peak_memory_bytes', 'gauge', 'Peak traced (tracemalloc) memory during a stage',
+               [(f'stage="{s}"', e['peak_memory_bytes']) for s, e in stages.items()
+                if e['peak_memory_bytes'] is not None])
+        metric('stage_rss_growth_bytes', 'gauge', 'Resident memory growth over one run of a stage',
+               [(f'stage="{s}"', e['rss_growth_bytes']) for s, e in stages.items()
+                if e['rss_growth_bytes'] is not None])
+        peak_rss = data['process']['peak_rss_bytes']
+        if peak_rss is not None:
+            metric('process_peak_rss_bytes', 'gauge', 'Resident memory high-water mark of the process',
+                   [('', peak_rss)])
+
+        http = data['http']
+        metric('http_requests_total', 'counter', 'HTTP requests by status code',
+               [(f'code="{code}"', count) for code, count in http['status'].items()])
+        metric('http_response_bytes_total', 'counter', 'HTTP response body bytes', [('', http['bytes'])])
+        metric('http_request_duration_seconds', 'histogram', 'HTTP request latency',
+               [(f'le="{bound}"', count, '_bucket') for bound, count in http['latency_buckets'].items()]
+               + [('', http['seconds'], '_sum'), ('', http['requests'], '_count')])
+
+        caches = data['caches']
+        metric('cache_hits_total', 'counter', 'Cache hits',
+               [(f'cache="{c}"', e['hits']) for c, e in caches.items()])
+        metric('cache_misses_total', 'counter', 'Cache misses',
+               [(f'cache="{c}"', e['misses']) for c, e in caches.items()])
+        for name, value in data['counters'].items():
+            metric(f'{name}_total', 'counter', name.replace('_', ' ').capitalize(), [('', value)])
+
+        metric('run_seconds', 'gauge', 'Duration of the run', [('', data['run_seconds'])])
+        metric('last_run_timestamp_seconds', 'gauge', 'When the run finished', [('', time.time())])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, script=None):
+        """Write the registry to path: Prometheus text for .prom/.txt, JSON otherwise"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix in PROMETHEUS_EXTENSIONS:
+            text = self.to_prometheus(script)
+        else:
+            text = json.dumps(self.snapshot(script), indent=2) + '\n'
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(text, encoding='utf-8')
+        tmp_path.replace(path)
+
+# The process-wide registry the scripts record into
+metrics = Metrics()
+
+class Instrumentation:
+    """A script run's --profile and --metrics outputs
+
+    start() begins profiling; finish() (also registered to run at exit, so
+    early exits are covered) writes the profile and the metrics file.
+    """
+
+    def __init__(self, script, profile_dir=None, metrics_file=None, registry=None):
+        self.script = script
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.metrics_file = metrics_file
+        self.registry = registry or metrics
+        self.profiler = None
+        self.finished = False
+
+    def start(self):
+        if self.profile_dir:
+            import cProfile
+            tracemalloc.start()
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        atexit.register(self.finish)
+        return self
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        if self.profiler:
+            self.profiler.disable()
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            profile_file = self.profile_dir / f'{self.script}.prof'
+            self.profiler.dump_stats(profile_file)
+            memory_file = self.profile_dir / f'{self.script}-tracemalloc.txt'
+            self._write_memory_report(memory_file)
+            print(f"🔬 Profile written: {profile_file} (view with: python3 -m pstats), {memory_file}")
+        if self.metrics_file:
+            self.registry.write(self.metrics_file, self.script)
+            print(f"📈 Metrics written: {self.metrics_file}")
+
+    def _write_memory_report(self, path, top=40):
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = snapshot.statistics('lineno')
+        lines = [f'current {current:,} bytes, peak {peak:,} bytes', f'top {top} allocation sites:']
+        lines += [str(stat) for stat in stats[:top]]
+        Path(path).write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+def add_metrics_arguments(parser):
+    """Register --profile and --metrics on an argparse parser"""
+    parser.add_argument('--profile', metavar='DIR',
+                        help='write a cProfile dump (<script>.prof) and a tracemalloc report to DIR')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='write stage, HTTP and cache metrics: Prometheus text for .prom/.txt, JSON otherwise')
+
+def start_instrumentation(args, script):
+    """Start --profile/--metrics collection for a script run from parsed flags"""
+    return Instrumentation(script, args.profile, args.metrics).start()
@@ -0,0 +1,363 @@
+"""
+Shared output stage for the index generators
+
+Writes JSON artifacts minified (or pretty with --pretty), plus
+precompressed .gz/.br siblings that static hosts can serve directly, and
+optionally a binary MessagePack/CBOR variant. JSONStreamWriter writes the
+same JSON without holding the whole document in memory, and write_shards
+splits a ring index into a manifest plus one lazily loadable file per ring.
+"""
+
+import gzip
+import json
+from pathlib import Path
+
+from ripple_layout import split_layout
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSORS = ('gz', 'br')
+BINARY_FORMATS = ('msgpack', 'cbor')
+
+def encode_json(data, pretty=False):
+    """Serialize to UTF-8 JSON bytes, minified unless pretty"""
+    if pretty:
+        text = json.dumps(data, indent=2, ensure_ascii=False)
+    else:
+        text = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+    return text.encode('utf-8')
+
+def encode_binary(data, fmt):
+    """Serialize to MessagePack or CBOR (needs the msgpack / cbor2 package)"""
+    if fmt == 'msgpack':
+        try:
+            import msgpack
+        except ImportError:
+            raise RuntimeError("MessagePack output needs the 'msgpack' package (pip install msgpack)")
+        return msgpack.packb(data, use_bin_type=True)
+    if fmt == 'cbor':
+        try:
+            import cbor2
+        except ImportError:
+            raise RuntimeError("CBOR output needs the 'cbor2' package (pip install cbor2)")
+        return cbor2.dumps(data)
+    raise ValueError(f"Unknown binary format: {fmt}")
+
+def compress(payload, method):
+    if method == 'gz':
+        # mtime=0 keeps the output byte-identical across runs
+        return gzip.compress(payload, compresslevel=9, mtime=0)
+    if method == 'br':
+        return brotli.compress(payload, quality=11)
+    raise ValueError(f"Unknown compression: {method}")
+
+def _write_bytes(path, payload):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    tmp_path.replace(path)
+
+# The missing-brotli warning is printed once per process, not once per file
+_warned_no_brotli = False
+
+def _available_methods(compression):
+    global _warned_no_brotli
+    methods = list(compression)
+    if 'br' in methods and brotli is None:
+        if not _warned_no_brotli:
+            print("⚠️  brotli not installed, skipping .br output (pip install brotli)")
+            _warned_no_brotli = True
+        methods.remove('br')
+    return methods
+
+def _remove_stale_siblings(path, methods):
+    for method in COMPRESSORS:
+        sibling = path.with_name(f'{path.name}.{method}')
+        if method not in methods and sibling.exists():
+            sibling.unlink()
+
+def write_artifact(data, output_file, pretty=False, compression=COMPRESSORS, binary=()):
+    """Write a JSON artifact and its precompressed/binary siblings
+
+    Returns {path: bytes written}. Compressed siblings left over from an
+    earlier run with different options are removed so a static host never
+    serves a stale .gz/.br.
+    """
+    output_file = Path(output_file)
+    written = {}
+
+    payloads = [(output_file, encode_json(data, pretty))]
+    for fmt in binary:
+        payloads.append((output_file.with_suffix(f'.{fmt}'), encode_binary(data, fmt)))
+
+    methods = _available_methods(compression)
+
+    for path, payload in payloads:
+        _write_payload(path, payload, methods, written)
+
+    return written
+
+def _write_payload(path, payload, methods, written):
+    _write_bytes(path, payload)
+    written[path] = len(payload)
+    for method in methods:
+        sibling = path.with_name(f'{path.name}.{method}')
+        compressed = compress(payload, method)
+        _write_bytes(sibling, compressed)
+        written[sibling] = len(compressed)
+    _remove_stale_siblings(path, methods)
+
+class _CompressedSink:
+    """A .tmp file fed incrementally through one compressor (or none)"""
+
+    def __init__(self, path, method=None):
+        self.path = path
+        self.tmp_path = path.with_name(path.name + '.tmp')
+        self.file = open(self.tmp_path, 'wb')
+        self.size = 0
+        if method == 'gz':
+            self.compressor = gzip.GzipFile(filename='', mode='wb', compresslevel=9,
+                                            fileobj=self.file, mtime=0)
+        elif method == 'br':
+            self.compressor = brotli.Compressor(quality=11)
+        else:
+            self.compressor = None
+
+    def write(self, chunk):
+        if isinstance(self.compressor, gzip.GzipFile):
+            self.compressor.write(chunk)
+            return
+        if self.compressor is not None:
+            chunk = self.compressor.process(chunk)
+        self.file.write(chunk)
+
+    def close(self):
+        if isinstance(self.compressor, gzip.GzipFile):
+            self.compressor.close()
+        elif self.compressor is not None:
+            self.file.write(self.compressor.finish())
+        self.size = self.file.tell()
+        self.file.close()
+        self.tmp_path.replace(self.path)
+
+    def abort(self):
+        self.file.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+class JSONStreamWriter:
+    """Write one JSON object to disk member by member
+
+    Scalars and small members go through field(); a large list is written
+    with begin_list()/item()/end_list() so its items never have to be held
+    in memory together. The .gz/.br siblings are compressed alongside, and
+    the output matches what write_artifact() would produce for the same
+    object (minified or pretty). Files are only moved into place on close().
+    Binary variants need the whole document, so they are encoded from the
+    finished JSON file.
+
+        with JSONStreamWriter(path) as writer:
+            writer.field('meta', meta)
+            writer.begin_list('pages')
+            for page in pages:
+                writer.item(page)
+            writer.end_list()
+        print_artifact_report(writer.written)
+    """
+
+    def __init__(self, output_file, pretty=False, compression=COMPRESSORS, binary=()):
+        self.output_file = Path(output_file)
+        self.pretty = pretty
+        self.binary = binary
+        methods = _available_methods(compression)
+        self.methods = methods
+        self.sinks = [_CompressedSink(self.output_file)]
+        self.sinks += [_CompressedSink(self.output_file.with_name(f'{self.output_file.name}.{m}'), m)
+                       for m in methods]
+        self.members = 0
+        self.items = None
+        self.written = {}
+        self._emit('{')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for sink in self.sinks:
+                sink.abort()
+
+    def _emit(self, text):
+        chunk = text.encode('utf-8')
+        for sink in self.sinks:
+            sink.write(chunk)
+
+    def _encode(self, value, depth):
+        if not self.pretty:
+            return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+        # Strings never contain a raw newline, so re-indenting is safe
+        return json.dumps(value, indent=2, ensure_ascii=False).replace('\n', '\n' + '  ' * depth)
+
+    def _key(self, key):
+        separator = ',' if self.members else ''
+        self.members += 1
+        if self.pretty:
+            return f'{separator}\n  {json.dumps(key, ensure_ascii=False)}: '
+        return f'{separator}{json.dumps(key, ensure_ascii=False)}:'
+
+    def field(self, key, value):
+        self._emit(self._key(key) + self._encode(value, 1))
+
+    def begin_list(self, key):
+        self._emit(self._key(key) + '[')
+        self.items = 0
+
+    def item(self, value):
+        separator = ',' if self.items else ''
+        self.items += 1
+        if self.pretty:
+            self._emit(f'{separator}\n    {self._encode(value, 2)}')
+        else:
+            self._emit(separator + self._encode(value, 2))
+
+    def end_list(self):
+        self._emit('\n  ]' if self.pretty and self.items else ']')
+        self.items = None
+
+    def close(self):
+        """Finish the object, move the files into place and return {path: bytes}"""
+        self._emit('\n}' if self.pretty and self.members else '}')
+        for sink in self.sinks:
+            sink.close()
+            self.written[sink.path] = sink.size
+        _remove_stale_siblings(self.output_file, self.methods)
+        if self.binary:
+            with open(self.output_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for fmt in self.binary:
+                _write_payload(self.output_file.with_suffix(f'.{fmt}'), encode_binary(data, fmt),
+                               self.methods, self.written)
+        return self.written
+
+def shard_rings(index, rings_key, detach=()):
+    """Split a ring index into a small manifest and one shard per ring
+
+    Each manifest ring keeps its skeleton (ids, counts, colors, radii) and
+    names its shard file instead of listing repos. A shard holds the ring's
+    repo records, or for schema 2 its repo_ids plus the matching rows of
+    the columnar 'repos' table. Top-level keys in `detach` (e.g. a keyword
+    network) move to shards of their own, listed under manifest['shards'].
+    A precomputed 'layout' is split the same way: the manifest keeps its
+    header and each ring shard carries its own nodes' positions, so the
+    manifest stays the same size however many repos there are.
+    Returns (manifest, {filename: shard}).
+    """
+    table = index.get('repos') if isinstance(index.get('repos'), dict) else None
+    # Every repo sits in exactly one ring, so a schema 2 table is spread over the ring shards
+    dropped = set(detach) | ({'repos'} if table is not None else set())
+    manifest = {key: value for key, value in index.items() if key not in dropped}
+    shards = {}
+
+    ring_layouts = None
+    layout = index.get('layout')
+    if layout and layout.get('rings_key') == rings_key:
+        manifest['layout'], ring_layouts = split_layout(layout)
+
+    rings = []
+    for position, ring in enumerate(index[rings_key]):
+        filename = f"ring-{ring['ring_id']}.json"
+        skeleton = {key: value for key, value in ring.items() if key not in ('repos', 'repo_ids')}
+        skeleton['shard'] = filename
+        rings.append(skeleton)
+        if 'repo_ids' in ring:
+            ids = ring['repo_ids']
+            shards[filename] = {
+                'ring_id': ring['ring_id'],
+                'repo_ids': ids,
+                'repos': {column: [values[i] for i in ids] for column, values in table.items()}
+            }
+        else:
+            shards[filename] = {'ring_id': ring['ring_id'], 'repos': ring['repos']}
+        if ring_layouts is not None:
+            shards[filename]['layout'] = ring_layouts[position]
+    manifest[rings_key] = rings
+
+    detached = {}
+    for key in detach:
+        if key in index:
+            filename = key.replace('_', '-') + '.json'
+            shards[filename] = {key: index[key]}
+            detached[key] = filename
+    if detached:
+        manifest['shards'] = detached
+
+    return manifest, shards
+
+def _listed_shards(manifest_file):
+    """Shard file names a manifest on disk lists (none if it can't be read)"""
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    names = set(manifest.get('shards', {}).values())
+    for rings in manifest.values():
+        if isinstance(rings, list):
+            names.update(ring['shard'] for ring in rings if isinstance(ring, dict) and 'shard' in ring)
+    return names
+
+def write_shards(index, shard_dir, rings_key, detach=(), **output_options):
+    """Write shard_rings() output as <shard_dir>/manifest.json plus the shard files
+
+    Shards an earlier run wrote that the new manifest doesn't list (rings
+    that went away, a detached key no longer asked for) are removed with
+    their siblings; other files in the directory are left alone.
+    Returns {path: bytes written} like write_artifact.
+    """
+    shard_dir = Path(shard_dir)
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    manifest, shards = shard_rings(index, rings_key, detach)
+    previous = _listed_shards(shard_dir / 'manifest.json')
+
+    written = {}
+    for filename, shard in shards.items():
+        written.update(write_artifact(shard, shard_dir / filename, **output_options))
+    # The manifest goes last so it never names a shard that isn't there yet
+    written.update(write_artifact(manifest, shard_dir / 'manifest.json', **output_options))
+
+    stale = {name.split('.')[0] for name in previous | {path.name for path in shard_dir.glob('ring-*')}}
+    stale -= {filename.split('.')[0] for filename in shards}
+    for stem in stale:
+        for path in shard_dir.glob(f'{stem}.*'):
+            path.unlink()
+    return written
+
+def print_artifact_report(written):
+    """Print bytes written per format"""
+    print(f"\n💾 Artifacts written:")
+    for path, size in written.items():
+        print(f"   {path.name}: {size:,} bytes")
+
+def add_output_arguments(parser):
+    """Register the shared output flags on an argparse parser"""
+    parser.add_argument('--pretty', action='store_true', help='indent JSON instead of minifying')
+    parser.add_argument('--compress', default=','.join(COMPRESSORS),
+                        help="precompressed siblings to write: comma list of gz,br, or 'none'")
+    parser.add_argument('--binary', default='',
+                        help='also write binary variants: comma list of msgpack,cbor')
+
+def output_options(args):
+    """write_artifact keyword arguments from parsed output flags"""
+    compression = [] if args.compress == 'none' else [m for m in args.compress.split(',') if m]
+    for method in compression:
+        if method not in COMPRESSORS:
+            raise SystemExit(f"Unknown --compress method: {method}")
+    binary = [fmt for fmt in args.binary.split(',') if fmt]
+    for fmt in binary:
+        if fmt not in BINARY_FORMATS:
+            raise SystemExit(f"Unknown --binary format: {fmt}")
+    return {'pretty': args.pretty, 'compression': compression, 'binary': binary}
@@ -0,0 +1,204 @@
+"""
+In-process pipeline runner
+
+Runs fetch → categorize → rings → themes → search in one process, handing
+each stage's result to the next in memory: the fetched RepoRecords go
+straight into theme analysis and the thematic index straight into the
+search index builder, with no JSON written and parsed in between. The
+sitemap is built on a second thread while the GitHub fetch waits on the
+network. Only the requested artifacts are written; the stages they depend
+on run either way.
+
+    python3 ripple_pipeline.py hartswf0 --artifacts themes search
+    python3 ripple_pipeline.py hartswf0 --artifacts index themes sitemap --root . -r
+
+The stage code lives in the pipeline scripts, imported by module name.
+"""
+
+import importlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ripple_layout import add_layout, add_layout_arguments
+from ripple_metrics import metrics, add_metrics_arguments, start_instrumentation
+from ripple_output import write_artifact, print_artifact_report, add_output_arguments, output_options
+from ripple_records import FIELDS, ALL_REPOS_FIELDS
+
+HERE = Path(__file__).parent
+
+ARTIFACTS = ('index', 'themes', 'search', 'sitemap')
+
+# Output file of each artifact, under the output directory
+ARTIFACT_FILES = {
+    'index': 'github-ripple-index.json',
+    'themes': 'github-thematic-index.json',
+    'search': 'github-search-index.json',
+    'sitemap': 'sitemap-detailed.json'
+}
+
+def stage_module(name):
+    """A (hyphen-named) pipeline script, imported by module name
+
+    Importing by name rather than from a path keeps the sitemap's pool
+    worker picklable when its processes are spawned.
+    """
+    return importlib.import_module(name)
+
+def run_pipeline(accounts=('hartswf0',), artifacts=ARTIFACTS, output_dir=HERE, schema=1, client=None,
+                 fetch_options=None, theme_options=None, search_options=None, sitemap_options=None,
+                 layout=None, **output_options):
+    """Run the stages the requested artifacts need and write those artifacts
+
+    Several accounts are merged into one index. With layout ('size',
+    'stars' or 'none') the written index and thematic index carry a
+    precomputed ring layout (see ripple_layout.py). Returns (documents,
+    written): the in-memory index, thematic and search documents that were
+    built, and the bytes written per file.
+    """
+    artifacts = set(artifacts)
+    unknown = artifacts - set(ARTIFACTS)
+    if unknown:
+        raise ValueError(f"Unknown artifacts: {', '.join(sorted(unknown))}")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    documents = {}
+    written = {}
+
+    with ThreadPoolExecutor(max_workers=1) as background:
+        sitemap = None
+        if 'sitemap' in artifacts:
+            sitemap = background.submit(_build_sitemap, output_dir / ARTIFACT_FILES['sitemap'],
+                                        sitemap_options or {}, output_options)
+        if artifacts & {'index', 'themes', 'search'}:
+            _build_github_artifacts(list(accounts), artifacts, output_dir, schema, client,
+                                    fetch_options or {}, theme_options or {}, search_options or {},
+                                    layout, output_options, documents, written)
+        if sitemap:
+            sitemap.result()
+    return documents, written
+
+def _build_github_artifacts(accounts, artifacts, output_dir, schema, client, fetch_options,
+                            theme_options, search_options, layout, output_options, documents, written):
+    github = stage_module('generate-github-index')
+    own_client = client is None
+    client = client or github.GitHubClient()
+    try:
+        fetched = github.fetch_accounts(accounts, client, **fetch_options)
+    finally:
+        if own_client:
+            client.close()
+
+    repos = github.merge_repos(accounts, fetched)
+    if not repos:
+        raise RuntimeError(f"No repositories fetched for {', '.join(accounts)}")
+    index = documents['index'] = github.build_index(repos, ', '.join(accounts), schema)
+    if len(accounts) > 1:
+        index['meta']['github_users'] = accounts
+    if layout and 'index' in artifacts:
+        with metrics.stage('layout'):
+            add_layout(index, 'rings', layout)
+    if 'index' in artifacts:
+        _write(index, output_dir / ARTIFACT_FILES['index'], output_options, written)
+
+    if not artifacts & {'themes', 'search'}:
+        return
+    # The fields a reader of the written index would load back into records
+    fields = list(FIELDS if schema == 2 else ALL_REPOS_FIELDS)
+    thematic = documents['themes'] = stage_module('analyze-themes').build_thematic_index(
+        index, repos, fields, schema, **theme_options
+    )
+    if layout and 'themes' in artifacts:
+        with metrics.stage('layout'):
+            add_layout(thematic, 'theme_rings', layout)
+    if 'themes' in artifacts:
+        _write(thematic, output_dir / ARTIFACT_FILES['themes'], output_options, written)
+
+    if 'search' in artifacts:
+        with metrics.stage('search_index'):
+            search = documents['search'] = stage_module('build-search-index').search_index_document(
+                thematic, ARTIFACT_FILES['themes'], **search_options
+            )
+        _write(search, output_dir / ARTIFACT_FILES['search'], output_options, written)
+
+def _build_sitemap(output_file, sitemap_options, output_options):
+    # Forking while the fetch threads run is unsafe, so the page pool is spawned
+    with metrics.stage('sitemap'):
+        stage_module('generate-detailed-sitemap').generate_detailed_sitemap(
+            output_file=output_file, mp_context=multiprocessing.get_context('spawn'),
+            **sitemap_options, **output_options
+        )
+
+def _write(document, path, output_options, written):
+    with metrics.stage('write'):
+        written.update(write_artifact(document, path, **output_options))
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run the ripple pipeline in one process')
+    parser.add_argument('accounts', nargs='*', default=['hartswf0'],
+                        help="GitHub users to index (merged into one index); prefix organisations with 'org:'")
+    parser.add_argument('--artifacts', nargs='+', choices=ARTIFACTS, default=list(ARTIFACTS),
+                        help='artifacts to write (the stages they need run regardless)')
+    parser.add_argument('--output-dir', default=str(HERE))
+    parser.add_argument('--schema', type=int, choices=[1, 2], default=1,
+                        help='1: original shape read by the viewers; 2: normalized repo table + ring ids')
+    parser.add_argument('--concurrent', action='store_true',
+                        help='fetch pages in parallel once the last page is known')
+    parser.add_argument('--workers', type=int, default=8, help='parallel page fetches per account')
+    parser.add_argument('--api-base', help='GitHub API root (point at a local stand-in for testing)')
+    parser.add_argument('--cache-dir', default=str(HERE / '.github-cache'),
+                        help='conditional-request cache for API responses')
+    parser.add_argument('--no-cache', action='store_true', help='always download every page')
+    parser.add_argument('--themes', help='JSON theme table to use instead of the built-in one')
+    parser.add_argument('--word-boundary', action='store_true', help='match theme keywords as whole words')
+    parser.add_argument('--mode', choices=['keywords', 'clusters'], default='keywords')
+    parser.add_argument('--clusters', type=int, default=10, help='number of clusters in clusters mode')
+    parser.add_argument('--incremental', nargs='?', metavar='STATE_FILE', const=str(HERE / '.theme-state.json'),
+                        help='only re-score new or changed repos, keeping state in STATE_FILE')
+    parser.add_argument('--prefixes', type=int, default=0, metavar='N',
+                        help='search index prefix table for prefixes up to N characters')
+    parser.add_argument('--trigrams', action='store_true', help='add a trigram table to the search index')
+    parser.add_argument('--root', default=str(HERE), help='directory of HTML pages for the sitemap')
+    parser.add_argument('-r', '--recursive', action='store_true', help='scan subdirectories for pages')
+    parser.add_argument('--include', action='append', help="page glob, repeatable (default: '*.html')")
+    parser.add_argument('--exclude', action='append', default=[], help='glob to skip, repeatable')
+    parser.add_argument('--sitemap-workers', type=int, help='processes for extracting changed pages')
+    add_layout_arguments(parser)
+    add_output_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    instrumentation = start_instrumentation(args, 'ripple-pipeline')
+
+    client = None
+    if set(args.artifacts) - {'sitemap'}:
+        github = stage_module('generate-github-index')
+        cache = None if args.no_cache else github.ResponseCache(args.cache_dir)
+        client = github.GitHubClient(api_base=args.api_base or github.GITHUB_API, cache=cache)
+    theme_table = stage_module('analyze-themes').load_themes(args.themes) if args.themes else None
+
+    print(f"🌀 Pipeline: {', '.join(a for a in ARTIFACTS if a in args.artifacts)}")
+    documents, written = run_pipeline(
+        args.accounts, args.artifacts, args.output_dir, args.schema, client,
+        fetch_options={'concurrent': args.concurrent, 'max_workers': args.workers},
+        theme_options={'themes': theme_table, 'word_boundary': args.word_boundary, 'mode': args.mode,
+                       'n_clusters': args.clusters, 'state_file': args.incremental},
+        search_options={'prefix_length': args.prefixes, 'trigrams': args.trigrams},
+        sitemap_options={'root': args.root, 'workers': args.sitemap_workers,
+                         'include': args.include or ('*.html',), 'exclude': args.exclude,
+                         'recursive': args.recursive},
+        layout=args.layout, **output_options(args)
+    )
+    if client:
+        client.close()
+
+    if 'index' in documents:
+        summary = documents['index']['summary']
+        print(f"\n📊 {summary['total_repos']} repos, {summary['total_stars']} stars, "
+              f"{len(documents['index']['rings'])} activity rings")
+    if 'themes' in documents:
+        print(f"🎨 Themes identified: {documents['themes']['theme_summary']['total_themes']}")
+    if written:
+        print_artifact_report(written)
+    instrumentation.finish()
@@ -0,0 +1,118 @@
+"""
+Compact repo record shared by the index generators
+
+A GitHub API repo is a dict of ~80 keys; the pipeline uses 15 of them.
+RepoRecord keeps just those in __slots__, interns the strings that repeat
+across repos (language, topics), and is the one place the field lists and
+the API-to-record mapping live.
+"""
+
+import sys
+
+# Fields of a repo record, in serialization order (schema 2 tables, rings)
+FIELDS = (
+    'name', 'full_name', 'description', 'language', 'stars', 'forks', 'size_kb',
+    'updated_at', 'created_at', 'html_url', 'homepage', 'has_pages', 'is_fork',
+    'archived', 'topics'
+)
+
+# The subset written to a schema 1 index's all_repos
+ALL_REPOS_FIELDS = tuple(f for f in FIELDS if f not in ('is_fork', 'archived'))
+
+_intern = sys.intern
+
+def _intern_optional(value):
+    return _intern(value) if value is not None else None
+
+class RepoRecord:
+    """The repo fields the pipeline uses, nothing more
+
+    Supports read-only mapping access (record['stars'], record.get('topics'))
+    so code written against record dicts works unchanged. Topics are held
+    as a tuple of interned strings.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, name, full_name, description=None, language=None, stars=0, forks=0,
+                 size_kb=0, updated_at=None, created_at=None, html_url=None, homepage=None,
+                 has_pages=False, is_fork=False, archived=False, topics=()):
+        self.name = name
+        self.full_name = full_name
+        self.description = description
+        self.language = _intern_optional(language)
+        self.stars = stars
+        self.forks = forks
+        self.size_kb = size_kb
+        self.updated_at = updated_at
+        self.created_at = created_at
+        self.html_url = html_url
+        self.homepage = homepage
+        self.has_pages = has_pages
+        self.is_fork = is_fork
+        self.archived = archived
+        self.topics = tuple(_intern(t) for t in topics or ())
+
+    @classmethod
+    def from_api(cls, repo):
+        """Record from a GitHub API repo dict"""
+        return cls(
+            name=repo['name'],
+            full_name=repo['full_name'],
+            description=repo['description'],
+            language=repo.get('language'),
+            stars=repo['stargazers_count'],
+            forks=repo['forks_count'],
+            size_kb=repo['size'],
+            updated_at=repo['updated_at'],
+            created_at=repo['created_at'],
+            html_url=repo['html_url'],
+            homepage=repo.get('homepage'),
+            has_pages=repo.get('has_pages', False),
+            is_fork=repo.get('fork', False),
+            archived=repo.get('archived', False),
+            topics=repo.get('topics', [])
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Record from a serialized record dict; missing fields take their defaults"""
+        return cls(**{field: data[field] for field in FIELDS if field in data})
+
+    def to_dict(self, fields=FIELDS):
+        """JSON-ready dict of the given fields (topics as a list)"""
+        return {
+            field: list(self.topics) if field == 'topics' else getattr(self, field)
+            for field in fields
+        }
+
+    def __getitem__(self, field):
+        if field not in FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def get(self, field, default=None):
+        return getattr(self, field, default) if field in FIELDS else default
+
+    def __contains__(self, field):
+        return field in FIELDS
+
+    def keys(self):
+        return FIELDS
+
+    def __repr__(self):
+        return f'RepoRecord({self.full_name!r})'
+
+def records_table(records, fields=FIELDS):
+    """Columnar {field: [value per record]} table (schema 2 'repos')"""
+    return {
+        field: [list(r.topics) for r in records] if field == 'topics'
+        else [getattr(r, field) for r in records]
+        for field in fields
+    }
+
+def records_from_table(table):
+    """Records from a columnar table, plus the table's field list"""
+    fields = list(table)
+    count = len(table[fields[0]]) if fields else 0
+    return [RepoRecord.from_dict({f: table[f][i] for f in fields}) for i in range(count)], fields
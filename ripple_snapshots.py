@@ -0,0 +1,356 @@
+"""
+Snapshot history for the ripple index, stored as deltas
+
+SnapshotStore keeps each generated index as the difference from the one
+before it: repos added (full records), repos removed (names) and, for
+repos that changed, only the fields that changed. Each repo's activity
+ring is kept as a 'ring' field, so ring migration over time can be
+replayed from the deltas alone. Every checkpoint_every snapshots a full
+copy is stored instead, so rebuilding a snapshot never replays a long
+chain.
+
+After each snapshot, change feeds are published for the most recent
+snapshots: changes-since-<timestamp>.json is the one delta that brings a
+client's copy from <timestamp> up to the latest snapshot, and
+changes.json lists the feeds. A client older than every feed re-downloads
+the index.
+
+    python3 ripple_snapshots.py snapshots --list
+    python3 ripple_snapshots.py snapshots --history hartswf0/wh-ripple
+    python3 ripple_snapshots.py snapshots --show 20261018T080905 --output old-index.json
+"""
+
+import gzip
+import json
+from datetime import datetime
+from pathlib import Path
+
+from ripple_output import encode_json, write_artifact
+
+SNAPSHOT_VERSION = 1
+
+# Snapshot timestamps, as used in file names; a second snapshot within the
+# same second is numbered after it (20261018T080905-1, -2, ...)
+TIMESTAMP_FORMAT = '%Y%m%dT%H%M%S'
+
+def snapshot_timestamp(index):
+    """The compact timestamp of an index's meta.generated (now if it has none)"""
+    generated = index.get('meta', {}).get('generated')
+    moment = datetime.fromisoformat(generated) if generated else datetime.now()
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+def timestamp_key(timestamp):
+    """(second, counter) so that numbered same-second timestamps sort in order"""
+    second, _, counter = timestamp.partition('-')
+    return second, int(counter or 0)
+
+def _ring_name(ring):
+    return ring.get('ring_name') or ring.get('theme_name') or str(ring['ring_id'])
+
+def index_state(index, rings_key='rings'):
+    """{full_name: record} for every repo in an index's rings, either schema
+
+    Each record is the repo's fields plus 'ring', the ring_id it sits in.
+    """
+    state = {}
+    table = index.get('repos') if isinstance(index.get('repos'), dict) else None
+    for ring in index[rings_key]:
+        if 'repo_ids' in ring:
+            records = ({field: column[i] for field, column in table.items()} for i in ring['repo_ids'])
+        else:
+            records = (dict(repo) for repo in ring['repos'])
+        for record in records:
+            record['ring'] = ring['ring_id']
+            state[record['full_name']] = record
+    return state
+
+def diff_states(old, new):
+    """The delta from one state to another: added records, removed names, changed fields"""
+    changed = {}
+    for name, record in new.items():
+        before = old.get(name)
+        if before is None or before == record:
+            continue
+        changed[name] = {field: record.get(field) for field in record.keys() | before.keys()
+                         if record.get(field) != before.get(field)}
+    return {
+        'added': {name: record for name, record in new.items() if name not in old},
+        'removed': [name for name in old if name not in new],
+        'changed': changed
+    }
+
+def apply_delta(state, delta):
+    """Patch a state in place with a delta (as written to snapshots and feeds); returns it"""
+    for name in delta['removed']:
+        state.pop(name, None)
+    for name, fields in delta['changed'].items():
+        state[name] = dict(state[name], **fields)
+    state.update(delta['added'])
+    return state
+
+def _is_empty(delta):
+    return not (delta['added'] or delta['removed'] or delta['changed'])
+
+def _read_json_gz(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+def _write_json_gz(path, data):
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_bytes(gzip.compress(encode_json(data), compresslevel=9, mtime=0))
+    tmp_path.replace(path)
+
+class SnapshotStore:
+    """A directory of index snapshots: one full copy per checkpoint, deltas in between
+
+    manifest.json lists the snapshots in order with their file, kind
+    ('full' or 'delta'), change counts and ring names; the snapshot files
+    themselves are gzipped JSON.
+    """
+
+    def __init__(self, directory, checkpoint_every=20):
+        self.directory = Path(directory)
+        self.checkpoint_every = checkpoint_every
+        self.manifest_file = self.directory / 'manifest.json'
+        if self.manifest_file.exists():
+            self.manifest = json.loads(self.manifest_file.read_text(encoding='utf-8'))
+        else:
+            self.manifest = {'version': SNAPSHOT_VERSION, 'snapshots': []}
+
+    @property
+    def snapshots(self):
+        return self.manifest['snapshots']
+
+    def timestamps(self):
+        return [entry['timestamp'] for entry in self.snapshots]
+
+    def _position(self, timestamp):
+        for position, entry in enumerate(self.snapshots):
+            if entry['timestamp'] == timestamp:
+                return position
+        raise KeyError(f"No snapshot {timestamp} in {self.directory}")
+
+    def _load(self, entry):
+        return _read_json_gz(self.directory / entry['file'])
+
+    def _replay(self, start=0, until=None):
+        """Yield (position, state) for each snapshot from `start` to `until`
+
+        Replay begins at the last checkpoint at or before `start`; the
+        state is patched in place between yields.
+        """
+        until = len(self.snapshots) - 1 if until is None else until
+        checkpoint = max(i for i in range(min(start, until) + 1) if self.snapshots[i]['kind'] == 'full')
+        state = None
+        for position in range(checkpoint, until + 1):
+            entry = self.snapshots[position]
+            data = self._load(entry)
+            state = data['repos'] if entry['kind'] == 'full' else apply_delta(state, data)
+            if position >= start:
+                yield position, state
+
+    def state(self, timestamp=None):
+        """The {full_name: record} state at a snapshot (the latest by default)"""
+        if not self.snapshots:
+            return {}
+        position = len(self.snapshots) - 1 if timestamp is None else self._position(timestamp)
+        for position, state in self._replay(position, position):
+            return state
+
+    def add(self, index, rings_key='rings', timestamp=None):
+        """Record an index as the next snapshot
+
+        Returns the manifest entry, or None when no repo changed since the
+        latest snapshot (nothing is stored then). A run in the same second
+        as the latest snapshot (watch mode, a script loop) is numbered after
+        it; a timestamp from an earlier second is an error.
+        """
+        timestamp = timestamp or snapshot_timestamp(index)
+        if self.snapshots:
+            latest = self.snapshots[-1]['timestamp']
+            if timestamp_key(timestamp) <= timestamp_key(latest):
+                second, counter = timestamp_key(latest)
+                if timestamp_key(timestamp)[0] != second:
+                    raise ValueError(f"Snapshot {timestamp} is older than {latest}")
+                timestamp = f'{second}-{counter + 1}'
+        state = index_state(index, rings_key)
+        previous = self.state()
+        delta = diff_states(previous, state)
+        if self.snapshots and _is_empty(delta):
+            return None
+
+        since_full = 0
+        for entry in reversed(self.snapshots):
+            if entry['kind'] == 'full':
+                break
+            since_full += 1
+        full = not self.snapshots or since_full + 1 >= self.checkpoint_every
+        entry = {
+            'timestamp': timestamp,
+            'kind': 'full' if full else 'delta',
+            'file': f"{'full' if full else 'delta'}-{timestamp}.json.gz",
+            'repo_count': len(state),
+            'added': len(delta['added']),
+            'removed': len(delta['removed']),
+            'changed': len(delta['changed']),
+            'rings': {str(ring['ring_id']): _ring_name(ring) for ring in index[rings_key]}
+        }
+        if not self.snapshots:
+            data = {'timestamp': timestamp, 'repos': state}
+        else:
+            data = dict(delta, timestamp=timestamp, previous=self.snapshots[-1]['timestamp'])
+            if full:
+                # Checkpoints keep their delta too, so history can be read from deltas alone
+                data['repos'] = state
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _write_json_gz(self.directory / entry['file'], data)
+        # The manifest goes last, so an interrupted run leaves the store as it was
+        self.snapshots.append(entry)
+        self._write_manifest()
+        return entry
+
+    def _write_manifest(self):
+        tmp_path = self.manifest_file.with_name(self.manifest_file.name + '.tmp')
+        tmp_path.write_text(json.dumps(self.manifest, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+        tmp_path.replace(self.manifest_file)
+
+    def publish_feeds(self, feed_dir=None, count=10, **output_options):
+        """Write changes-since-<timestamp>.json for the `count` snapshots before the latest
+
+        Each feed patches a copy of that snapshot up to the latest one
+        (apply_delta). changes.json lists the feeds; feeds that fell out of
+        the window are removed. Returns {path: bytes written}.
+        """
+        feed_dir = Path(feed_dir) if feed_dir else self.directory
+        feed_dir.mkdir(parents=True, exist_ok=True)
+        written = {}
+        feeds = {}
+        if self.snapshots:
+            latest = self.snapshots[-1]['timestamp']
+            current = self.state()
+            last = len(self.snapshots) - 2
+            # One replay covers the window: each snapshot is diffed against the latest as it goes by
+            window = self._replay(max(last - count + 1, 0), last) if last >= 0 and count > 0 else ()
+            for position, state in window:
+                since = self.snapshots[position]['timestamp']
+                name = f'changes-since-{since}.json'
+                feed = dict(diff_states(state, current), since=since, until=latest)
+                written.update(write_artifact(feed, feed_dir / name, **output_options))
+                feeds[since] = name
+            written.update(write_artifact({
+                'version': SNAPSHOT_VERSION,
+                'latest': latest,
+                'repo_count': len(current),
+                'feeds': feeds
+            }, feed_dir / 'changes.json', **output_options))
+
+        kept = {f'changes-since-{since}' for since in feeds}
+        for path in feed_dir.glob('changes-since-*'):
+            if path.name.split('.')[0] not in kept:
+                path.unlink()
+        return written
+
+    def ring_history(self, full_name=None):
+        """{full_name: [(timestamp, ring_id), ...]}: each repo's ring when first seen and after every move
+
+        A removed repo gets a (timestamp, None) entry.
+        """
+        history = {}
+
+        def note(name, timestamp, ring):
+            if full_name is None or name == full_name:
+                moves = history.setdefault(name, [])
+                if not moves or moves[-1][1] != ring:
+                    moves.append((timestamp, ring))
+
+        for position, entry in enumerate(self.snapshots):
+            data = self._load(entry)
+            timestamp = entry['timestamp']
+            if position == 0:
+                for name, record in data['repos'].items():
+                    note(name, timestamp, record.get('ring'))
+                continue
+            for name in data['removed']:
+                note(name, timestamp, None)
+            for name, record in data['added'].items():
+                note(name, timestamp, record.get('ring'))
+            for name, fields in data['changed'].items():
+                if 'ring' in fields:
+                    note(name, timestamp, fields['ring'])
+        return history
+
+    def ring_migrations(self):
+        """[(timestamp, {(from_ring, to_ring): repos})] for every snapshot in which repos moved ring
+
+        Ring ids are resolved to the names recorded with each snapshot.
+        """
+        names = {entry['timestamp']: entry['rings'] for entry in self.snapshots}
+        per_snapshot = {}
+        for moves in self.ring_history().values():
+            for (_, before), (timestamp, after) in zip(moves, moves[1:]):
+                if before is None or after is None:
+                    continue
+                counts = per_snapshot.setdefault(timestamp, {})
+                ring_names = names[timestamp]
+                key = (ring_names.get(str(before), str(before)), ring_names.get(str(after), str(after)))
+                counts[key] = counts.get(key, 0) + 1
+        return sorted(per_snapshot.items())
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inspect the ripple index snapshot history')
+    parser.add_argument('directory', help='snapshot directory (as passed to --snapshots)')
+    parser.add_argument('--list', action='store_true', help='list the snapshots and their change counts')
+    parser.add_argument('--history', nargs='?', const='', metavar='REPO',
+                        help="activity-ring moves of one repo (owner/name), or of every repo that moved")
+    parser.add_argument('--migrations', action='store_true', help='ring-to-ring moves per snapshot')
+    parser.add_argument('--show', metavar='TIMESTAMP', help='rebuild the repo records of a snapshot')
+    parser.add_argument('--output', help='write --show as JSON here instead of printing a summary')
+    parser.add_argument('--publish', metavar='FEED_DIR', nargs='?', const='',
+                        help='rewrite the change feeds (into the snapshot directory by default)')
+    parser.add_argument('--feeds', type=int, default=10, help='snapshots to publish change feeds for')
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.directory)
+    if not store.snapshots:
+        raise SystemExit(f"❌ No snapshots in {args.directory}")
+
+    if args.list or not (args.history is not None or args.migrations or args.show or args.publish is not None):
+        print(f"🕰️  {args.directory}: {len(store.snapshots)} snapshots")
+        for entry in store.snapshots:
+            print(f"   {entry['timestamp']} {entry['kind']:5} {entry['repo_count']} repos "
+                  f"+{entry['added']} -{entry['removed']} ~{entry['changed']}")
+
+    if args.history is not None:
+        names = {entry['timestamp']: entry['rings'] for entry in store.snapshots}
+        history = store.ring_history(args.history or None)
+        if args.history and not history:
+            raise SystemExit(f"❌ {args.history} is not in any snapshot")
+        print(f"\n🔄 Ring history:")
+        for full_name, moves in sorted(history.items()):
+            if args.history or len(moves) > 1:
+                steps = ' → '.join(f"{names[t].get(str(ring), ring) if ring is not None else 'removed'} ({t})"
+                                   for t, ring in moves)
+                print(f"   {full_name}: {steps}")
+
+    if args.migrations:
+        print(f"\n📊 Ring migrations:")
+        for timestamp, counts in store.ring_migrations():
+            print(f"   {timestamp}:")
+            for (before, after), count in sorted(counts.items(), key=lambda x: x[1], reverse=True):
+                print(f"      {before} → {after}: {count} repos")
+
+    if args.show:
+        state = store.state(args.show)
+        if args.output:
+            write_artifact({'timestamp': args.show, 'repos': list(state.values())}, args.output, compression=())
+            print(f"✅ Snapshot {args.show} ({len(state)} repos) written: {args.output}")
+        else:
+            print(f"\n📦 Snapshot {args.show}: {len(state)} repos")
+            for full_name, record in state.items():
+                print(f"   {full_name} (ring {record.get('ring')})")
+
+    if args.publish is not None:
+        written = store.publish_feeds(args.publish or None, args.feeds)
+        print(f"📡 Change feeds written: {len(written)} files")
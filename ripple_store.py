@@ -0,0 +1,346 @@
+"""
+Optional SQLite store shared by the pipeline stages
+
+Holds repos (with their theme and keywords), themes and page metadata in
+one file, indexed on language, updated_at, theme and stars. Which accounts
+list a repo, and where, is kept apart from the repo itself, so an org and
+a member that share a repo both keep it in their own order. Stages upsert
+only what they produced, and later stages or ad-hoc queries read it back
+without re-parsing the JSON artifacts; the scripts still export the usual
+JSON files from it.
+
+    python3 ripple_store.py ripple.db --stats
+    python3 ripple_store.py ripple.db --query "SELECT language, COUNT(*) FROM repos GROUP BY 1"
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+
+from ripple_records import FIELDS
+
+# Columns of a repo record (ripple_records.RepoRecord)
+REPO_COLUMNS = FIELDS
+_BOOLEAN_COLUMNS = ('has_pages', 'is_fork', 'archived')
+
+PAGE_COLUMNS = (
+    'path', 'filename', 'url', 'size_bytes', 'size_kb', 'modified', 'title',
+    'description', 'features', 'stats', 'external_scripts', 'external_stylesheets'
+)
+_JSON_PAGE_COLUMNS = ('features', 'stats', 'external_scripts', 'external_stylesheets')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS repos (
+    full_name TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    language TEXT,
+    stars INTEGER NOT NULL DEFAULT 0,
+    forks INTEGER NOT NULL DEFAULT 0,
+    size_kb INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT,
+    created_at TEXT,
+    html_url TEXT,
+    homepage TEXT,
+    has_pages INTEGER NOT NULL DEFAULT 0,
+    is_fork INTEGER NOT NULL DEFAULT 0,
+    archived INTEGER NOT NULL DEFAULT 0,
+    topics TEXT NOT NULL DEFAULT '[]',
+    theme_id TEXT
+);
+CREATE INDEX IF NOT EXISTS repos_language ON repos (language);
+CREATE INDEX IF NOT EXISTS repos_updated_at ON repos (updated_at);
+CREATE INDEX IF NOT EXISTS repos_stars ON repos (stars);
+CREATE INDEX IF NOT EXISTS repos_theme ON repos (theme_id);
+CREATE TABLE IF NOT EXISTS account_repos (
+    account TEXT NOT NULL,
+    full_name TEXT NOT NULL REFERENCES repos (full_name) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (account, full_name)
+);
+CREATE INDEX IF NOT EXISTS account_repos_position ON account_repos (account, position);
+CREATE INDEX IF NOT EXISTS account_repos_full_name ON account_repos (full_name);
+CREATE TABLE IF NOT EXISTS themes (
+    theme_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    keywords TEXT NOT NULL DEFAULT '[]'
+);
+CREATE TABLE IF NOT EXISTS repo_keywords (
+    full_name TEXT NOT NULL REFERENCES repos (full_name) ON DELETE CASCADE,
+    keyword TEXT NOT NULL,
+    PRIMARY KEY (full_name, keyword)
+);
+CREATE INDEX IF NOT EXISTS repo_keywords_keyword ON repo_keywords (keyword);
+CREATE TABLE IF NOT EXISTS pages (
+    path TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    url TEXT,
+    size_bytes INTEGER,
+    size_kb REAL,
+    modified TEXT,
+    title TEXT,
+    description TEXT,
+    features TEXT NOT NULL DEFAULT '[]',
+    stats TEXT NOT NULL DEFAULT '{}',
+    external_scripts TEXT NOT NULL DEFAULT '[]',
+    external_stylesheets TEXT NOT NULL DEFAULT '[]'
+);
+'''
+
+def _upsert_sql(table, columns, key):
+    updates = ', '.join(f'{c} = excluded.{c}' for c in columns if c != key)
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT ({key}) DO UPDATE SET {updates}")
+
+class RippleStore:
+    """SQLite store for repos, themes, keywords and pages
+
+    Writes are grouped in one transaction per call; use as a context
+    manager (or call close()) to release the database.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.executescript(SCHEMA)
+        self._migrate_accounts()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def _migrate_accounts(self):
+        # Stores written before account_repos kept one account per repo on the repos row
+        columns = {row['name'] for row in self.db.execute('PRAGMA table_info(repos)')}
+        if 'account' not in columns or self.db.execute('SELECT 1 FROM account_repos LIMIT 1').fetchone():
+            return
+        with self.db:
+            self.db.execute('INSERT OR IGNORE INTO account_repos (account, full_name, position) '
+                            'SELECT account, full_name, position FROM repos WHERE account IS NOT NULL')
+
+    # Meta: small JSON documents such as an index's meta and summary blocks
+
+    def set_meta(self, key, value):
+        with self.db:
+            self.db.execute('INSERT INTO meta (key, value) VALUES (?, ?) '
+                            'ON CONFLICT (key) DO UPDATE SET value = excluded.value',
+                            (key, json.dumps(value, ensure_ascii=False)))
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row['value']) if row else default
+
+    # Repos
+
+    def upsert_repos(self, records, account=None):
+        """Insert or update repo records, and record their order within the account
+
+        Theme assignments and keywords of existing repos are left alone, as
+        is their membership in other accounts.
+        """
+        records = list(records)
+        rows = (
+            tuple(
+                json.dumps(r.get('topics') or [], ensure_ascii=False) if column == 'topics'
+                else int(bool(r.get(column))) if column in _BOOLEAN_COLUMNS
+                else r.get(column)
+                for column in REPO_COLUMNS
+            )
+            for r in records
+        )
+        with self.db:
+            cursor = self.db.executemany(_upsert_sql('repos', REPO_COLUMNS, 'full_name'), rows)
+            if account is not None:
+                self.db.executemany(
+                    'INSERT INTO account_repos (account, full_name, position) VALUES (?, ?, ?) '
+                    'ON CONFLICT (account, full_name) DO UPDATE SET position = excluded.position',
+                    ((account, r.get('full_name'), position) for position, r in enumerate(records))
+                )
+        return cursor.rowcount
+
+    def remove_repos_not_in(self, account, full_names):
+        """Drop an account's repos that it no longer lists (deleted or renamed)
+
+        A repo another account still lists stays in the store.
+        """
+        with self.db:
+            self.db.execute('CREATE TEMP TABLE IF NOT EXISTS keep (full_name TEXT PRIMARY KEY)')
+            self.db.execute('DELETE FROM keep')
+            self.db.executemany('INSERT OR IGNORE INTO keep VALUES (?)', ((n,) for n in full_names))
+            dropped = [row[0] for row in self.db.execute(
+                'SELECT full_name FROM account_repos WHERE account = ? AND full_name NOT IN keep', (account,))]
+            self.db.execute('DELETE FROM account_repos WHERE account = ? AND full_name NOT IN keep', (account,))
+            cursor = self.db.executemany(
+                'DELETE FROM repos WHERE full_name = ? '
+                'AND NOT EXISTS (SELECT 1 FROM account_repos a WHERE a.full_name = repos.full_name)',
+                ((name,) for name in dropped)
+            )
+        return cursor.rowcount
+
+    def repos(self, where='', params=(), account=None, accounts=None):
+        """Repo records (REPO_COLUMNS order) in fetch order, optionally filtered
+
+        `where` is an SQL condition on the repos table, e.g.
+        store.repos('language = ? AND stars >= ?', ('Python', 5)). With
+        `account`, only that account's repos in its order; with `accounts`,
+        their repos merged in account order, each repo once (as
+        generate-github-index.py --merge does).
+        """
+        if accounts is not None:
+            seen = set()
+            merged = []
+            for name in accounts:
+                for record in self.repos(where, params, account=name):
+                    if record['full_name'] not in seen:
+                        seen.add(record['full_name'])
+                        merged.append(record)
+            return merged
+
+        columns = ', '.join(f'r.{c}' for c in REPO_COLUMNS)
+        if account is not None:
+            sql = f"SELECT {columns} FROM repos r JOIN account_repos a USING (full_name) WHERE a.account = ?"
+            params = (account,) + tuple(params)
+        else:
+            sql = f"SELECT {columns} FROM repos r WHERE 1"
+        if where:
+            sql += f' AND ({where})'
+        if account is not None:
+            sql += ' ORDER BY a.position'
+        else:
+            # Each repo placed by the first account (by name) that lists it
+            first = 'FROM account_repos a WHERE a.full_name = r.full_name ORDER BY a.account LIMIT 1'
+            sql += f' ORDER BY (SELECT a.account {first}), (SELECT a.position {first})'
+        return [self._repo_record(row) for row in self.db.execute(sql, params)]
+
+    @staticmethod
+    def _repo_record(row):
+        record = dict(row)
+        record['topics'] = json.loads(record['topics'])
+        for column in _BOOLEAN_COLUMNS:
+            record[column] = bool(record[column])
+        return record
+
+    def accounts(self):
+        return [row[0] for row in self.db.execute('SELECT DISTINCT account FROM account_repos ORDER BY account')]
+
+    # Themes and keywords
+
+    def set_themes(self, themes, assignments, keyword_sets=None):
+        """Replace the theme table and per-repo assignments after an analysis run
+
+        themes: {theme_id: {'name', 'keywords'}}; assignments: {full_name: theme_id};
+        keyword_sets: {full_name: keywords} for the repos whose keywords changed.
+        """
+        with self.db:
+            self.db.execute('DELETE FROM themes')
+            self.db.executemany(
+                'INSERT INTO themes (theme_id, name, keywords) VALUES (?, ?, ?)',
+                ((theme_id, t['name'], json.dumps(list(t['keywords']), ensure_ascii=False))
+                 for theme_id, t in themes.items())
+            )
+            self.db.executemany('UPDATE repos SET theme_id = ? WHERE full_name = ?',
+                                ((theme_id, full_name) for full_name, theme_id in assignments.items()))
+            for full_name, keywords in (keyword_sets or {}).items():
+                self.db.execute('DELETE FROM repo_keywords WHERE full_name = ?', (full_name,))
+                self.db.executemany('INSERT OR IGNORE INTO repo_keywords VALUES (?, ?)',
+                                    ((full_name, k) for k in keywords))
+
+    def themes(self):
+        return {
+            row['theme_id']: {'name': row['name'], 'keywords': json.loads(row['keywords'])}
+            for row in self.db.execute('SELECT theme_id, name, keywords FROM themes')
+        }
+
+    def repo_keywords(self, full_name):
+        return {row[0] for row in self.db.execute('SELECT keyword FROM repo_keywords WHERE full_name = ?',
+                                                   (full_name,))}
+
+    # Pages
+
+    def upsert_pages(self, pages):
+        """Insert or update sitemap page records"""
+        sql = _upsert_sql('pages', PAGE_COLUMNS, 'path')
+        rows = (
+            tuple(json.dumps(p.get(c), ensure_ascii=False) if c in _JSON_PAGE_COLUMNS else p.get(c)
+                  for c in PAGE_COLUMNS)
+            for p in pages
+        )
+        with self.db:
+            cursor = self.db.executemany(sql, rows)
+        return cursor.rowcount
+
+    def remove_pages_not_in(self, paths):
+        paths = set(paths)
+        stale = [row[0] for row in self.db.execute('SELECT path FROM pages') if row[0] not in paths]
+        with self.db:
+            self.db.executemany('DELETE FROM pages WHERE path = ?', ((p,) for p in stale))
+        return len(stale)
+
+    def pages(self, where='', params=()):
+        sql = f"SELECT {', '.join(PAGE_COLUMNS)} FROM pages"
+        if where:
+            sql += f' WHERE {where}'
+        pages = []
+        for row in self.db.execute(sql + ' ORDER BY path', params):
+            page = dict(row)
+            for column in _JSON_PAGE_COLUMNS:
+                page[column] = json.loads(page[column])
+            pages.append(page)
+        return pages
+
+    # Analytical queries
+
+    def query(self, sql, params=()):
+        return [tuple(row) for row in self.db.execute(sql, params)]
+
+    def stats(self):
+        """Headline numbers straight from the indexes, without loading any records"""
+        one = lambda sql: self.db.execute(sql).fetchone()[0]
+        return {
+            'repos': one('SELECT COUNT(*) FROM repos'),
+            'stars': one('SELECT COALESCE(SUM(stars), 0) FROM repos'),
+            'languages': dict(self.query(
+                "SELECT COALESCE(language, 'Other'), COUNT(*) FROM repos GROUP BY 1 ORDER BY 2 DESC")),
+            'themes': dict(self.query(
+                'SELECT COALESCE(t.name, r.theme_id), COUNT(*) FROM repos r '
+                'LEFT JOIN themes t USING (theme_id) WHERE r.theme_id IS NOT NULL GROUP BY 1 ORDER BY 2 DESC')),
+            'most_recent': one('SELECT MAX(updated_at) FROM repos'),
+            'pages': one('SELECT COUNT(*) FROM pages')
+        }
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inspect the ripple SQLite store')
+    parser.add_argument('db', help='store file (as passed to --store)')
+    parser.add_argument('--stats', action='store_true', help='print repo, theme and page counts')
+    parser.add_argument('--query', help='run an SQL query and print the rows')
+    args = parser.parse_args()
+
+    with RippleStore(args.db) as store:
+        if args.query:
+            for row in store.query(args.query):
+                print('\t'.join('' if v is None else str(v) for v in row))
+        if args.stats or not args.query:
+            stats = store.stats()
+            print(f"🗃️  {args.db}: {stats['repos']} repos, {stats['stars']} stars, {stats['pages']} pages")
+            print(f"   Most recent update: {stats['most_recent']}")
+            print(f"\n🎨 Languages:")
+            for language, count in stats['languages'].items():
+                print(f"   {language}: {count}")
+            if stats['themes']:
+                print(f"\n📊 Themes:")
+                for theme, count in stats['themes'].items():
+                    print(f"   {theme}: {count} repos")
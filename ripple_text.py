@@ -0,0 +1,40 @@
+"""
+Tokenizer shared by theme analysis and the search index
+
+Text is split at camelCase boundaries, lowercased and cut into runs of
+ASCII letters and digits. words() keeps every such token (what the search
+index matches on); tokenize() keeps only tokens that can say something
+about a repo's theme, dropping stop words, numbers and single characters.
+"""
+
+import re
+
+# Words too common to say anything about a repo's theme
+STOP_WORDS = frozenset('''
+a an and are as at be by for from has have in into is it its of on or that the this
+to was with your you my our using based simple new test demo app web page site html
+how what when where which who why each all any can not no more about through between
+like find make made meets via version just one two some other
+do does did so them they their there then than these those also but if only very
+get got use used uses out up over every others across outside here been were we
+us i me he she his her etc yet still too way ways thing things while bring brings
+project projects repo repository code file files build built building create creating created
+'''.split())
+
+CAMEL_BOUNDARY = re.compile(r'([a-z])([A-Z])')
+TOKEN = re.compile(r'[a-z0-9]+')
+
+def normalize(text):
+    """Lowercase text with camelCase words split apart ('ThreeJS' -> 'three js')"""
+    return CAMEL_BOUNDARY.sub(r'\1 \2', text or '').lower()
+
+def words(text):
+    """Every word token, e.g. 'ThreeJS-demo' -> three, js, demo"""
+    return TOKEN.findall(normalize(text))
+
+def is_term(token):
+    return len(token) > 1 and not token.isdigit() and token not in STOP_WORDS
+
+def tokenize(text):
+    """Word tokens without stop words, numbers and single characters"""
+    return [t for t in words(text) if is_term(t)]
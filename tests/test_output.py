@@ -0,0 +1,74 @@
+"""
+The shared output stage (ripple_output): sharded ring indexes and
+precompressed siblings
+"""
+
+import importlib
+import json
+
+import pytest
+
+import ripple_output
+from ripple_layout import add_layout, decode_array
+from ripple_output import write_shards
+from ripple_records import RepoRecord
+
+benchmark = importlib.import_module('benchmark-pipeline')
+github_index = importlib.import_module('generate-github-index')
+
+def build_index(count, schema):
+    repos = [RepoRecord.from_api(r) for r in benchmark.synthetic_repos(count, seed=5)]
+    return github_index.build_index(repos, 'bench', schema)
+
+def manifest_size(index, shard_dir):
+    write_shards(index, shard_dir, 'rings', detach=('all_repos',), compression=())
+    return (shard_dir / 'manifest.json').stat().st_size
+
+@pytest.mark.parametrize('schema', [1, 2])
+def test_layout_manifest_size_does_not_grow_with_repo_count(tmp_path, schema):
+    sizes = []
+    for count in (500, 5000):
+        index = add_layout(build_index(count, schema), 'rings')
+        sizes.append(manifest_size(index, tmp_path / str(count)))
+    # Only the digits of the counts may differ
+    assert sizes[1] - sizes[0] < 100
+
+@pytest.mark.parametrize('schema', [1, 2])
+def test_ring_shards_carry_their_own_layout(tmp_path, schema):
+    index = add_layout(build_index(800, schema), 'rings')
+    layout = index['layout']
+    write_shards(index, tmp_path, 'rings', compression=())
+
+    manifest = json.loads((tmp_path / 'manifest.json').read_text(encoding='utf-8'))
+    assert 'x' not in manifest['layout']
+    assert manifest['layout']['offsets'] == layout['offsets']
+
+    bounds = layout['offsets'] + [layout['count']]
+    for position, ring in enumerate(manifest['rings']):
+        shard = json.loads((tmp_path / ring['shard']).read_text(encoding='utf-8'))
+        assert shard['layout']['count'] == ring['repo_count']
+        for name in ('x', 'y', 'angle', 'radius', 'node_radius', 'track'):
+            whole = decode_array(layout[name])[bounds[position]:bounds[position + 1]]
+            assert decode_array(shard['layout'][name]).tolist() == whole.tolist()
+
+def test_missing_brotli_warns_once(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(ripple_output, 'brotli', None)
+    monkeypatch.setattr(ripple_output, '_warned_no_brotli', False)
+    written = write_shards(build_index(300, 1), tmp_path, 'rings', detach=('all_repos',))
+    assert written and not any(path.suffix == '.br' for path in written)
+    assert capsys.readouterr().out.count('brotli not installed') == 1
+
+def test_shards_the_new_manifest_drops_are_removed(tmp_path):
+    (tmp_path / 'notes.txt').write_text('not ours', encoding='utf-8')
+    write_shards(build_index(300, 1), tmp_path, 'rings', detach=('all_repos',), compression=('gz',))
+    assert (tmp_path / 'all-repos.json').exists() and (tmp_path / 'all-repos.json.gz').exists()
+
+    # A later run without the detached key and with fewer rings
+    index = build_index(300, 1)
+    index['rings'] = index['rings'][:2]
+    write_shards(index, tmp_path, 'rings', compression=('gz',))
+    manifest = json.loads((tmp_path / 'manifest.json').read_text(encoding='utf-8'))
+    listed = {ring['shard'] for ring in manifest['rings']} | {'manifest.json'}
+    assert {path.name for path in tmp_path.glob('*.json')} == listed
+    assert {path.name for path in tmp_path.glob('*.gz')} == {f'{name}.gz' for name in listed}
+    assert (tmp_path / 'notes.txt').exists()
@@ -0,0 +1,190 @@
+"""
+End-to-end checks of the fetch, theme and snapshot paths against the
+local GitHub API stand-in from benchmark-pipeline.py (no network)
+"""
+
+import copy
+import importlib
+import json
+import random
+import threading
+import urllib.error
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from ripple_records import RepoRecord
+from ripple_snapshots import SnapshotStore, apply_delta, index_state
+
+benchmark = importlib.import_module('benchmark-pipeline')
+github_index = importlib.import_module('generate-github-index')
+theme_analysis = importlib.import_module('analyze-themes')
+
+OWNER = 'bench'
+# Eleven listing pages at per_page=100, the last one partial
+CORPUS_SIZE = 1050
+PAGES = 11
+
+@pytest.fixture(scope='module')
+def corpus():
+    return benchmark.synthetic_repos(CORPUS_SIZE, seed=1, owner=OWNER)
+
+def fetch(api, concurrent=False, cache=None):
+    client = github_index.GitHubClient(api.url, cache=cache)
+    try:
+        repos = github_index.fetch_all_github_repos(OWNER, client, concurrent=concurrent, max_workers=4)
+    finally:
+        client.close()
+    return [repo.to_dict() for repo in repos]
+
+def test_concurrent_fetch_matches_sequential(corpus):
+    with benchmark.StandinAPI(corpus, OWNER) as api:
+        sequential = fetch(api)
+        concurrent = fetch(api, concurrent=True)
+    assert len(sequential) == CORPUS_SIZE
+    assert concurrent == sequential
+    assert [repo['full_name'] for repo in sequential] == [repo['full_name'] for repo in corpus]
+
+class ThrottledHandler(benchmark._StandinHandler):
+    """Answers the first request for each URL with a 429 and Retry-After"""
+
+    def do_GET(self):
+        with self.api.lock:
+            first = self.path not in self.api.throttled
+            self.api.throttled.add(self.path)
+        if first:
+            return self._send(429, b'{"message": "secondary rate limit"}', {'Retry-After': self.api.retry_after()})
+        super().do_GET()
+
+class ThrottledAPI(benchmark.StandinAPI):
+    handler = ThrottledHandler
+
+    def __init__(self, repos, owner=OWNER, retry_after=lambda: '7'):
+        super().__init__(repos, owner)
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.throttled = set()
+
+@pytest.mark.parametrize('concurrent', [False, True])
+def test_429_waits_for_retry_after(corpus, monkeypatch, concurrent):
+    delays = []
+    monkeypatch.setattr(github_index.time, 'sleep', delays.append)
+    with ThrottledAPI(corpus) as api:
+        repos = fetch(api, concurrent=concurrent)
+    assert [repo['full_name'] for repo in repos] == [repo['full_name'] for repo in corpus]
+    assert len(api.throttled) == PAGES
+    assert delays == [7.0] * PAGES
+
+def test_429_waits_for_an_http_date_retry_after(corpus, monkeypatch):
+    delays = []
+    monkeypatch.setattr(github_index.time, 'sleep', delays.append)
+    in_a_minute = lambda: format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+    with ThrottledAPI(corpus, retry_after=in_a_minute) as api:
+        repos = fetch(api)
+    assert len(repos) == CORPUS_SIZE
+    assert len(delays) == PAGES
+    assert all(55 <= delay <= 60 for delay in delays)
+
+def backoff(retry_after, code=429, attempt=0):
+    error = urllib.error.HTTPError('https://api.github.com/x', code, '', {'Retry-After': retry_after}, None)
+    return github_index.RateLimiter().backoff_delay(error, attempt)
+
+def test_retry_after_forms():
+    assert backoff('120') == 120.0
+    assert backoff('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert 20 < backoff(format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)) <= 30
+    # Unparseable values fall back to the exponential delay, also on a 403
+    assert backoff('soon', attempt=3) == 8
+    assert backoff('-5', code=403, attempt=1) == 2
+
+def test_unchanged_pages_revalidate_with_304(corpus, tmp_path):
+    cache = github_index.ResponseCache(tmp_path / 'cache')
+    with benchmark.StandinAPI(corpus, OWNER) as api:
+        first = fetch(api, cache=cache)
+        assert (cache.downloaded, cache.revalidated) == (PAGES, 0)
+        second = fetch(api, concurrent=True, cache=cache)
+    assert (cache.downloaded, cache.revalidated) == (PAGES, PAGES)
+    assert second == first
+
+NOW = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def evolve(repos, step):
+    """The corpus one refresh later: a few repos gone, some edited or pushed to, a few new"""
+    rng = random.Random(step)
+    evolved = []
+    for repo in repos:
+        roll = rng.random()
+        if roll < 0.05:
+            continue
+        if roll < 0.15:
+            repo = dict(repo, description=f"{repo['description'] or ''} audio synth music")
+        elif roll < 0.25:
+            repo = dict(repo, updated_at=NOW, pushed_at=NOW, stargazers_count=repo['stargazers_count'] + 1)
+        evolved.append(repo)
+    return evolved + benchmark.synthetic_repos(10, seed=1000 + step, owner=OWNER)
+
+def build_index(repos, schema):
+    return github_index.build_index([RepoRecord.from_api(r) for r in repos], OWNER, schema)
+
+def thematic_index(index, schema, state_file=None):
+    repos, fields = theme_analysis.load_repos(index)
+    return theme_analysis.build_thematic_index(index, repos, fields, schema, state_file=state_file)
+
+@pytest.mark.parametrize('schema', [1, 2])
+def test_incremental_themes_match_full_analysis(tmp_path, schema):
+    state_file = tmp_path / 'theme-state.json'
+    repos = benchmark.synthetic_repos(400, seed=2, owner=OWNER)
+    for step in range(3):
+        index = build_index(repos, schema)
+        # Cold state on the first pass, then patched from the previous pass
+        assert thematic_index(index, schema, state_file) == thematic_index(index, schema)
+        repos = evolve(repos, step)
+
+@pytest.mark.parametrize('schema', [1, 2])
+def test_snapshots_rebuild_every_run_and_feeds_patch_to_latest(tmp_path, schema):
+    store = SnapshotStore(tmp_path / 'snapshots', checkpoint_every=3)
+    repos = benchmark.synthetic_repos(300, seed=3, owner=OWNER)
+    indexes = {}
+    for step in range(7):
+        timestamp = f'20260101T{step:02d}0000'
+        indexes[timestamp] = index = build_index(repos, schema)
+        assert store.add(index, timestamp=timestamp) is not None
+        repos = evolve(repos, step)
+    latest = timestamp
+    assert store.add(index, timestamp='20260102T000000') is None
+    assert [entry['kind'] for entry in store.snapshots] == ['full', 'delta', 'delta'] * 2 + ['full']
+
+    # A reopened store rebuilds every snapshot from its checkpoint and deltas
+    store = SnapshotStore(tmp_path / 'snapshots')
+    for timestamp, index in indexes.items():
+        assert store.state(timestamp) == index_state(index)
+
+    feed_dir = tmp_path / 'feeds'
+    store.publish_feeds(feed_dir, count=4, compression=())
+    listing = json.loads((feed_dir / 'changes.json').read_text(encoding='utf-8'))
+    assert listing['latest'] == latest
+    assert sorted(listing['feeds']) == sorted(indexes)[-5:-1]
+    for since, name in listing['feeds'].items():
+        feed = json.loads((feed_dir / name).read_text(encoding='utf-8'))
+        client_copy = copy.deepcopy(index_state(indexes[since]))
+        assert apply_delta(client_copy, feed) == index_state(indexes[latest])
+
+    # Feeds that fall out of the window are removed
+    store.publish_feeds(feed_dir, count=2, compression=())
+    assert sorted(path.name for path in feed_dir.glob('changes-since-*')) == \
+        [f'changes-since-{since}.json' for since in sorted(indexes)[-3:-1]]
+
+def test_snapshots_in_the_same_second_are_numbered(tmp_path):
+    store = SnapshotStore(tmp_path / 'snapshots')
+    repos = benchmark.synthetic_repos(100, seed=6, owner=OWNER)
+    indexes = []
+    for step in range(3):
+        indexes.append(build_index(repos, 1))
+        repos = evolve(repos, step)
+        store.add(indexes[-1], timestamp='20260101T120000')
+    assert store.timestamps() == ['20260101T120000', '20260101T120000-1', '20260101T120000-2']
+    for timestamp, index in zip(store.timestamps(), indexes):
+        assert store.state(timestamp) == index_state(index)
+    with pytest.raises(ValueError):
+        store.add(build_index(repos, 1), timestamp='20260101T115959')
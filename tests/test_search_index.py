@@ -0,0 +1,66 @@
+"""
+The prebuilt client-side search index (build-search-index.py)
+"""
+
+import importlib
+import random
+
+import pytest
+
+from ripple_records import RepoRecord
+from ripple_text import words
+
+benchmark = importlib.import_module('benchmark-pipeline')
+github_index = importlib.import_module('generate-github-index')
+theme_analysis = importlib.import_module('analyze-themes')
+search_index = importlib.import_module('build-search-index')
+
+def thematic_index(schema, count=400):
+    repos = [RepoRecord.from_api(r) for r in benchmark.synthetic_repos(count, seed=7)]
+    index = github_index.build_index(repos, 'bench', schema)
+    records, fields = theme_analysis.load_repos(index)
+    return theme_analysis.build_thematic_index(index, records, fields, schema)
+
+@pytest.fixture(scope='module', params=[1, 2])
+def document(request):
+    data = thematic_index(request.param)
+    themed = search_index.load_themed_repos(data)
+    index = search_index.search_index_document(data, 'test', prefix_length=3, trigrams=True)
+    return themed, index
+
+def test_both_schemas_give_the_same_index():
+    first, second = (search_index.search_index_document(thematic_index(schema), 'test') for schema in (1, 2))
+    # Repo ids differ between the schemas; compare what each term points at
+    def named(index):
+        return {term: sorted(index['repos'][i] for i in search_index.delta_decode(postings))
+                for term, postings in zip(index['terms'], index['postings'])}
+    assert named(first) == named(second)
+
+def test_postings_list_exactly_the_repos_with_each_term(document):
+    themed, index = document
+    assert index['terms'] == sorted(index['terms'])
+    assert index['repos'] == [repo['full_name'] for repo, _ in themed]
+    tokens = [set(words(search_index.repo_search_text(repo, ring))) for repo, ring in themed]
+    for term, postings in zip(index['terms'], index['postings']):
+        assert all(delta >= 0 for delta in postings)
+        assert search_index.delta_decode(postings) == [i for i, found in enumerate(tokens) if term in found]
+
+def test_prefix_and_trigram_tables(document):
+    _, index = document
+    terms = index['terms']
+    for prefix, (start, end) in index['prefixes'].items():
+        assert [t for t in terms if t.startswith(prefix)] == terms[start:end]
+    for gram, term_ids in index['trigrams'].items():
+        assert term_ids == [i for i, term in enumerate(terms) if gram in term]
+
+def test_search_matches_a_scan(document):
+    themed, index = document
+    tokens = [set(words(search_index.repo_search_text(repo, ring))) for repo, ring in themed]
+    rng = random.Random(8)
+    queries = [' '.join(rng.sample(sorted(found), min(2, len(found)))) for found in rng.sample(tokens, 40)]
+    queries += [term[:2] for term in rng.sample(index['terms'], 20)] + ['no-such-term']
+    for query in queries:
+        *whole, last = words(query)
+        expected = [index['repos'][i] for i, found in enumerate(tokens)
+                    if all(t in found for t in whole) and any(t.startswith(last) for t in found)]
+        assert search_index.search(index, query) == expected
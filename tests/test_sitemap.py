@@ -0,0 +1,53 @@
+"""
+Chunked HTML metadata extraction (generate-detailed-sitemap.py)
+"""
+
+import hashlib
+import importlib
+
+import pytest
+
+benchmark = importlib.import_module('benchmark-pipeline')
+sitemap = importlib.import_module('generate-detailed-sitemap')
+
+# Closing tags, comments and multi-byte characters that a small chunk size splits
+TRICKY_PAGE = (
+    '<!DOCTYPE html>\r\n<html><head><title>Café – ripple ✨</title>\r\n'
+    '<meta name="description" content="A grid of cells, exported as JSON">\r'
+    '<script src="https://cdn.jsdelivr.net/npm/three@0.160.0/build/three.min.js"></script>\n'
+    '<!-- <script>const hidden = 1;</script> <title>not this</title> -->\n'
+    '</head><body>\n<canvas id="c"></canvas>\n'
+    '<script>\nconst title = "<title>still not this</title>";\n'
+    'function draw() { let x = "</scr" + "ipt>"; return x; }\nlet observer = new IntersectionObserver(() => {}); // observer system\n'
+    '</SCRIPT >\n<p>日本語のテキスト 🎵 playlist</p>\n</body></html>'
+)
+
+@pytest.fixture(scope='module')
+def pages(tmp_path_factory):
+    root = tmp_path_factory.mktemp('pages')
+    paths = benchmark.synthetic_pages(root, 15, seed=9)
+    tricky = root / 'tricky.html'
+    tricky.write_bytes(TRICKY_PAGE.encode('utf-8') + b'\xff\xfe broken bytes\r')
+    return paths + [tricky]
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 17, 256])
+def test_chunk_size_does_not_change_metadata(pages, chunk_size):
+    scanner = sitemap.FeatureScanner()
+    for path in pages:
+        whole = sitemap.extract_html_metadata(path, scanner)
+        digest = hashlib.sha256()
+        assert sitemap.extract_html_metadata(path, scanner, chunk_size=chunk_size, digest=digest) == whole
+        assert digest.hexdigest() == hashlib.sha256(path.read_bytes()).hexdigest()
+
+def test_tricky_page_metadata(pages):
+    path = pages[-1]
+    metadata = sitemap.extract_html_metadata(path, chunk_size=5)
+    assert metadata['title'] == 'Café – ripple ✨'
+    assert metadata['description'] == 'A grid of cells, exported as JSON'
+    assert metadata['external_scripts'] == ['https://cdn.jsdelivr.net/npm/three@0.160.0/build/three.min.js']
+    assert {'Three.js 3D', 'Canvas Rendering', 'Playlist System', 'Export Functionality',
+            'Grid System', 'Observer Pattern'} <= set(metadata['features'])
+    # Declarations are counted over the whole page text, commented-out code included
+    assert (metadata['stats']['functions'], metadata['stats']['constants'], metadata['stats']['variables']) == (1, 2, 2)
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        assert metadata['stats']['lines'] == len(f.read().splitlines())
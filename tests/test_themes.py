@@ -0,0 +1,161 @@
+"""
+Keyword theme matching (analyze-themes.py)
+"""
+
+import importlib
+import math
+import random
+import re
+
+import pytest
+
+theme_analysis = importlib.import_module('analyze-themes')
+
+def random_texts(keywords, count=400, seed=0):
+    """Texts mixing keywords (some glued inside other words) with filler"""
+    rng = random.Random(seed)
+    filler = ['chair', 'maid', 'said', 'the', 'a-frame', 'x', 'tim', 'timeline', '3d-ish', 'vr_', '_ai']
+    texts = []
+    for _ in range(count):
+        parts = rng.choices(keywords + filler, k=rng.randint(0, 12))
+        texts.append(''.join(part + rng.choice([' ', '', '-', '.', '_']) for part in parts))
+    return texts
+
+def reference_find(keywords, text, word_boundary):
+    """Keyword indices found with a regex, for checking the matchers"""
+    found = set()
+    for idx, keyword in enumerate(keywords):
+        left = r'(?<![A-Za-z0-9_])' if word_boundary and re.match(r'\w', keyword[0]) else ''
+        right = r'(?![A-Za-z0-9_])' if word_boundary and re.match(r'\w', keyword[-1]) else ''
+        if re.search(left + re.escape(keyword) + right, text):
+            found.add(idx)
+    return found
+
+KEYWORDS = sorted({k for theme in theme_analysis.THEMES.values() for k in theme['keywords']})
+
+@pytest.mark.parametrize('matcher', ['substring', 'automaton'])
+@pytest.mark.parametrize('word_boundary', [False, True])
+def test_matchers_agree_with_reference(matcher, word_boundary):
+    compiled = theme_analysis.compile_keywords(KEYWORDS, matcher)
+    for text in random_texts(KEYWORDS):
+        assert compiled.find(text, word_boundary) == reference_find(KEYWORDS, text, word_boundary)
+
+def test_matcher_choice_follows_keyword_count():
+    small = theme_analysis.compile_keywords(KEYWORDS)
+    large = theme_analysis.compile_keywords([f'kw{i}' for i in range(theme_analysis.AUTOMATON_MIN_KEYWORDS)])
+    assert isinstance(small, theme_analysis.SubstringMatcher)
+    assert isinstance(large, theme_analysis.KeywordAutomaton)
+
+def keyword_loop(repos, themes):
+    """The original per-theme classification loop"""
+    grouped = {}
+    for repo in repos:
+        text = f"{repo['name']} {repo['description'] or ''} {' '.join(repo.get('topics', []))}".lower()
+        scores = [(theme_id, sum(1 for k in theme['keywords'] if k in text)) for theme_id, theme in themes.items()]
+        best = max(scores, key=lambda item: item[1]) if scores else (None, 0)
+        grouped.setdefault(best[0] if best[1] else 'other', []).append(repo['name'])
+    return grouped
+
+@pytest.mark.parametrize('n_themes', [10, 60])
+def test_analyze_themes_matches_keyword_loop(n_themes):
+    rng = random.Random(n_themes)
+    vocabulary = KEYWORDS + [f'word{i}' for i in range(300)]
+    themes = {
+        f'theme_{i}': {'name': f'Theme {i}', 'keywords': rng.sample(vocabulary, 6)}
+        for i in range(n_themes)
+    }
+    texts = random_texts(vocabulary, count=600, seed=n_themes)
+    repos = [{'name': f'repo-{i}', 'description': text, 'topics': rng.sample(KEYWORDS, rng.randint(0, 2))}
+             for i, text in enumerate(texts)]
+    expected = keyword_loop(repos, themes)
+    for matcher in ('substring', 'automaton'):
+        themes_found = theme_analysis.analyze_themes(repos, themes, matcher=matcher)
+        assert {theme_id: [r['name'] for r in theme['repos']]
+                for theme_id, theme in themes_found.items()} == expected
+
+def test_extract_keywords_matches_substring_tests():
+    terms = theme_analysis.KEYWORD_TERMS
+    for text in random_texts(list(terms), seed=3):
+        expected = {term for term in terms if term in text.lower()}
+        assert set(theme_analysis.extract_keywords(text)) == expected
+
+def keyword_sets(count=500, seed=4):
+    rng = random.Random(seed)
+    terms = sorted(set(theme_analysis.KEYWORD_TERMS))
+    return [rng.sample(terms, rng.randint(0, 6)) for _ in range(count)]
+
+def test_sparse_network_matches_pairwise_counts():
+    sets = keyword_sets()
+    assert theme_analysis.build_keyword_network(sets) == theme_analysis._cooccurrence_loops(sets)
+
+@pytest.mark.parametrize('weighting', ['pmi', 'jaccard'])
+def test_weighted_network_edges(weighting):
+    sets = keyword_sets()
+    counts = theme_analysis._cooccurrence_loops(sets)
+    doc_freq = {}
+    for keywords in sets:
+        for keyword in keywords:
+            doc_freq[keyword] = doc_freq.get(keyword, 0) + 1
+    network = theme_analysis.build_keyword_network(sets, weighting)
+    assert {a: set(edges) for a, edges in network.items()} == {a: set(edges) for a, edges in counts.items()}
+    for a, edges in counts.items():
+        for b, both in edges.items():
+            if weighting == 'pmi':
+                expected = math.log(both * len(sets) / (doc_freq[a] * doc_freq[b]))
+            else:
+                expected = both / (doc_freq[a] + doc_freq[b] - both)
+            assert network[a][b] == pytest.approx(expected, abs=1e-4)
+            assert network[a][b] == network[b][a]
+
+def test_top_k_keeps_each_keywords_strongest_edges():
+    sets = keyword_sets()
+    full = theme_analysis.build_keyword_network(sets, 'jaccard')
+    pruned = theme_analysis.build_keyword_network(sets, 'jaccard', top_k=3)
+    for a, edges in pruned.items():
+        for b, weight in edges.items():
+            assert full[a][b] == weight and pruned[b][a] == weight
+    for a, edges in full.items():
+        kth = sorted(edges.values(), reverse=True)[:3][-1]
+        assert {b for b, weight in edges.items() if weight > kth} <= set(pruned.get(a, {}))
+        assert len(pruned.get(a, {})) >= min(3, len(edges))
+
+def theme_repos(count=300, seed=5):
+    rng = random.Random(seed)
+    vocabulary = KEYWORDS + [f'word{i}' for i in range(100)]
+    return [{'name': f'repo-{i}', 'full_name': f'bench/repo-{i}', 'description': text, 'topics': []}
+            for i, text in enumerate(random_texts(vocabulary, count, seed))]
+
+def grouping(themes):
+    return {theme_id: [r['full_name'] for r in theme['repos']] for theme_id, theme in themes.items()}
+
+def test_incremental_state_rescores_only_changes(tmp_path, capsys):
+    state_file = tmp_path / 'state.json'
+    repos = theme_repos()
+    theme_analysis.analyze_themes_incremental(repos, state_file)
+    capsys.readouterr()
+
+    theme_analysis.analyze_themes_incremental(repos, state_file)
+    assert '0 re-scored, 0 removed, 300 unchanged' in capsys.readouterr().out
+
+    edited = [dict(repo, description='audio sound music') if i % 10 == 0 else repo for i, repo in enumerate(repos)]
+    themes, keyword_sets, network = theme_analysis.analyze_themes_incremental(edited[5:], state_file)
+    assert '29 re-scored, 5 removed, 266 unchanged' in capsys.readouterr().out
+    assert grouping(themes) == grouping(theme_analysis.analyze_themes(edited[5:]))
+    assert network == theme_analysis._cooccurrence_loops(keyword_sets)
+
+@pytest.mark.parametrize('change', ['table', 'word_boundary'])
+def test_incremental_state_is_dropped_when_matching_changes(tmp_path, capsys, change):
+    state_file = tmp_path / 'state.json'
+    repos = theme_repos()
+    theme_analysis.analyze_themes_incremental(repos, state_file)
+    capsys.readouterr()
+
+    table = dict(theme_analysis.THEMES)
+    word_boundary = False
+    if change == 'table':
+        table['sound_audio'] = dict(table['sound_audio'], keywords=['sound', 'word1', 'word2'])
+    else:
+        word_boundary = True
+    themes, _, _ = theme_analysis.analyze_themes_incremental(repos, state_file, table, word_boundary)
+    assert '300 re-scored' in capsys.readouterr().out
+    assert grouping(themes) == grouping(theme_analysis.analyze_themes(repos, table, word_boundary))
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Watch the pipeline inputs and rebuild only the artifacts they affect
+
+Stages and what they read:
+    index    GitHub API                        -> github-ripple-index.json
+    themes   github-ripple-index.json, themes  -> github-thematic-index.json
+    search   github-thematic-index.json        -> github-search-index.json
+    sitemap  HTML pages                        -> sitemap-detailed.json
+
+Every stage also depends on its own script and the shared ripple_*.py
+modules it imports; an edited script is reloaded, and an edited module is
+re-imported along with the modules that import it. Inputs are polled; a
+burst of saves is debounced into one rebuild, which runs the stages whose
+inputs changed plus everything downstream of them. A failed stage only
+holds back the stages downstream of it.
+Stages run in this process, so modules, compiled matchers and metadata
+caches stay warm between rebuilds.
+"""
+
+import ast
+import importlib
+import importlib.util
+import sys
+import time
+from pathlib import Path
+
+from ripple_metrics import metrics, add_metrics_arguments, start_instrumentation
+import ripple_output
+from ripple_output import add_output_arguments, output_options
+
+HERE = Path(__file__).parent
+
+# Holds the process-wide metrics registry the watcher itself reports from,
+# so it is never re-imported
+PINNED_MODULES = ('ripple_metrics',)
+
+def shared_modules(path):
+    """Paths of the ripple_*.py modules a script imports, directly or through each other"""
+    found = []
+    pending = [Path(path)]
+    while pending:
+        tree = ast.parse(pending.pop().read_text(encoding='utf-8'))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module:
+                names = [node.module]
+            elif isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            else:
+                continue
+            for name in names:
+                module = HERE / f'{name}.py'
+                if (name.startswith('ripple_') and name not in PINNED_MODULES
+                        and module.exists() and module not in found):
+                    found.append(module)
+                    pending.append(module)
+    return found
+
+def reload_shared(paths):
+    """Re-import edited shared modules and the shared modules importing them, dependencies first"""
+    changed = set(paths)
+    stale = []
+    for name, module in list(sys.modules.items()):
+        path = Path(getattr(module, '__file__', None) or '')
+        if name.startswith('ripple_') and name not in PINNED_MODULES and path.parent == HERE:
+            depends = set(shared_modules(path))
+            if path in changed or depends & changed:
+                stale.append((len(depends), name))
+    # A module's dependencies import fewer shared modules than it does
+    for _, name in sorted(stale):
+        importlib.reload(sys.modules[name])
+    return [name for _, name in sorted(stale)]
+
+def load_script(path):
+    """Import a (hyphen-named) pipeline script as a module"""
+    path = Path(path)
+    name = '_ripple_' + path.stem.replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+class Stage:
+    """One pipeline step: the files it reads, the files it writes, how to run it
+    
+    `inputs` is a callable so globbed inputs (new HTML pages) are picked up
+    on every poll. `run(module)` gets the stage's freshly loaded script.
+    """
+    
+    def __init__(self, name, script, inputs, outputs, run):
+        self.name = name
+        self.script = Path(script)
+        self.inputs = inputs
+        self.outputs = [Path(p) for p in outputs]
+        self.run = run
+        self.module = None
+        self.modules = shared_modules(self.script)
+    
+    def watched(self):
+        return [self.script] + self.modules + [Path(p) for p in self.inputs()]
+    
+    def execute(self):
+        if self.module is None:
+            self.module = load_script(self.script)
+        self.run(self.module)
+
+def snapshot(paths):
+    """(mtime_ns, size) per path; missing files map to None"""
+    state = {}
+    for path in paths:
+        try:
+            stat = path.stat()
+            state[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            state[path] = None
+    return state
+
+def affected_stages(stages, changed):
+    """Stages whose inputs changed, plus every stage downstream of them, in order
+    
+    Stages are listed upstream first, so one pass propagates through the
+    outputs of the stages already marked.
+    """
+    dirty = []
+    produced = set()
+    for stage in stages:
+        reads = set(stage.watched())
+        if reads & changed or reads & produced:
+            dirty.append(stage)
+            produced.update(stage.outputs)
+    return dirty
+
+class PipelineWatcher:
+    """Poll the stage inputs and rebuild what a change affects"""
+    
+    def __init__(self, stages, interval=0.2, debounce=0.3):
+        self.stages = stages
+        self.interval = interval
+        self.debounce = debounce
+        self.state = {}
+    
+    def watched(self):
+        paths = set()
+        for stage in self.stages:
+            paths.update(stage.watched())
+        return paths
+    
+    def changes(self):
+        current = snapshot(self.watched())
+        changed = {p for p in current.keys() | self.state.keys() if current.get(p) != self.state.get(p)}
+        self.state = current
+        return changed
+    
+    def rebuild(self, stages, changed=()):
+        changed = set(changed)
+        shared = {path for stage in self.stages for path in stage.modules} & changed
+        if shared:
+            print(f"🔄 Re-imported {', '.join(reload_shared(shared))}")
+        blocked = set()
+        for stage in stages:
+            if stage.script in changed:
+                # Pick up edits to the stage's own script and whatever it now imports
+                stage.module = None
+                stage.modules = shared_modules(stage.script)
+            elif shared & set(stage.modules):
+                stage.module = None
+            if stage in blocked:
+                print(f"⏭️  {stage.name} skipped: an input failed to rebuild")
+                continue
+            start = time.perf_counter()
+            try:
+                with metrics.stage(f'rebuild_{stage.name}'):
+                    stage.execute()
+            except Exception as e:
+                # Leave downstream artifacts alone rather than build them from stale input;
+                # independent stages still run
+                print(f"❌ {stage.name} failed: {e}")
+                blocked.update(affected_stages(self.stages, set(stage.outputs)))
+                continue
+            print(f"⚡ {stage.name} rebuilt in {time.perf_counter() - start:.2f}s")
+        # Outputs written during the rebuild are already accounted for
+        self.changes()
+    
+    def run(self, initial=True):
+        self.changes()
+        if initial:
+            self.rebuild(self.stages)
+        print(f"\n👀 Watching {len(self.state)} files (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(self.interval)
+                changed = self.changes()
+                if not changed:
+                    continue
+                
+                # Debounce: wait for the burst of saves to settle
+                quiet_since = time.monotonic()
+                while time.monotonic() - quiet_since < self.debounce:
+                    time.sleep(self.interval)
+                    more = self.changes()
+                    if more:
+                        changed |= more
+                        quiet_since = time.monotonic()
+                
+                stages = affected_stages(self.stages, changed)
+                if not stages:
+                    continue
+                names = ', '.join(p.name for p in sorted(changed)[:3])
+                more = f" (+{len(changed) - 3} more)" if len(changed) > 3 else ''
+                print(f"\n🔁 Changed: {names}{more} → {', '.join(s.name for s in stages)}")
+                self.rebuild(stages, changed)
+        except KeyboardInterrupt:
+            print("\n👋 Stopped watching")
+
+def build_stages(args, options):
+    """The index → themes chain and the sitemap stage, configured from CLI args"""
+    raw_index = Path(args.index_file)
+    thematic_index = Path(args.thematic_file)
+    root = Path(args.root)
+    stages = []
+    
+    if args.with_index:
+        def run_index(module):
+            index = module.generate_comprehensive_index(args.account, schema=args.schema)
+            if not index:
+                raise RuntimeError("no repositories fetched")
+            module.write_index(index, raw_index, **options)
+        stages.append(Stage('index', HERE / 'generate-github-index.py', lambda: [], [raw_index], run_index))
+    
+    theme_inputs = [raw_index] + ([Path(args.themes)] if args.themes else [])
+    
+    def run_themes(module):
+        themes = module.load_themes(args.themes) if args.themes else None
+        enhanced = module.create_enhanced_index(raw_index, schema=args.schema, themes=themes,
+                                                state_file=args.theme_state)
+        # Through the module, so a reloaded ripple_output is picked up
+        ripple_output.write_artifact(enhanced, thematic_index, **options)
+    stages.append(Stage('themes', HERE / 'analyze-themes.py', lambda: theme_inputs, [thematic_index], run_themes))
+    
+    search_index = Path(args.search_file)
+    
+    def run_search(module):
+        ripple_output.write_artifact(module.create_search_index(thematic_index), search_index, **options)
+    stages.append(Stage('search', HERE / 'build-search-index.py', lambda: [thematic_index], [search_index], run_search))
+    
+    if not args.no_sitemap:
+        sitemap_file = root / 'sitemap-detailed.json'
+        sitemap_script = HERE / 'generate-detailed-sitemap.py'
+        sitemap = Stage('sitemap', sitemap_script, None, [sitemap_file], None)
+        
+        def sitemap_inputs():
+            if sitemap.module is None:
+                sitemap.module = load_script(sitemap_script)
+            return sitemap.module.discover_pages(root, args.include or ('*.html',), args.exclude, args.recursive)
+        
+        def run_sitemap(module):
+            # Pool workers can't re-import a script loaded by path under spawn,
+            # and a single edited page is extracted in-process anyway
+            module.generate_detailed_sitemap(root, workers=1, include=args.include or ('*.html',),
+                                             exclude=args.exclude, recursive=args.recursive,
+                                             output_file=sitemap_file, **options)
+        sitemap.inputs = sitemap_inputs
+        sitemap.run = run_sitemap
+        stages.append(sitemap)
+    
+    return stages
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Rebuild ripple artifacts as their inputs change')
+    parser.add_argument('--root', default=str(HERE), help='directory of HTML pages for the sitemap')
+    parser.add_argument('-r', '--recursive', action='store_true', help='watch pages in subdirectories too')
+    parser.add_argument('--include', action='append', help="page glob, repeatable (default: '*.html')")
+    parser.add_argument('--exclude', action='append', default=[], help='glob to skip, repeatable')
+    parser.add_argument('--index-file', default=str(HERE / 'github-ripple-index.json'))
+    parser.add_argument('--thematic-file', default=str(HERE / 'github-thematic-index.json'))
+    parser.add_argument('--search-file', default=str(HERE / 'github-search-index.json'))
+    parser.add_argument('--themes', help='JSON theme table to watch and use instead of the built-in one')
+    parser.add_argument('--theme-state', default=str(HERE / '.theme-state.json'),
+                        help='incremental theme state, so unchanged repos are not re-scored')
+    parser.add_argument('--schema', type=int, choices=[1, 2], default=1)
+    parser.add_argument('--with-index', action='store_true',
+                        help='also refetch from GitHub when generate-github-index.py changes')
+    parser.add_argument('--account', default='hartswf0', help='GitHub user for --with-index')
+    parser.add_argument('--no-sitemap', action='store_true', help='do not watch HTML pages')
+    parser.add_argument('--interval', type=float, default=0.2, help='seconds between polls')
+    parser.add_argument('--debounce', type=float, default=0.3,
+                        help='quiet period before a burst of changes is rebuilt')
+    parser.add_argument('--no-initial', action='store_true', help='skip the full build at startup')
+    add_output_arguments(parser)
+    add_metrics_arguments(parser)
+    # Local previews don't need precompressed siblings; brotli alone takes ~0.25s
+    parser.set_defaults(compress='none')
+    args = parser.parse_args()
+    instrumentation = start_instrumentation(args, 'watch-pipeline')
+    
+    stages = build_stages(args, output_options(args))
+    PipelineWatcher(stages, args.interval, args.debounce).run(initial=not args.no_initial)
+    instrumentation.finish()